@@ -0,0 +1,237 @@
+"""
+Engine overhead benchmarks: full games against the zero-latency Local client, so all
+the time and memory measured is the engine's own (conversation history, prompt
+building, logging, vote handling).
+
+    python -m benchmarks.engine --save-baseline        # record a baseline on this machine
+    python -m benchmarks.engine                        # compare against it, exit 1 on a regression
+"""
+from src.game.narrator import Narrator
+from src.game.orchestrator import GameOrchestrator
+from src.game.roles import BasePlayer
+from src.game.logger import GameLogger
+from src.game.speakers import RotatingSpeakers
+from src.llms.local import LocalClient
+from typing import Callable, Dict, List, Optional
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# name -> (players, speakers per round). Bigger lobbies also play longer games, from
+# a few days with 7 players to about fifty with 100.
+SCENARIOS = {
+    "7p": (7, None),
+    "20p": (20, None),
+    "50p-5speakers": (50, 5),
+    "100p-5speakers": (100, 5),
+}
+
+# Orchestrator methods timed as phases. They never call each other, so their times add up;
+# whatever is left (eg. the narrator's announcements) is reported as "other".
+PHASES = {
+    "intro": "introduction_phase",
+    "roles": "role_assignment_phase",
+    "night": "night_phase",
+    "discussion": "_conduct_discussion",
+    "vote": "_conduct_vote",
+    "end": "end_game",
+}
+
+# A metric regresses when it grows by more than the threshold and by more than this much,
+# so phases that take a few milliseconds don't fail on noise
+MIN_DELTA = {"cpu_seconds": 0.005, "alloc_bytes": 64 * 1024, "peak_bytes": 64 * 1024}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def build_game(players: int, speakers: Optional[int], log_dir: str, seed: int) -> GameOrchestrator:
+    # Seed the Local clients from the scenario's seed, so every run of it plays the same game
+    logger = GameLogger(log_dir=log_dir)
+    narrator = Narrator(LocalClient("local", "local-mock", f"{seed}:0"))
+    lineup = [BasePlayer(LocalClient("local", "local-mock", f"{seed}:{seat}")) for seat in range(1, players + 1)]
+    return GameOrchestrator(
+        lineup, narrator, logger, rng=random.Random(seed),
+        speakers=RotatingSpeakers(speakers) if speakers else None,
+    )
+
+
+def _instrument(orchestrator: GameOrchestrator, measure: Callable[[str, Callable], object]):
+    """
+    Route each phase method through measure(phase, call). Each phase waits for its log
+    events to be written, so the writer thread's work is charged to the phase that
+    logged it rather than to whichever phase is running when it wakes up.
+    """
+    for phase, method in PHASES.items():
+        original = getattr(orchestrator, method)
+
+        def call_and_flush(_original, *args, **kwargs):
+            result = _original(*args, **kwargs)
+            orchestrator.logger.flush()
+            return result
+
+        def timed(*args, _phase=phase, _original=original, **kwargs):
+            return measure(_phase, lambda: call_and_flush(_original, *args, **kwargs))
+
+        setattr(orchestrator, method, timed)
+
+
+def time_game(orchestrator: GameOrchestrator) -> Dict[str, dict]:
+    """CPU seconds spent in each phase (all threads, including the log writer)"""
+    cpu = {phase: 0.0 for phase in PHASES}
+
+    def measure(phase, call):
+        started = time.process_time()
+        try:
+            return call()
+        finally:
+            cpu[phase] += time.process_time() - started
+
+    _instrument(orchestrator, measure)
+    started = time.process_time()
+    orchestrator.run()
+    total = time.process_time() - started
+    cpu["other"] = max(0.0, total - sum(cpu.values()))
+    cpu["total"] = total
+    return {phase: {"cpu_seconds": seconds} for phase, seconds in cpu.items()}
+
+
+def trace_game(orchestrator: GameOrchestrator) -> Dict[str, dict]:
+    """
+    Memory allocated and kept by each phase, and the most it used at once above what
+    was allocated when the phase started
+    """
+    memory = {phase: {"alloc_bytes": 0, "peak_bytes": 0} for phase in PHASES}
+
+    def measure(phase, call):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            return call()
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            memory[phase]["alloc_bytes"] += current - before
+            memory[phase]["peak_bytes"] = max(memory[phase]["peak_bytes"], peak - before)
+
+    _instrument(orchestrator, measure)
+    # Without the cycle collector, what a phase keeps doesn't depend on when a collection
+    # happened to run (the log writer thread's allocations count towards triggering one)
+    gc.disable()
+    tracemalloc.start()
+    try:
+        orchestrator.run()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    memory["total"] = {"alloc_bytes": current, "peak_bytes": peak}
+    return memory
+
+
+def run_scenario(name: str, repeat: int) -> dict:
+    players, speakers = SCENARIOS[name]
+    LocalClient.configure(seed=0, latency=0.0, latency_jitter=0.0, error_rate=0.0)
+
+    runs = []
+    with tempfile.TemporaryDirectory() as log_dir, contextlib.redirect_stdout(io.StringIO()):
+        # One untimed game first, so caches and lazily built state don't count against the first run
+        build_game(players, speakers, log_dir, seed=0).run()
+        for _ in range(repeat):
+            gc.collect()
+            runs.append(time_game(build_game(players, speakers, log_dir, seed=0)))
+        gc.collect()
+        # Tracing slows the game down, so memory is measured in a separate run
+        orchestrator = build_game(players, speakers, log_dir, seed=0)
+        memory = trace_game(orchestrator)
+
+    phases = {}
+    for phase in runs[0]:
+        # The fastest run is the one least disturbed by the rest of the machine
+        phases[phase] = {"cpu_seconds": min(run[phase]["cpu_seconds"] for run in runs)}
+        phases[phase].update(memory.get(phase, {}))
+    return {
+        "players": players,
+        "speakers": speakers,
+        "days": orchestrator.conversation.day,
+        "messages": len(orchestrator.conversation.messages),
+        "phases": phases,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Descriptions of every metric that regressed past the threshold"""
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if not previous:
+            continue
+        if previous["messages"] != scenario["messages"]:
+            print(f"note: {name} now plays a different game ({previous['messages']} -> {scenario['messages']} messages)")
+        for phase, metrics in scenario["phases"].items():
+            for metric, value in metrics.items():
+                old = previous["phases"].get(phase, {}).get(metric)
+                if old is None:
+                    continue
+                if value > old * (1 + threshold) and value - old > MIN_DELTA[metric]:
+                    regressions.append(f"{name} {phase} {metric}: {old:,.4g} -> {value:,.4g} (+{(value / old - 1) if old else 1:.0%})")
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"{'scenario':16} {'phase':11} {'cpu ms':>9} {'alloc KiB':>10} {'peak KiB':>10}")
+    for name, scenario in results["scenarios"].items():
+        for phase, metrics in scenario["phases"].items():
+            print(
+                f"{name:16} {phase:11} {metrics['cpu_seconds'] * 1000:9.1f} "
+                f"{metrics.get('alloc_bytes', 0) / 1024:10.0f} {metrics.get('peak_bytes', 0) / 1024:10.0f}"
+            )
+    print(f"max RSS {results['max_rss_kib'] / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the game engine's CPU and memory overhead")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Run only these (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario; the fastest is kept")
+    parser.add_argument("--out", default="benchmark_results.json", help="Where to save this run's results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Relative growth that counts as a regression")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scenarios": {name: run_scenario(name, args.repeat) for name in args.scenario or SCENARIOS},
+    }
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["max_rss_kib"] = max_rss / 1024 if sys.platform == "darwin" else max_rss
+    print_results(results)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        raise SystemExit
+
+    if not os.path.exists(args.baseline):
+        raise SystemExit(f"No baseline at {args.baseline} - run with --save-baseline first")
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        raise SystemExit(1)
+    print("No regressions")
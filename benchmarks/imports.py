@@ -0,0 +1,93 @@
+"""
+Start-up benchmarks: how long a fresh interpreter takes to import the engine and create
+its first client, and which provider SDKs that pulls in. Each measurement runs in its
+own process, as a tournament worker would.
+
+    python -m benchmarks.imports    # exits 1 if a provider SDK is loaded before it's needed
+"""
+from typing import Dict, List
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level modules of the provider SDKs
+SDKS = ("openai", "httpx", "requests", "boto3", "botocore")
+
+# name -> (code to time, whether it may load SDKs)
+SCENARIOS = {
+    "factory": ("import src.llms.factory", False),
+    "main": ("import main", False),
+    "local client": (
+        "from src.llms.factory import LLMFactory; LLMFactory(model_snapshot='local-mock').create_client()", False
+    ),
+    "openai client": ("from src.llms.factory import client_class; client_class('OpenAI')", True),
+    "fireworks client": ("from src.llms.factory import client_class; client_class('Fireworks')", True),
+    "bedrock client": ("from src.llms.factory import client_class; client_class('Bedrock')", True),
+}
+
+
+def probe(code: str) -> dict:
+    """Run in the child process: time the code, and list the SDKs it loaded"""
+    started = time.perf_counter()
+    try:
+        exec(code, {})
+        error = None
+    except ImportError as e:
+        error = str(e)
+    return {
+        "seconds": time.perf_counter() - started,
+        "sdks": sorted({name.split(".")[0] for name in sys.modules} & set(SDKS)),
+        "error": error,
+    }
+
+
+def measure(name: str, repeat: int) -> dict:
+    """The fastest of repeat fresh interpreters, so the file system cache is warm"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.imports", "--probe", name],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def check(results: Dict[str, dict]) -> List[str]:
+    """Scenarios that loaded a provider SDK they don't use"""
+    return [
+        f"{name} loaded {', '.join(result['sdks'])}"
+        for name, result in results.items()
+        if result["sdks"] and not SCENARIOS[name][1]
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark start-up time and provider SDK imports")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per scenario; the fastest is kept")
+    parser.add_argument("--probe", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(SCENARIOS[args.probe][0])))
+        raise SystemExit
+
+    results = {name: measure(name, args.repeat) for name in SCENARIOS}
+    print(f"{'scenario':18} {'ms':>8}  sdks loaded")
+    for name, result in results.items():
+        loaded = ", ".join(result["sdks"]) or "-"
+        note = f"  (not installed: {result['error']})" if result["error"] else ""
+        print(f"{name:18} {result['seconds'] * 1000:8.1f}  {loaded}{note}")
+
+    problems = check(results)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        raise SystemExit(1)
+    print("No provider SDKs loaded before they were needed")
@@ -0,0 +1,86 @@
+"""
+How often DiscussionSignals agrees with the narrator's LLM about when a day's discussion
+is over, on recorded games. Every round the narrator judged (all but a day's last, in games
+played with --discussion-end narrator) is replayed through the signals, and their verdict
+is compared with whether the narrator called the vote after it.
+
+    python -m benchmarks.termination game_logs/
+"""
+from src.analytics.events import log_paths, read_log
+from src.game.conversation import GameMessage
+from src.game.name_index import NameIndex
+from src.game.termination import DiscussionSignals
+from collections import Counter
+from typing import Iterable, Iterator, Tuple
+
+import argparse
+
+
+def judged_rounds(path: str, signals: DiscussionSignals) -> Iterator[Tuple[bool, bool, str]]:
+    """(signals end, narrator ended, signals reason) for each round of a game the narrator judged"""
+    players, dead = [], set()
+    pending = None  # The last round's verdict, until what followed it shows the narrator's
+    for event in read_log(path):
+        kind, data = event.get("event"), event.get("data") or {}
+        if kind == "role_assigned":
+            players.append(data["player"])
+        elif kind == "werewolf_kill":
+            dead.add(data["victim"])
+        elif kind == "player_exiled":
+            dead.add(data["player"])
+        elif kind == "day_start":
+            signals.start_day(NameIndex(players), [p for p in players if p not in dead])
+        elif kind == "player_discussion":
+            if pending:
+                yield pending[0], False, pending[1]
+                pending = None
+            signals.observe(GameMessage("discussion", data["player"], data["message"]))
+        elif kind == "discussion_round":
+            verdict = signals.end_round()
+            # Rounds the game's own policy settled never reached the narrator
+            pending = (bool(verdict.end), verdict.reason) if data.get("end") is None else None
+        elif kind == "voting_start" and pending:
+            yield pending[0], True, pending[1]
+            pending = None
+
+
+def agreement(paths: Iterable[str], **settings) -> dict:
+    outcomes = Counter()
+    games = 0
+    for path in log_paths(paths):
+        rounds = list(judged_rounds(path, DiscussionSignals(**settings)))
+        games += bool(rounds)
+        for signals_end, narrator_end, _ in rounds:
+            outcomes[signals_end, narrator_end] += 1
+    total = sum(outcomes.values())
+    return {
+        "games": games,
+        "rounds": total,
+        "agreement": (outcomes[True, True] + outcomes[False, False]) / total if total else None,
+        # Of the rounds the narrator ended, the share the signals ended too, and vice versa
+        "recall": outcomes[True, True] / max(outcomes[True, True] + outcomes[False, True], 1),
+        "precision": outcomes[True, True] / max(outcomes[True, True] + outcomes[True, False], 1),
+        "outcomes": {f"signals {'end' if s else 'continue'}, narrator {'end' if n else 'continue'}": count
+                     for (s, n), count in sorted(outcomes.items())},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare discussion signals with the narrator's judgement on recorded games")
+    parser.add_argument("paths", nargs="*", default=["game_logs"], help="Game logs, or directories of them")
+    parser.add_argument("--max-rounds", type=int, default=3)
+    parser.add_argument("--convergence", type=float, default=0.5)
+    parser.add_argument("--stability", type=float, default=0.75)
+    parser.add_argument("--repetition", type=float, default=0.5)
+    args = parser.parse_args()
+
+    result = agreement(
+        args.paths, max_rounds=args.max_rounds, convergence=args.convergence,
+        stability=args.stability, repetition=args.repetition,
+    )
+    if not result["rounds"]:
+        raise SystemExit("No rounds judged by the narrator in these logs - record games with --discussion-end narrator")
+    print(f"{result['rounds']} rounds judged by the narrator in {result['games']} games")
+    print(f"  agreement {result['agreement']:.0%}, precision {result['precision']:.0%}, recall {result['recall']:.0%}")
+    for outcome, count in result["outcomes"].items():
+        print(f"  {outcome}: {count}")
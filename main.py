@@ -1,30 +1,403 @@
-import os
-from dotenv import load_dotenv
+import argparse
+import asyncio
+import itertools
+import random
+from functools import partial
+from typing import Dict
+from src.config import getenv
 from src.game.orchestrator import GameOrchestrator
-from src.game.game_state import GameState
+from src.game.async_orchestrator import AsyncGameOrchestrator
+from src.analytics.ratings import RatingEngine
+from src.game.checkpoint import CheckpointStore
+from src.game.matchmaking import Lineup, MatchmakingScheduler
+from src.game.speakers import RotatingSpeakers
+from src.game.termination import TERMINATION_POLICIES
 from src.game.narrator import Narrator
-from src.game.roles import BasePlayer, Villager, Werewolf
+from src.game.narrator_lines import NarratorLinePool
+from src.game.roles import BasePlayer
 from src.game.logger import GameLogger
-from src.llms.factory import LLMFactory
+from src.game.tournament import BatchTournamentRunner, TournamentRunner
+from src.analytics.events import read_log
+from src.llms.factory import LLMFactory, models_for
+from src.llms.batch import BatchCollector, BatchingClient, LocalBatchBackend, OpenAIBatchBackend
+from src.llms.cache import ResponseCache, ResponseStore, open_store
+from src.llms.instrumentation import InstrumentedClient, metrics
+from src.llms.local import LocalClient
+from src.llms.rate_limit import RateLimitedClient
+from src.llms.registry import registry
 
 
-def main():
-    load_dotenv()
+def build_game(
+    seed: int = None,
+    use_async: bool = False,
+    max_concurrency: int = 8,
+    log_compression: str = None,
+    cache_path: str = None,
+    cache_mode: str = "cache",
+    cache_store: ResponseStore = None,
+    providers: list = None,
+    batch_collector: BatchCollector = None,
+    checkpoints: CheckpointStore = None,
+    scheduler: MatchmakingScheduler = None,
+    num_players: int = 7,
+    speakers_per_round: int = None,
+    narrator_lines: NarratorLinePool = None,
+    discussion_end: str = "signals",
+    speculate: bool = False,
+    structured_output: bool = True,
+    lineup: Lineup = None,
+    sampling_params: Dict[str, dict] = None,
+):
+    """
+    Set up a game's logger, clients and players, returning its orchestrator.
 
-    llm = LLMFactory().create_client()
-    logger = GameLogger()
-    narrator = Narrator(llm)
+    With checkpoints, the game is snapshotted (keyed by seed) at every phase boundary,
+    and a game with a snapshot from an earlier run is resumed from it. With a
+    scheduler, new games take their models (and roles, if it assigns them) from its
+    next lineup instead of picking models at random. speakers_per_round limits each
+    round of discussion to that many players, for large lobbies. With narrator_lines,
+    the narrator's announcements come from that pool rather than an LLM call each.
+    discussion_end names the policy that ends each day's discussion (see TERMINATION_POLICIES).
+    speculate (async games only) requests both possible next steps while the narrator judges discussion.
+    structured_output has intros and votes answered as schema-validated JSON, retried when invalid.
+    A replayed game passes its recorded lineup, and the sampling_params (by provider) its
+    calls were keyed with, so no provider SDK has to be imported to replay it.
+    """
+    snapshot = checkpoints.load(seed) if checkpoints else None
+
+    rng = random.Random(seed)
+    # Random lineups get their own RNG, so a replay can rebuild a recorded lineup without
+    # its draws throwing the game's RNG out of step
+    lineup_rng = random.Random(None if seed is None else f"lineup-{seed}")
+    logger = GameLogger(compression=log_compression, game_id=snapshot["game_id"] if snapshot else None)
+
+    # Wrap every client in the response cache when one is in use
+    if cache_path and not cache_store:
+        cache_store = open_store(cache_path)
+    cache = ResponseCache(cache_store, cache_mode, logger) if cache_store else None
+
+    # Offline clients are seeded from the game and their seat in it (the narrator's is 0)
+    game = logger.game_id if seed is None else seed
+    seats = itertools.count()
+
+    def create_client(model: str = None, **labels):
+        factory = LLMFactory(lineup_rng, providers, model)
+        if cache_mode == "replay":
+            client = factory.create_replay_client((sampling_params or {}).get(factory.provider))
+        else:
+            client = factory.create_client(game=f"{game}:{next(seats)}")
+        if batch_collector:
+            client = BatchingClient(client, batch_collector)
+        if cache:
+            client = cache.wrap(client)
+        # Outermost, so latency includes cache lookups, rate limiting and retries
+        return InstrumentedClient(client, logger=logger, **labels)
+
+    # A resumed game keeps its lineup
+    narrator_model, player_models, roles = None, [None] * num_players, None
+    if snapshot:
+        narrator_model = snapshot["narrator"]["model"]
+        player_models = [p["model"] for p in snapshot["players"]]
+    elif lineup or scheduler:
+        lineup = lineup or scheduler.next_lineup()
+        narrator_model, player_models, roles = lineup.narrator, lineup.players, lineup.roles
+
+    narrator = Narrator(create_client(narrator_model, player="narrator", phase="narrator"), lines=narrator_lines)
 
     # Create players
     players = [
-        BasePlayer(LLMFactory().create_client()) for i in range(7)
+        BasePlayer(create_client(model)) for model in player_models
     ]
 
-    orchestrator = GameOrchestrator(players, narrator, logger)
+    if not snapshot:
+        # Everything replay() needs to play the game again, call for call
+        clients = [narrator.llm] + [p.llm for p in players]
+        logger.log({
+            "event": "game_config",
+            "data": {
+                "seed": seed,
+                "num_players": num_players,
+                "speakers_per_round": speakers_per_round,
+                "discussion_end": discussion_end,
+                "structured_output": structured_output,
+                "use_async": use_async,
+                "speculate": speculate and use_async,
+                "narrator": narrator.llm.model,
+                "players": [p.llm.model for p in players],
+                "roles": roles,
+                "sampling_params": {client.provider: client.sampling_params for client in clients},
+            },
+        })
+
+    on_checkpoint = partial(checkpoints.save, seed) if checkpoints else None
+    speakers = RotatingSpeakers(speakers_per_round) if speakers_per_round else None
+    termination = TERMINATION_POLICIES[discussion_end]()
+    if use_async:
+        # Votes and narrator announcements are issued concurrently
+        orchestrator = AsyncGameOrchestrator(
+            players, narrator, logger, max_concurrency=max_concurrency, rng=rng, on_checkpoint=on_checkpoint,
+            roles=roles, speakers=speakers, termination=termination, speculate=speculate,
+            structured_output=structured_output,
+        )
+    else:
+        orchestrator = GameOrchestrator(
+            players, narrator, logger, rng=rng, on_checkpoint=on_checkpoint, roles=roles, speakers=speakers,
+            termination=termination, structured_output=structured_output,
+        )
+
+    if snapshot:
+        orchestrator.restore(snapshot)
+    return orchestrator
+
+
+def main(seed: int = None, use_async: bool = False, **options) -> dict:
+    orchestrator = build_game(seed, use_async, **options)
+    if use_async:
+        result = asyncio.run(play(orchestrator))
+    else:
+        # the run method
+        result = orchestrator.run()
+
+    result["llm_calls"] = count_calls(orchestrator)
+    return result
+
+
+async def play(orchestrator: AsyncGameOrchestrator) -> dict:
+    """Play an async game, closing its event loop's provider clients after the last game on the loop ends"""
+    async with registry.loop_scope():
+        return await orchestrator.run()
+
+
+async def main_batched(seed: int, collector: BatchCollector, **options) -> dict:
+    """Play a game whose calls are collected into provider batches, alongside many others"""
+    orchestrator = build_game(seed, use_async=True, batch_collector=collector, **options)
+    result = await play(orchestrator)
+    result["llm_calls"] = count_calls(orchestrator)
+    return result
+
+
+def count_calls(orchestrator: GameOrchestrator) -> int:
+    """Calls made by the narrator and players, counted by their RateLimitedClient and BatchingClient layers"""
+    total = 0
+    for client in [orchestrator.narrator.llm] + [p.llm for p in orchestrator.players]:
+        while client is not None:
+            if isinstance(client, (RateLimitedClient, BatchingClient)):
+                total += client.calls
+            client = getattr(client, "inner", None)
+    return total
+
+
+def replay(log_path: str, use_async: bool = False) -> dict:
+    """
+    Re-run a game recorded with --cache record, answering every call from its log. The
+    game is rebuilt with its recorded lineup, and played sync or async as it was recorded
+    (use_async only applies to games whose log doesn't say).
+    """
+    data = next(event["data"] for event in read_log(log_path) if event["event"] == "game_config")
+    if "players" not in data:
+        raise ValueError(f"{log_path} was recorded before game logs kept their lineup, so it can't be replayed")
+
+    store = ResponseStore(":memory:")
+    store.import_game_log(log_path)
+    return main(
+        data["seed"], use_async=data.get("use_async", use_async), cache_store=store, cache_mode="replay",
+        lineup=Lineup(data["narrator"], data["players"], data["roles"]),
+        sampling_params=data["sampling_params"], speculate=data.get("speculate", False),
+        num_players=len(data["players"]), speakers_per_round=data.get("speakers_per_round"),
+        # Games recorded before termination policies always asked the narrator
+        discussion_end=data.get("discussion_end", "narrator"),
+        # and read free-text intros and votes
+        structured_output=data.get("structured_output", False),
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a tournament of Werewolves games between LLMs")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="Games played in parallel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=7, help="Players in each game")
+    parser.add_argument(
+        "--speakers", type=int, metavar="K",
+        help="Only K players (those who have spoken least) speak in each round of discussion, for large lobbies",
+    )
+    parser.add_argument(
+        "--discussion-end", choices=list(TERMINATION_POLICIES), default="signals",
+        help="End discussion from local signals (accusations converging, repeated intents, repetitive rounds), "
+        "also ask the narrator's LLM when they're inconclusive (judge), or always ask it (narrator)",
+    )
+    parser.add_argument(
+        "--speculate", action="store_true",
+        help="With --async-games, request the next round's first turn and the votes while the narrator judges "
+        "whether discussion is over, and keep whichever it chooses (only when every player's calls can be cancelled)",
+    )
+    parser.add_argument(
+        "--free-text", action="store_false", dest="structured_output",
+        help="Read intros and votes from free-text responses instead of asking for validated structured output",
+    )
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of threads")
+    parser.add_argument("--async-games", action="store_true", default=getenv("ASYNC_GAMES") == "1")
+    parser.add_argument(
+        "--provider", action="append", dest="providers",
+        help="Only pick models from this provider (repeatable). Local is never picked unless named",
+    )
+    parser.add_argument("--local-latency", type=float, default=0.0, help="Local provider latency in seconds")
+    parser.add_argument("--local-jitter", type=float, default=0.0)
+    parser.add_argument("--local-error-rate", type=float, default=0.0)
+    parser.add_argument("--pool-size", type=int, default=32, help="HTTP connections kept open per provider")
+    parser.add_argument("--log-compression", choices=["gzip", "zstd"], help="Compress each game log once the game ends")
+    parser.add_argument(
+        "--cache", choices=["cache", "record"],
+        help="Answer repeated calls from the response cache, or record every response into it and the game log",
+    )
+    parser.add_argument("--cache-path", default="llm_cache.sqlite")
+    parser.add_argument("--replay", metavar="GAME_LOG", help="Replay a recorded game without calling any provider")
+    parser.add_argument(
+        "--rate-limit", action="append", default=[], metavar="PROVIDER=RPM",
+        help="Requests per minute shared by all games, eg. OpenAI=500",
+    )
+    parser.add_argument(
+        "--token-limit", action="append", default=[], metavar="PROVIDER=TPM",
+        help="Tokens per minute shared by all games, eg. OpenAI=800000",
+    )
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Play all games together and send their OpenAI (and Local) calls through the provider batch API",
+    )
+    parser.add_argument("--batch-poll-interval", type=float, default=30.0, help="Seconds between batch status checks")
+    parser.add_argument(
+        "--local-batch-turnaround", type=float, default=0.0, help="Seconds the stand-in Local batch server takes per batch"
+    )
+    parser.add_argument(
+        "--checkpoint-dir", metavar="DIR",
+        help="Snapshot games at every phase. Re-running the same command resumes interrupted games and skips finished ones",
+    )
+    parser.add_argument(
+        "--metrics-out", metavar="PATH",
+        help="Write LLM call metrics in Prometheus text format when the tournament ends (thread workers only)",
+    )
+    parser.add_argument(
+        "--matchmaking", action="store_true",
+        help="Choose lineups that most reduce rating uncertainty per dollar, instead of random models",
+    )
+    parser.add_argument(
+        "--quota", action="append", default=[], metavar="PROVIDER=SEATS",
+        help="With --matchmaking, the most player seats to give a provider over the run, eg. OpenAI=2000",
+    )
+    parser.add_argument("--ratings-state", default="ratings.json", help="Ratings kept between runs for --matchmaking")
+    parser.add_argument(
+        "--random-roles", action="store_true", help="With --matchmaking, deal roles at random instead of choosing seats",
+    )
+    parser.add_argument(
+        "--narrator-lines", metavar="PATH",
+        help="Take narrator announcements from a pool of lines generated in the background and kept in PATH",
+    )
+    return parser.parse_args()
 
-    # the run method
-    orchestrator.run()
 
 if __name__ == "__main__":
-    for i in range(100):
-        main()
\ No newline at end of file
+    args = parse_args()
+
+    if args.replay:
+        print(replay(args.replay, use_async=args.async_games))
+        raise SystemExit
+
+    rate_limits = {}
+    for option, name in [(args.rate_limit, "requests_per_minute"), (args.token_limit, "tokens_per_minute")]:
+        for limit in option:
+            provider, value = limit.split("=")
+            rate_limits.setdefault(provider, {})[name] = float(value)
+
+    LocalClient.configure(
+        seed=args.seed,
+        latency=args.local_latency,
+        latency_jitter=args.local_jitter,
+        error_rate=args.local_error_rate,
+    )
+
+    # Clients are shared by every game in the process, so size their pools for all workers
+    registry.configure(pool_size=max(args.pool_size, args.workers))
+
+    options = dict(
+        log_compression=args.log_compression,
+        cache_path=args.cache_path if args.cache else None,
+        cache_mode=args.cache or "cache",
+        providers=args.providers,
+        num_players=args.players,
+        speakers_per_round=args.speakers,
+        discussion_end=args.discussion_end,
+        structured_output=args.structured_output,
+    )
+    checkpoints = CheckpointStore(args.checkpoint_dir) if args.checkpoint_dir else None
+    if checkpoints:
+        options["checkpoints"] = checkpoints
+
+    scheduler = None
+    if args.matchmaking:
+        if args.processes:
+            raise SystemExit("--matchmaking plans lineups in this process, so it can't be used with --processes")
+        scheduler = MatchmakingScheduler(
+            RatingEngine(args.ratings_state),
+            [snapshot for snapshot, _ in models_for(args.providers)],
+            quotas={provider: int(seats) for provider, seats in (quota.split("=") for quota in args.quota)},
+            assign_roles=not args.random_roles,
+            num_players=args.players,
+            lookahead=args.workers,
+            rng=random.Random(args.seed),
+        )
+        scheduler.start()
+        options["scheduler"] = scheduler
+
+    if args.speculate:
+        if not args.async_games or args.batch:
+            raise SystemExit("--speculate needs --async-games (and isn't used with --batch)")
+        options["speculate"] = True
+
+    narrator_lines = None
+    if args.narrator_lines:
+        if args.processes:
+            raise SystemExit("--narrator-lines generates lines in this process, so it can't be used with --processes")
+        if args.cache == "record":
+            raise SystemExit("Pooled narrator lines aren't recorded, so games using --narrator-lines can't be replayed")
+        factory = LLMFactory(random.Random(args.seed), args.providers)
+        narrator_lines = NarratorLinePool(
+            Narrator(InstrumentedClient(factory.create_client(), player="narrator", phase="narrator_lines")).generate_line,
+            path=args.narrator_lines,
+            rng=random.Random(args.seed),
+        )
+        narrator_lines.start()
+        options["narrator_lines"] = narrator_lines
+
+    if args.batch:
+        collector = BatchCollector({
+            "OpenAI": OpenAIBatchBackend(poll_interval=args.batch_poll_interval),
+            "Local": LocalBatchBackend(turnaround=args.local_batch_turnaround),
+        })
+        runner = BatchTournamentRunner(
+            partial(main_batched, **options),
+            num_games=args.games,
+            collector=collector,
+            workers=args.workers,
+            seed=args.seed,
+            rate_limits=rate_limits,
+            checkpoints=checkpoints,
+        )
+    else:
+        runner = TournamentRunner(
+            partial(main, use_async=args.async_games, **options),
+            num_games=args.games,
+            workers=args.workers,
+            seed=args.seed,
+            use_processes=args.processes,
+            rate_limits=rate_limits,
+            checkpoints=checkpoints,
+        )
+    runner.run()
+    if scheduler:
+        scheduler.stop()
+    if narrator_lines:
+        narrator_lines.stop()
+
+    if args.metrics_out:
+        with open(args.metrics_out, "w") as f:
+            f.write(metrics.to_prometheus())
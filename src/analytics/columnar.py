@@ -0,0 +1,183 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import json
+import struct
+import sys
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Columns of the event table. Dictionary columns hold int codes into a per-segment list
+# of strings (-1 for none), so repeated names, models and event types are stored once.
+DICT_COLUMNS = ("game", "event", "actor", "target", "label")
+INT_COLUMNS = ("seq", "day")
+TEXT_COLUMNS = ("text",)
+COLUMNS = DICT_COLUMNS + INT_COLUMNS + TEXT_COLUMNS
+
+MAGIC = b"WCOL1\n"
+
+
+@dataclass
+class Segment:
+    """A block of event rows, column by column. Only the columns read are present."""
+    rows: int
+    columns: Dict[str, array] = field(default_factory=dict)
+    dictionaries: Dict[str, List[str]] = field(default_factory=dict)
+    text: Dict[str, List[str]] = field(default_factory=dict)
+
+    def codes(self, column: str, values: Iterable[str]) -> set:
+        """The codes of the given strings in a dictionary column, skipping those not in this segment"""
+        index = {value: code for code, value in enumerate(self.dictionaries[column])}
+        return {index[v] for v in values if v in index}
+
+    def value(self, column: str, code: int) -> Optional[str]:
+        return self.dictionaries[column][code] if code >= 0 else None
+
+
+class SegmentBuilder:
+    """Accumulates rows, interning the strings of each dictionary column"""
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {name: array("i") for name in DICT_COLUMNS + INT_COLUMNS}
+        self.text = {name: [] for name in TEXT_COLUMNS}
+        self._interned: Dict[str, Dict[str, int]] = {name: {} for name in DICT_COLUMNS}
+
+    def _intern(self, column: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        codes = self._interned[column]
+        if value not in codes:
+            codes[value] = len(codes)
+        return codes[value]
+
+    def append(self, **row):
+        for name in DICT_COLUMNS:
+            self.columns[name].append(self._intern(name, row.get(name)))
+        for name in INT_COLUMNS:
+            self.columns[name].append(row.get(name, 0))
+        for name in TEXT_COLUMNS:
+            self.text[name].append(row.get(name) or "")
+        self.rows += 1
+
+    def build(self) -> Segment:
+        return Segment(
+            rows=self.rows,
+            columns=self.columns,
+            dictionaries={name: list(codes) for name, codes in self._interned.items()},
+            text=self.text,
+        )
+
+
+# Stdlib format: magic, header length, JSON header, then one zlib block per column and
+# dictionary. The header holds each block's offset, so a reader only inflates the
+# columns it needs - queries skip the free text entirely.
+
+def _write_wcol(path: str, segment: Segment):
+    blocks, header = [], {"rows": segment.rows, "byteorder": sys.byteorder, "blocks": {}}
+
+    def add(name: str, data: bytes):
+        offset = sum(len(b) for b in blocks)
+        compressed = zlib.compress(data, 6)
+        blocks.append(compressed)
+        header["blocks"][name] = [offset, len(compressed)]
+
+    for name, values in segment.columns.items():
+        add(name, values.tobytes())
+    for name, values in segment.dictionaries.items():
+        add(f"dict:{name}", json.dumps(values).encode())
+    for name, values in segment.text.items():
+        add(name, json.dumps(values).encode())
+
+    encoded = json.dumps(header).encode()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(encoded)))
+        f.write(encoded)
+        for block in blocks:
+            f.write(block)
+
+
+def _read_wcol(path: str, columns: Iterable[str]) -> Segment:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not an event segment: {path}")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+        start = f.tell()
+
+        def block(name: str) -> bytes:
+            offset, size = header["blocks"][name]
+            f.seek(start + offset)
+            return zlib.decompress(f.read(size))
+
+        segment = Segment(rows=header["rows"])
+        for name in columns:
+            if name in TEXT_COLUMNS:
+                segment.text[name] = json.loads(block(name))
+                continue
+            values = array("i")
+            values.frombytes(block(name))
+            if header["byteorder"] != sys.byteorder:
+                values.byteswap()
+            segment.columns[name] = values
+            if name in DICT_COLUMNS:
+                segment.dictionaries[name] = json.loads(block(f"dict:{name}"))
+        return segment
+
+
+def _write_parquet(path: str, segment: Segment):
+    arrays = {}
+    for name in DICT_COLUMNS:
+        indices = pa.array([code if code >= 0 else None for code in segment.columns[name]], type=pa.int32())
+        arrays[name] = pa.DictionaryArray.from_arrays(indices, pa.array(segment.dictionaries[name], type=pa.string()))
+    for name in INT_COLUMNS:
+        arrays[name] = pa.array(segment.columns[name], type=pa.int32())
+    for name in TEXT_COLUMNS:
+        arrays[name] = pa.array(segment.text[name], type=pa.string())
+    # One row group, so the segment reads back with a single dictionary per column
+    pq.write_table(pa.table(arrays), path, compression="zstd", row_group_size=max(1, segment.rows))
+
+
+def _read_parquet(path: str, columns: Iterable[str]) -> Segment:
+    columns = list(columns)
+    table = pq.read_table(path, columns=columns)
+    segment = Segment(rows=table.num_rows)
+    for name in columns:
+        column = table.column(name).combine_chunks()
+        if name in TEXT_COLUMNS:
+            segment.text[name] = column.to_pylist()
+        elif name in DICT_COLUMNS:
+            segment.columns[name] = array("i", column.indices.fill_null(-1).to_pylist())
+            segment.dictionaries[name] = column.dictionary.to_pylist()
+        else:
+            segment.columns[name] = array("i", column.to_pylist())
+    return segment
+
+
+def default_format() -> str:
+    """Parquet when pyarrow is installed, otherwise the stdlib format"""
+    return "parquet" if pa is not None else "wcol"
+
+
+def write_segment(path: str, segment: Segment):
+    if path.endswith(".parquet"):
+        if pa is None:
+            raise ImportError("Parquet event segments require the pyarrow package")
+        _write_parquet(path, segment)
+    else:
+        _write_wcol(path, segment)
+
+
+def read_segment(path: str, columns: Iterable[str] = COLUMNS) -> Segment:
+    if path.endswith(".parquet"):
+        if pa is None:
+            raise ImportError("Parquet event segments require the pyarrow package")
+        return _read_parquet(path, columns)
+    return _read_wcol(path, columns)
@@ -0,0 +1,305 @@
+from src.analytics.columnar import Segment, SegmentBuilder, default_format, read_segment, write_segment
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import argparse
+import glob
+import gzip
+import io
+import json
+import os
+
+# Where each event keeps its acting player, target player, low-cardinality label and free text
+EVENT_FIELDS = {
+    "player_introduction": ("player", None, None, "content"),
+    "role_assigned": ("player", None, "role", None),
+    "werewolf_deliberation": ("player", None, None, "message"),
+    "werewolf_vote": ("voter", "target", "method", "vote"),
+    "village_vote": ("voter", "target", "method", "vote"),
+    "werewolf_kill": (None, "victim", None, None),
+    "player_exiled": (None, "player", None, None),
+    "player_discussion": ("player", None, None, "message"),
+    "game_end": (None, None, "winner", "message"),
+    "llm_usage": ("player", None, "model", None),
+    "llm_call": ("player", None, "model", None),
+    "day_summary": (None, None, None, "summary"),
+}
+
+VOTE_EVENTS = {"werewolf_vote", "village_vote"}
+
+
+def open_log(path: str):
+    """A game log as a binary stream, decompressing it if it was compressed when the game ended"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading zstd logs requires the zstandard package")
+        # Buffered, since the zstd reader can't split lines itself
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return open(path, "rb")
+
+
+def read_log(path: str) -> Iterator[dict]:
+    with open_log(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def log_paths(paths: Iterable[str]) -> List[str]:
+    """Game logs from a list of files and directories of them"""
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            logs.extend(sorted(glob.glob(os.path.join(path, "*.jsonl*"))))
+        else:
+            logs.append(path)
+    return logs
+
+
+def game_id_for(path: str) -> str:
+    return os.path.basename(path).split(".")[0]
+
+
+def resolve_vote(vote: str, names: List[str]) -> Optional[str]:
+    """The player a vote in an older log was for, matched the way the orchestrator used to"""
+    vote = vote.strip().lower()
+    if not vote:
+        return None
+    for name in names:
+        if vote in name.lower():
+            return name
+    return None
+
+
+def model_of(player: str, models: Dict[str, str]) -> str:
+    # Players are named "<name> - <model alias>" unless their introduction failed
+    if player in models:
+        return models[player]
+    return player.rsplit(" - ", 1)[1] if " - " in player else "unknown"
+
+
+class EventStore:
+    """
+    Game events in columnar segments, for analytics over many games.
+
+    ingest() converts game logs into segments of up to segment_size rows (games never
+    span segments), and records which logs it has read, so it can be re-run as new games
+    finish. Player names, models, event types and game ids are dictionary-encoded, and
+    free text is kept in its own column, which the aggregate queries never read.
+    """
+
+    def __init__(self, directory: str = "event_store", format: str = None, segment_size: int = 1_000_000):
+        self.directory = directory
+        self.format = format or default_format()
+        self.segment_size = segment_size
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"segments": [], "ingested": []}
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _add_game(self, builder: SegmentBuilder, path: str) -> bool:
+        """Add a game's events, or return False without adding any if it hasn't ended yet"""
+        game = game_id_for(path)
+        day = 0
+        names: List[str] = []
+        rows = []
+        try:
+            for seq, event in enumerate(read_log(path)):
+                kind = event.get("event")
+                data = event.get("data") or {}
+                if kind == "night_phase_start":
+                    day += 1
+                if kind == "role_assigned":
+                    names.append(data.get("player"))
+
+                actor, target, label, text = EVENT_FIELDS.get(kind, (None, None, None, "message"))
+                target_value = data.get(target) if target else None
+                if kind in VOTE_EVENTS and "target" not in data:
+                    # Logs from before votes were resolved when cast
+                    target_value = resolve_vote(data.get("vote") or "", names)
+                rows.append(dict(
+                    game=game,
+                    event=kind,
+                    actor=data.get(actor) if actor else None,
+                    target=target_value,
+                    label=str(data[label]) if label and data.get(label) is not None else None,
+                    seq=seq,
+                    day=day,
+                    text=str(data.get(text) or "") if text else None,
+                ))
+        except json.JSONDecodeError:
+            return False  # The writer is part way through a line
+        if not any(row["event"] == "game_end" for row in rows):
+            return False
+
+        for row in rows:
+            builder.append(**row)
+        return True
+
+    def _write(self, builder: SegmentBuilder, logs: List[str]):
+        name = f"segment_{len(self.manifest['segments']):06d}.{self.format}"
+        write_segment(os.path.join(self.directory, name), builder.build())
+        self.manifest["segments"].append(name)
+        self.manifest["ingested"].extend(game_id_for(p) for p in logs)
+        self._save_manifest()
+
+    def ingest(self, paths: Iterable[str]) -> int:
+        """
+        Add game logs (files or directories of them) not already in the store, returning
+        how many were added. Games are told apart by id, so a log compressed since it was
+        ingested isn't added again, and games still being played are left for a later run.
+        """
+        logs = log_paths(paths)
+        # Older manifests list log file names, which have the game id too
+        seen = {game_id_for(name) for name in self.manifest["ingested"]}
+        builder, pending, added = SegmentBuilder(), [], 0
+        for path in logs:
+            game = game_id_for(path)
+            # It may have just been compressed
+            if game in seen or not os.path.exists(path) or not self._add_game(builder, path):
+                continue
+            seen.add(game)
+            pending.append(path)
+            added += 1
+            if builder.rows >= self.segment_size:
+                self._write(builder, pending)
+                builder, pending = SegmentBuilder(), []
+        if pending:
+            self._write(builder, pending)
+        return added
+
+    def segments(self, columns: Iterable[str]) -> Iterator[Segment]:
+        for name in self.manifest["segments"]:
+            yield read_segment(os.path.join(self.directory, name), columns)
+
+    def rows(self, columns: Iterable[str] = ("game", "seq", "day", "event", "actor", "target", "label", "text")) -> Iterator[dict]:
+        """Decoded rows, eg. to export back to events"""
+        columns = list(columns)
+        for segment in self.segments(columns):
+            for i in range(segment.rows):
+                yield {
+                    name: segment.text[name][i] if name in segment.text
+                    else segment.value(name, segment.columns[name][i]) if name in segment.dictionaries
+                    else segment.columns[name][i]
+                    for name in columns
+                }
+
+    def _games(self, events: Iterable[str]) -> Iterator[dict]:
+        """
+        Per-game facts from the given events only, read straight from the code columns:
+        roles, models, winner, deaths and votes by player name.
+        """
+        wanted = set(events) | {"role_assigned", "llm_usage", "game_end"}
+        for segment in self.segments(["game", "event", "actor", "target", "label", "day"]):
+            codes = segment.codes("event", wanted)
+            event_names = segment.dictionaries["event"]
+            game_col, event_col = segment.columns["game"], segment.columns["event"]
+            actor, target, label, day = (segment.columns[c] for c in ("actor", "target", "label", "day"))
+            players, labels = segment.dictionaries["actor"], segment.dictionaries["label"]
+            targets = segment.dictionaries["target"]
+
+            games: Dict[int, dict] = {}
+            for i in range(segment.rows):
+                code = event_col[i]
+                if code not in codes:
+                    continue
+                game = games.setdefault(game_col[i], {
+                    "roles": {}, "models": {}, "winner": None, "deaths": {}, "votes": [], "days": 0,
+                })
+                game["days"] = max(game["days"], day[i])
+                kind = event_names[code]
+                if kind == "role_assigned":
+                    game["roles"][players[actor[i]]] = labels[label[i]]
+                elif kind == "llm_usage" and actor[i] >= 0:
+                    game["models"][players[actor[i]]] = labels[label[i]]
+                elif kind == "game_end":
+                    game["winner"] = labels[label[i]]
+                elif kind in ("werewolf_kill", "player_exiled") and target[i] >= 0:
+                    game["deaths"][targets[target[i]]] = day[i]
+                elif kind in VOTE_EVENTS and actor[i] >= 0:
+                    game["votes"].append((kind, players[actor[i]], targets[target[i]] if target[i] >= 0 else None))
+            yield from games.values()
+
+    def win_rates(self) -> Dict[Tuple[str, str], dict]:
+        """Games played and won by each (model, role)"""
+        stats = defaultdict(lambda: {"games": 0, "wins": 0})
+        for game in self._games([]):
+            if game["winner"] is None:
+                continue
+            for player, role in game["roles"].items():
+                entry = stats[(model_of(player, game["models"]), role)]
+                entry["games"] += 1
+                entry["wins"] += (role == "werewolf") == (game["winner"] == "Werewolves")
+        return {key: {**value, "win_rate": value["wins"] / value["games"]} for key, value in stats.items()}
+
+    def votes_against_werewolves(self) -> Dict[Tuple[str, str], dict]:
+        """Village votes cast by each (model, role), and how many of them were for a werewolf"""
+        stats = defaultdict(lambda: {"votes": 0, "against_werewolves": 0})
+        for game in self._games(["village_vote"]):
+            for kind, voter, target in game["votes"]:
+                if kind != "village_vote" or voter not in game["roles"]:
+                    continue
+                entry = stats[(model_of(voter, game["models"]), game["roles"][voter])]
+                entry["votes"] += 1
+                entry["against_werewolves"] += game["roles"].get(target) == "werewolf"
+        return {key: {**value, "rate": value["against_werewolves"] / value["votes"]} for key, value in stats.items()}
+
+    def survival_by_round(self) -> Dict[str, List[float]]:
+        """
+        For each role, the share of players still alive at the end of each round (a
+        night and the following day), among games that lasted that many rounds.
+        """
+        alive = defaultdict(lambda: defaultdict(int))
+        total = defaultdict(lambda: defaultdict(int))
+        for game in self._games(["werewolf_kill", "player_exiled", "night_phase_start"]):
+            for round_number in range(1, game["days"] + 1):
+                for player, role in game["roles"].items():
+                    total[role][round_number] += 1
+                    died = game["deaths"].get(player)
+                    alive[role][round_number] += died is None or died > round_number
+        return {
+            role: [alive[role][r] / total[role][r] for r in sorted(total[role])]
+            for role in total
+        }
+
+
+def print_report(store: EventStore):
+    print("Win rate by model and role:")
+    for (model, role), stats in sorted(store.win_rates().items()):
+        print(f"  {model:12} {role:9} {stats['wins']}/{stats['games']} ({stats['win_rate']:.0%})")
+
+    print("Village votes cast against werewolves:")
+    for (model, role), stats in sorted(store.votes_against_werewolves().items()):
+        print(f"  {model:12} {role:9} {stats['against_werewolves']}/{stats['votes']} ({stats['rate']:.0%})")
+
+    print("Survival by round:")
+    for role, rates in sorted(store.survival_by_round().items()):
+        print(f"  {role:9} " + " ".join(f"{rate:.0%}" for rate in rates))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert game logs to a columnar event store and query it")
+    parser.add_argument("command", choices=["ingest", "report"])
+    parser.add_argument("paths", nargs="*", default=["game_logs"], help="Game logs, or directories of them, to ingest")
+    parser.add_argument("--store", default="event_store")
+    parser.add_argument("--format", choices=["parquet", "wcol"], help="Segment format (default: parquet if pyarrow is installed)")
+    args = parser.parse_args()
+
+    store = EventStore(args.store, format=args.format)
+    if args.command == "ingest":
+        print(f"Ingested {store.ingest(args.paths)} game logs into {args.store}")
+    else:
+        print_report(store)
@@ -0,0 +1,240 @@
+from src.analytics.events import game_id_for, log_paths, model_of, open_log
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import argparse
+import json
+import math
+import os
+import time
+
+MU = 25.0
+SIGMA = MU / 3
+BETA = MU / 6  # Performance noise: a BETA lead gives about a 76% chance of winning
+TAU = MU / 300  # Added to sigma before each game, so ratings can keep moving
+Z_95 = 1.96
+
+FACTIONS = {"werewolf": "Werewolves", "villager": "Villagers"}
+
+
+@dataclass
+class Rating:
+    mu: float = MU
+    sigma: float = SIGMA
+    games: int = 0
+    wins: int = 0
+
+    def interval(self, z: float = Z_95) -> Tuple[float, float]:
+        return self.mu - z * self.sigma, self.mu + z * self.sigma
+
+
+def _pdf(x: float) -> float:
+    return math.exp(-x * x / 2) / math.sqrt(2 * math.pi)
+
+
+def _cdf(x: float) -> float:
+    return (1 + math.erf(x / math.sqrt(2))) / 2
+
+
+def rate_match(winners: List[Tuple[Rating, float]], losers: List[Tuple[Rating, float]]):
+    """
+    TrueSkill update for a two-team game without draws, in place. Teams are lists of
+    (rating, weight); a team's performance is the weighted sum of its members'.
+    """
+    for rating, _ in winners + losers:
+        rating.sigma = math.sqrt(rating.sigma ** 2 + TAU ** 2)
+
+    mu_difference = sum(r.mu * w for r, w in winners) - sum(r.mu * w for r, w in losers)
+    c = math.sqrt(sum((r.sigma * w) ** 2 for r, w in winners + losers) + 2 * BETA ** 2)
+    t = mu_difference / c
+    v = _pdf(t) / max(_cdf(t), 1e-12)
+    shrink = v * (v + t)
+
+    for team, sign in ((winners, 1), (losers, -1)):
+        for rating, weight in team:
+            variance = rating.sigma ** 2
+            rating.mu += sign * weight * variance / c * v
+            rating.sigma = math.sqrt(variance * max(1 - (weight ** 2) * variance / c ** 2 * shrink, 1e-6))
+
+
+def expected_variance_reductions(team_a: List[Tuple[Rating, float]], team_b: List[Tuple[Rating, float]]) -> List[float]:
+    """
+    How much a game between two teams is expected to shrink each member's variance
+    (team_a's members, then team_b's), averaging the update for either result by its
+    predicted probability. Uncertain ratings and close matches learn the most.
+    """
+    members = team_a + team_b
+    variances = [r.sigma ** 2 + TAU ** 2 for r, _ in members]
+    c2 = sum(v * w ** 2 for v, (_, w) in zip(variances, members)) + 2 * BETA ** 2
+    t = (sum(r.mu * w for r, w in team_a) - sum(r.mu * w for r, w in team_b)) / math.sqrt(c2)
+
+    def shrink(x: float) -> float:
+        v = _pdf(x) / max(_cdf(x), 1e-12)
+        return v * (v + x)
+
+    expected_shrink = _cdf(t) * shrink(t) + _cdf(-t) * shrink(-t)
+    return [v ** 2 * w ** 2 / c2 * expected_shrink for v, (_, w) in zip(variances, members)]
+
+
+class RatingEngine:
+    """
+    Incremental TrueSkill ratings for each model, and each model in each role.
+
+    Each finished game is one match between the werewolves and the villagers. A team's
+    performance is the mean of its players' ratings. For the per-model ratings it also
+    includes a rating for the faction itself, which absorbs how much easier one side is
+    to win with - so models aren't credited for the role they were dealt.
+
+    update() reads new events only: it keeps a byte offset into each game's log, so a
+    game in progress is picked up where it was left, including after its log has been
+    compressed. Ratings and offsets are saved to state_path after every update, so
+    the leaderboard can be refreshed while tournaments are still writing logs.
+    """
+
+    def __init__(self, state_path: Optional[str] = "ratings.json"):
+        self.state_path = state_path
+        self.models: Dict[str, Rating] = {}
+        self.roles: Dict[str, Rating] = {}  # "<model>/<role>"
+        self.factions: Dict[str, Rating] = {}
+        self.logs: Dict[str, dict] = {}  # game id -> {"offset", "roles"} until it ends, then {"done": True}
+        if state_path and os.path.exists(state_path):
+            self.load()
+
+    def load(self):
+        with open(self.state_path) as f:
+            state = json.load(f)
+        for name in ("models", "roles", "factions"):
+            setattr(self, name, {key: Rating(**value) for key, value in state[name].items()})
+        self.logs = state["logs"]
+
+    def save(self):
+        if not self.state_path:
+            return
+        state = {
+            name: {key: asdict(rating) for key, rating in getattr(self, name).items()}
+            for name in ("models", "roles", "factions")
+        }
+        state["logs"] = self.logs
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def copy(self) -> "RatingEngine":
+        """The current ratings, without log offsets or a state file, eg. to plan games against"""
+        engine = RatingEngine(state_path=None)
+        for name in ("models", "roles", "factions"):
+            setattr(engine, name, {key: replace(rating) for key, rating in getattr(self, name).items()})
+        return engine
+
+    def update(self, paths: Iterable[str]) -> int:
+        """Read new events from the given logs (or directories of them), returning how many games were rated"""
+        rated = 0
+        for path in log_paths(paths):
+            log = self.logs.setdefault(game_id_for(path), {"offset": 0, "roles": {}})
+            if not log.get("done") and os.path.exists(path):  # It may have just been compressed
+                rated += self._read(path, log)
+        self.save()
+        return rated
+
+    def _read(self, path: str, log: dict) -> int:
+        with open_log(path) as f:
+            if path.endswith(".jsonl"):
+                f.seek(log["offset"])
+            else:
+                f.read(log["offset"])  # Compressed logs can't seek; skip what was read before compression
+
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # The writer is part way through this line - read it next time
+                log["offset"] += len(line)
+                if not line.strip():
+                    continue
+
+                event = json.loads(line)
+                data = event.get("data") or {}
+                if event.get("event") == "role_assigned":
+                    log["roles"][data["player"]] = data["role"]
+                elif event.get("event") == "game_end":
+                    self.rate_game(log["roles"], data["winner"])
+                    log.clear()
+                    log["done"] = True
+                    return 1
+        return 0
+
+    def rate_game(self, roles: Dict[str, str], winner: str):
+        """Update the ratings for a finished game, given each player's role and the winning faction"""
+        teams = {faction: [] for faction in FACTIONS.values()}
+        for player, role in roles.items():
+            teams[FACTIONS[role]].append((model_of(player, {}), role))
+        if not all(teams.values()):
+            return
+
+        for by_role in (False, True):
+            sides = self.sides(teams, by_role, create=True)
+            loser = next(faction for faction in sides if faction != winner)
+            rate_match(sides[winner], sides[loser])
+
+            played = {id(rating): rating for rating, _ in sides[winner] + sides[loser]}
+            won = {id(rating) for rating, _ in sides[winner]}
+            for rating in played.values():
+                rating.games += 1
+                rating.wins += id(rating) in won
+
+    def sides(
+        self, teams: Dict[str, List[Tuple[str, str]]], by_role: bool = False, create: bool = False
+    ) -> Dict[str, List[Tuple[Rating, float]]]:
+        """
+        The weighted ratings on each side of a game, given each faction's (model, role)
+        seats. Per model, each side includes its faction's rating; per role, the side is
+        part of the rating already. Unrated models get a default rating, which is only
+        stored when create is set.
+        """
+        ratings = self.roles if by_role else self.models
+        sides = {}
+        for faction, members in teams.items():
+            # Seats held by the same model share one rating, weighted by their share of the team
+            weights: Dict[str, float] = {}
+            for model, role in members:
+                key = f"{model}/{role}" if by_role else model
+                weights[key] = weights.get(key, 0.0) + 1 / len(members)
+            sides[faction] = [
+                (ratings.setdefault(key, Rating()) if create else ratings.get(key, Rating()), weight)
+                for key, weight in weights.items()
+            ]
+            if not by_role:
+                faction_rating = self.factions.setdefault(faction, Rating()) if create else self.factions.get(faction, Rating())
+                sides[faction].append((faction_rating, 1.0))
+        return sides
+
+    def leaderboard(self, by_role: bool = False) -> List[Tuple[str, Rating]]:
+        """Ratings ranked by their conservative estimate, the lower end of the 95% interval"""
+        ratings = self.roles if by_role else self.models
+        return sorted(ratings.items(), key=lambda item: -item[1].interval()[0])
+
+
+def print_leaderboard(engine: RatingEngine, by_role: bool = False):
+    print(f"{'model':24} {'rating':>7} {'95% interval':>17} {'games':>6} {'wins':>6}")
+    for name, rating in engine.leaderboard(by_role):
+        low, high = rating.interval()
+        print(f"{name:24} {rating.mu:7.2f} {low:8.2f}-{high:<8.2f} {rating.games:6} {rating.wins:6}")
+    for faction, rating in sorted(engine.factions.items()):
+        print(f"  {faction} advantage: {rating.mu - MU:+.2f} over {rating.games} games")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate models from game logs, updating as new games finish")
+    parser.add_argument("paths", nargs="*", default=["game_logs"], help="Game logs, or directories of them")
+    parser.add_argument("--state", default="ratings.json", help="Where ratings and log offsets are kept between runs")
+    parser.add_argument("--by-role", action="store_true", help="Rank each model in each role separately")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Keep reading new games at this interval")
+    args = parser.parse_args()
+
+    engine = RatingEngine(args.state)
+    while True:
+        rated = engine.update(args.paths)
+        print(f"\n{rated} new games rated")
+        print_leaderboard(engine, args.by_role)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,23 @@
+from dotenv import load_dotenv
+from typing import Optional
+
+import os
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_config():
+    """Read .env into the environment, once per process. Variables already set win over .env."""
+    global _loaded
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
+
+
+def getenv(name: str, default: Optional[str] = None) -> Optional[str]:
+    """An environment variable, after .env has been loaded"""
+    load_config()
+    return os.getenv(name, default)
@@ -0,0 +1,381 @@
+from src.game.orchestrator import GameOrchestrator
+from src.game.conversation import GameMessage
+from src.game.narrator import Narrator
+from src.game.logger import GameLogger
+from src.game.roles import BasePlayer
+from src.game.speakers import SpeakerPolicy
+from src.game.termination import TerminationPolicy
+from src.llms.base_client import StopPredicate
+from src.llms.instrumentation import set_phase
+from src.llms.tokens import estimate_text_tokens, estimate_tokens
+from collections import Counter
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+import asyncio
+import random
+import time
+
+
+@dataclass
+class SpeculativeCall:
+    """A player's call made before knowing whether it's needed, on a fork of the player"""
+    player: BasePlayer
+    input_tokens: int  # Estimated
+    task: asyncio.Task = None
+    sent: bool = False  # Whether it got past the concurrency limit, so the provider saw it
+    finished: Optional[float] = None
+
+
+class AsyncGameOrchestrator(GameOrchestrator):
+    """
+    Runs the same game as GameOrchestrator, but issues independent LLM calls concurrently.
+
+    Calls that have to see each other's output (discussion turns, werewolf deliberation)
+    stay sequential. Votes and narrator announcements that don't depend on the current
+    phase are issued together, bounded by max_concurrency in-flight calls per game.
+
+    Introductions are all requested at once, so unlike the sync game no player is told
+    which names are already taken. A player whose name collides with an earlier one's
+    is asked again, with every other player's name to avoid, up to MAX_NAME_RETRIES
+    times before getting a default name.
+
+    With speculate, whenever the narrator's LLM judges whether discussion is over, the
+    next round's first turn and everyone's votes are requested at the same time, and
+    the branch the narrator didn't choose is cancelled. Each judgement logs the
+    latency this saved and the (estimated) tokens it wasted, per model. Only games
+    whose players' clients can cancel a call speculate, since a call running in a
+    worker thread carries on (and is paid for) after it's cancelled.
+    """
+    MAX_NAME_RETRIES = 3
+
+    def __init__(
+        self,
+        players: List[BasePlayer],
+        narrator: Narrator,
+        logger: GameLogger,
+        max_concurrency: int = 8,
+        rng: random.Random = None,
+        on_checkpoint: Optional[Callable[[dict], None]] = None,
+        roles: Optional[List[str]] = None,
+        speakers: Optional[SpeakerPolicy] = None,
+        termination: Optional[TerminationPolicy] = None,
+        speculate: bool = False,
+        structured_output: bool = True,
+    ):
+        super().__init__(
+            players, narrator, logger, rng=rng, on_checkpoint=on_checkpoint, roles=roles, speakers=speakers,
+            termination=termination, structured_output=structured_output,
+        )
+        self.max_concurrency = max_concurrency
+        self._semaphore = None  # Created on the running event loop
+        self.speculate = speculate
+        self.speculation = {
+            "judgements": 0,
+            "votes": 0,  # Judgements that ended discussion
+            "saved_seconds": 0.0,
+            "saved_seconds_by_model": {},  # Narrator model -> seconds
+            "wasted_tokens": 0,
+            "wasted_tokens_by_model": {},  # Player model -> tokens
+        }
+
+    async def _call(self, coro):
+        async with self._semaphore:
+            return await coro
+
+    async def _gather(self, coros):
+        return await asyncio.gather(*[self._call(c) for c in coros])
+
+    async def run(self):
+        try:
+            return await self._play()
+        except BaseException as e:
+            self.logger.log({"event": "game_error", "data": {"error": repr(e)}})
+            self.logger.compression = None
+            raise
+        finally:
+            self.logger.close()
+
+    async def _play(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self.next_phase is None:
+            self.logger.log({"event": "game_start"})
+            await self.introduction_phase()
+            self.role_assignment_phase()
+            self._checkpoint("night")
+        else:
+            self._log_resume()
+
+        while not self.game_state.is_game_over():
+            if self.next_phase == "night":
+                self.conversation.start_day()
+                if self._needs_summary():
+                    self._store_summary(await self._call(self.narrator.summarize_day_async(*self._summary_request())))
+
+                self.logger.log({"event": "night_phase_start"})
+                await self.night_phase()
+                self._checkpoint("day")
+            else:
+                self.logger.log({"event": "day_phase_start"})
+                await self.day_phase()
+                self._checkpoint("night")
+
+        return self.end_game()
+
+    async def introduction_phase(self):
+        self.logger.log({"event": "introduction_phase_start"})
+        set_phase("intro")
+
+        # Everyone introduces themselves at once, then anyone who collided with an
+        # earlier player's name re-introduces with everyone else's names to avoid.
+        intros = await self._gather([p.introduce_async(structured=self.structured_output) for p in self.players])
+        taken = set()
+        for seat, (player, intro) in enumerate(zip(self.players, intros)):
+            for _ in range(self.MAX_NAME_RETRIES):
+                if player.name.lower() not in taken:
+                    break
+                intro = await self._call(player.introduce_async(
+                    existing_names=[p.name for p in self.players if p is not player and p.name],
+                    structured=self.structured_output,
+                ))
+            # Still colliding after every retry
+            intro = self._unique_introduction(player, seat, intro, taken)
+
+            self._record_introduction(player, intro)
+
+        self._end_introduction_phase()
+
+    async def night_phase(self):
+        set_phase("night")
+
+        # Dawn doesn't depend on anything that happens tonight, so fetch it in the background
+        dawn = asyncio.create_task(self._call(self.narrator.announce_dawn_async()))
+
+        # Announce night falling
+        self._record_night_start(await self._call(self.narrator.announce_night_async()))
+
+        # Werewolves choose victim
+        werewolves = [p for p in self.players if p.role == "werewolf" and p.is_alive]
+        if werewolves:
+            # Let werewolves deliberate - each wolf sees the earlier wolves' suggestions
+            for wolf in werewolves:
+                decision = await self._call(wolf.get_message_async(
+                    self.conversation.get_player_history(wolf.name),
+                    [p.name for p in self.players if p.is_alive]
+                ))
+                self._record_werewolf_deliberation(wolf, decision)
+
+            victim = await self._conduct_werewolf_vote(werewolves)
+            self._kill_werewolf_victim(victim)
+
+        # Announce night ending
+        self._record_dawn(await dawn)
+
+    async def _conduct_werewolf_vote(self, werewolves: List[BasePlayer]) -> BasePlayer:
+        """Conducts vote among werewolves to choose victim, all werewolves voting at once"""
+        if not werewolves:
+            return None
+
+        names = [p.name for p in self.players if p.is_alive]
+        stop = self._vote_stop(names)
+        ballots = await self._gather([
+            wolf.vote_async(self.conversation.get_player_history(wolf.name), names, stop=stop)
+            for wolf in werewolves
+        ])
+
+        votes, candidates = Counter(), set(names)
+        for wolf, vote in zip(werewolves, ballots):
+            self._record_vote(votes, "werewolf_vote", wolf, vote, candidates)
+
+        return self._resolve_vote(votes, "werewolf_vote")
+
+    async def _conduct_vote(self, ballots: Optional[List[str]] = None) -> Optional[BasePlayer]:
+        """Conducts village vote to exile a player, all living players voting at once (unless they already have)"""
+        set_phase("vote")
+        living_players = [p for p in self.players if p.is_alive]
+        names = [p.name for p in living_players]
+        if ballots is None:
+            vote_prompt = self._vote_prompt(living_players)
+            stop = self._vote_stop(names)
+            ballots = await self._gather([
+                player.vote_async(self.conversation.get_player_history(player.name), names, prompt=vote_prompt, stop=stop)
+                for player in living_players
+            ])
+
+        votes, candidates = Counter(), set(names)
+        for player, vote in zip(living_players, ballots):
+            self._record_vote(votes, "village_vote", player, vote, candidates)
+
+        return self._resolve_vote(votes, "village_vote")
+
+    async def day_phase(self):
+        set_phase("discussion")
+
+        # Announce deaths
+        self._record_deaths(await self._call(self.narrator.announce_deaths_async(self.game_state.last_deaths)))
+
+        # The vote call is the same whenever discussion ends, so fetch it during discussion
+        vote_announcement = asyncio.create_task(self._call(self.narrator.announce_vote_async()))
+
+        self._start_discussion()
+        discussion_ended, next_round, vote = False, None, None
+        while not discussion_ended:
+            await self._conduct_discussion(*(next_round or ()))
+
+            discussion_ended = self._discussion_verdict().end
+            if discussion_ended is None:
+                history = self.conversation.get_player_history("narrator")
+                judge = self._call(self.narrator.should_start_vote_async(history))
+                # Only worth it while the narrator has to wait on its LLM
+                if self._can_speculate() and self.narrator.judgement_needed(history):
+                    discussion_ended, next_round, vote = await self._speculate(judge, vote_announcement)
+                else:
+                    discussion_ended = await judge
+
+        announcement, ballots = vote or (None, None)
+        self._record_vote_announcement(await vote_announcement, announcement)
+
+        exile = await self._conduct_vote(ballots)
+        if exile:
+            self._exile_player(exile)
+
+    async def _conduct_discussion(self, speakers: Optional[List[BasePlayer]] = None, first_response: str = None):
+        # Discussion turns are sequential - each player responds to what was said before them
+        for i, player in enumerate(speakers or self._speakers()):
+            if i == 0 and first_response is not None:
+                response = first_response  # Requested while the narrator judged the last round
+            else:
+                response = await self._call(player.get_message_async(self.conversation.get_player_history(player.name)))
+            self._record_discussion(player, response)
+
+    def _can_speculate(self) -> bool:
+        """Whether the branch the narrator doesn't choose can be cancelled, rather than paid for in full"""
+        return self.speculate and all(p.llm.cancellable for p in self.players if p.is_alive)
+
+    def _speculative_call(
+        self,
+        player: BasePlayer,
+        history: Sequence[GameMessage],
+        names: Optional[List[str]] = None,
+        prompt: GameMessage = None,
+        vote: bool = False,
+        stop: StopPredicate = None,
+    ) -> SpeculativeCall:
+        # The fork keeps the player's prompt builder untouched unless this branch is kept
+        fork = player.fork()
+        call = SpeculativeCall(fork, estimate_tokens(fork.build_messages(history, names, prompt)))
+
+        async def send():
+            async with self._semaphore:
+                call.sent = True
+                if vote:
+                    return await fork.vote_async(history, names, prompt, stop)
+                return await fork.get_message_async(history, names, prompt)
+
+        call.task = asyncio.create_task(send())
+        call.task.add_done_callback(lambda _: setattr(call, "finished", time.monotonic()))
+        return call
+
+    async def _speculate(
+        self, judge: Awaitable[bool], vote_announcement: Awaitable[str]
+    ) -> Tuple[bool, Optional[tuple], Optional[tuple]]:
+        """
+        Wait for the narrator's judgement while already requesting the next round's first
+        turn and every player's vote. Returns whether discussion is over, then the next
+        round's speakers and first response if it isn't, or the vote announcement message
+        and ballots if it is.
+        """
+        started = time.monotonic()
+        judge = asyncio.create_task(judge)
+        calls: List[SpeculativeCall] = []
+        try:
+            # Choosing speakers uses the game's RNG, so it's rewound if the round doesn't happen
+            rng_state, turns = self.rng.getstate(), dict(self.speakers.turns)
+            speakers = self._speakers()
+            turn = self._speculative_call(speakers[0], self.conversation.get_player_history(speakers[0].name))
+            calls.append(turn)
+
+            living_players = [p for p in self.players if p.is_alive]
+            names = [p.name for p in living_players]
+            vote_prompt, stop = self._vote_prompt(living_players), self._vote_stop(names)
+            # Requested when the day started, so it's usually ready by now
+            announcement = self._vote_announcement_message(await vote_announcement)
+            set_phase("vote")  # Only for the ballot tasks, which copy the phase when created
+            ballots = [
+                self._speculative_call(
+                    p, list(self.conversation.get_player_history(p.name)) + [announcement],
+                    names=names, prompt=vote_prompt, vote=True, stop=stop,
+                )
+                for p in living_players
+            ]
+            calls += ballots
+            set_phase("discussion")
+
+            ended = await judge
+            judged = time.monotonic() - started
+
+            kept, lost = (ballots, [turn]) if ended else ([turn], ballots)
+            for call in lost:
+                call.task.cancel()
+            results = await asyncio.gather(*[call.task for call in kept])
+            await asyncio.gather(*[call.task for call in lost], return_exceptions=True)
+        finally:
+            # Whatever went wrong, nothing is left running (tasks that finished ignore this)
+            judge.cancel()
+            for call in calls:
+                call.task.cancel()
+
+        if ended:
+            self.rng.setstate(rng_state)
+            self.speakers.turns = turns
+            for player, call in zip(living_players, ballots):
+                player.prompt = call.player.prompt
+                player.invalid_responses = call.player.invalid_responses
+        else:
+            speakers[0].prompt = turn.player.prompt
+        self._record_speculation(ended, judged, max(call.finished or time.monotonic() for call in kept) - started, lost)
+
+        if ended:
+            return True, None, (announcement, results)
+        return False, (speakers, results[0]), None
+
+    def _record_speculation(self, ended: bool, judged: float, branch: float, lost: List[SpeculativeCall]):
+        # Without speculation the kept branch would have started after the judgement
+        saved = min(judged, branch)
+        wasted = {}
+        for call in lost:
+            tokens = call.input_tokens if call.sent else 0
+            if call.task.done() and not call.task.cancelled() and call.task.exception() is None:
+                tokens += estimate_text_tokens(call.task.result())
+            wasted[call.player.model] = wasted.get(call.player.model, 0) + tokens
+
+        stats = self.speculation
+        stats["judgements"] += 1
+        stats["votes"] += ended
+        stats["saved_seconds"] += saved
+        narrator_model = self.narrator.llm.model_alias
+        stats["saved_seconds_by_model"][narrator_model] = stats["saved_seconds_by_model"].get(narrator_model, 0.0) + saved
+        stats["wasted_tokens"] += sum(wasted.values())
+        for model, tokens in wasted.items():
+            stats["wasted_tokens_by_model"][model] = stats["wasted_tokens_by_model"].get(model, 0) + tokens
+
+        self.logger.log({
+            "event": "speculation",
+            "data": {
+                "day": self.conversation.day,
+                "kept": "vote" if ended else "discussion",
+                "judge_seconds": round(judged, 4),
+                "branch_seconds": round(branch, 4),
+                "saved_seconds": round(saved, 4),
+                "cancelled_calls": sum(call.task.cancelled() for call in lost),
+                "wasted_tokens": sum(wasted.values()),
+                "wasted_tokens_by_model": wasted,
+            },
+        })
+
+    def end_game(self) -> dict:
+        result = super().end_game()
+        if self.speculate:
+            result["speculation"] = self.speculation
+        return result
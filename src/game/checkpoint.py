@@ -0,0 +1,49 @@
+from typing import Optional
+
+import json
+import os
+
+
+class CheckpointStore:
+    """
+    Game snapshots and finished results on disk, keyed by game (the tournament uses seeds).
+
+    The orchestrator saves a snapshot at every phase boundary, so an interrupted game can
+    resume from its last completed phase. Once a game finishes its result is saved and
+    its snapshot removed, and tournaments skip games that already have a result.
+    Files are replaced atomically, so a crash mid-write leaves the previous snapshot.
+    """
+
+    def __init__(self, directory: str = "checkpoints"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, kind: str) -> str:
+        return os.path.join(self.directory, f"{key}.{kind}.json")
+
+    def _write(self, path: str, data: dict):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _read(self, path: str) -> Optional[dict]:
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, key, snapshot: dict):
+        self._write(self._path(key, "snapshot"), snapshot)
+
+    def load(self, key) -> Optional[dict]:
+        return self._read(self._path(key, "snapshot"))
+
+    def save_result(self, key, result: dict):
+        self._write(self._path(key, "result"), result)
+        snapshot = self._path(key, "snapshot")
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+
+    def load_result(self, key) -> Optional[dict]:
+        return self._read(self._path(key, "result"))
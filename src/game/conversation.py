@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from itertools import islice
 from typing import List, Dict
 
 @dataclass
@@ -6,28 +8,124 @@ class GameMessage:
     phase: str
     player: str
     content: str
-    visibility: str = "public"  # public, private, or narrator
+    visibility: str = "public"  # public, private, werewolf (the werewolf team channel), or narrator
+    day: int = 0  # Set when added to the conversation - 0 is introductions, each night starts a new day
+
+
+# Roles whose members share a private channel, keyed by the visibility used for it
+FACTION_CHANNELS = {"werewolf": "werewolf"}
+
+
+class HistoryView(Sequence):
+    """
+    Read-only view of the first `length` messages of a player's timeline.
+
+    Views share the underlying list rather than copying it, and keep showing the
+    history as it was when the view was taken, even as new messages are added.
+    """
+
+    def __init__(self, timeline: List[GameMessage], length: int):
+        self._timeline = timeline
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._timeline[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("history index out of range")
+        return self._timeline[index]
+
+    def __iter__(self):
+        return islice(self._timeline, self._length)
+
+    def __add__(self, other) -> List[GameMessage]:
+        return list(self) + list(other)
+
 
 class ConversationManager:
     def __init__(self):
         self.messages: List[GameMessage] = []
         self.player_roles: Dict[str, str] = {}
+        # Messages everyone can see, and each player's full visible timeline. Timelines
+        # hold references to the same GameMessage objects and are extended as messages
+        # are added, so reading a player's history never scans the whole game.
+        self.public: List[GameMessage] = []
+        self.timelines: Dict[str, List[GameMessage]] = {}
+        self.faction_members: Dict[str, List[str]] = {channel: [] for channel in FACTION_CHANNELS.values()}
+        self.day = 0
+        # Narrator summaries of finished days, used to shorten long prompts
+        self.day_summaries: Dict[int, str] = {}
+
+    def _timeline(self, player_name: str) -> List[GameMessage]:
+        if player_name not in self.timelines:
+            # A player we haven't tracked yet has only seen public messages so far
+            self.timelines[player_name] = list(self.public)
+        return self.timelines[player_name]
+
+    def start_day(self):
+        self.day += 1
+
+    def get_day_messages(self, day: int) -> List[GameMessage]:
+        """Public messages from one day"""
+        return [msg for msg in self.public if msg.day == day]
 
     def add_message(self, message: GameMessage):
+        message.day = self.day
         self.messages.append(message)
 
+        if message.visibility == "public":
+            self.public.append(message)
+            for timeline in self.timelines.values():
+                timeline.append(message)
+        elif message.visibility == "private":
+            self._timeline(message.player).append(message)
+        elif message.visibility in self.faction_members:
+            for member in self.faction_members[message.visibility]:
+                self._timeline(member).append(message)
+
     def assign_role(self, player_name: str, role: str):
         self.player_roles[player_name] = role
+        if role in FACTION_CHANNELS:
+            self.faction_members[FACTION_CHANNELS[role]].append(player_name)
         self.add_message(GameMessage(
             phase="role_assignment",
             player=player_name,
             content=f"You are a {role}",
             visibility="private"
         ))
-        
-    def get_player_history(self, player_name: str) -> List[GameMessage]:
-        return [
-            msg for msg in self.messages 
-            if msg.visibility == "public" or 
-               (msg.visibility == "private" and msg.player == player_name)
-        ]
\ No newline at end of file
+
+    def get_player_history(self, player_name: str) -> HistoryView:
+        timeline = self.timelines.get(player_name, self.public)
+        return HistoryView(timeline, len(timeline))
+
+    def to_dict(self) -> dict:
+        # Timelines and the public channel share message objects, so store them as indices
+        index = {id(msg): i for i, msg in enumerate(self.messages)}
+        return {
+            "messages": [asdict(msg) for msg in self.messages],
+            "public": [index[id(msg)] for msg in self.public],
+            "timelines": {name: [index[id(msg)] for msg in timeline] for name, timeline in self.timelines.items()},
+            "player_roles": self.player_roles,
+            "faction_members": self.faction_members,
+            "day": self.day,
+            "day_summaries": {str(day): summary for day, summary in self.day_summaries.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConversationManager":
+        conversation = cls()
+        conversation.messages = [GameMessage(**msg) for msg in data["messages"]]
+        conversation.public = [conversation.messages[i] for i in data["public"]]
+        conversation.timelines = {
+            name: [conversation.messages[i] for i in timeline] for name, timeline in data["timelines"].items()
+        }
+        conversation.player_roles = dict(data["player_roles"])
+        conversation.faction_members = {channel: list(members) for channel, members in data["faction_members"].items()}
+        conversation.day = data["day"]
+        conversation.day_summaries = {int(day): summary for day, summary in data["day_summaries"].items()}
+        return conversation
@@ -1,9 +1,15 @@
+from collections import Counter
+
+
 class GameState:
     def __init__(self, players: dict):  # players is dict of name -> role
         self.players = players
         self.living_players = set(players.keys())
         self.dead_players = set()
         self.last_deaths = set()
+        # Living players of each role, kept up to date as players die, so checking
+        # whether the game is over doesn't recount the lobby
+        self.living_counts = Counter(players.values())
         
     def kill_player(self, player):
         if player.name in self.living_players:
@@ -11,13 +17,31 @@ class GameState:
             self.living_players.remove(player.name)
             self.dead_players.add(player.name)
             self.last_deaths.add(player.name)
+            self.living_counts[self.players[player.name]] -= 1
         else:
             raise ValueError(f"Cannot kill player '{player.name}' - player is not alive")
 
+    def living(self, role: str) -> int:
+        return self.living_counts[role]
+
     def is_game_over(self) -> bool:
-        werewolves = sum(
-            1 for p in self.living_players 
-            if self.players[p] == "werewolf"
-        )
+        werewolves = self.living("werewolf")
         villagers = len(self.living_players) - werewolves
-        return werewolves == 0 or werewolves >= villagers
\ No newline at end of file
+        return werewolves == 0 or werewolves >= villagers
+
+    def to_dict(self) -> dict:
+        return {
+            "players": self.players,
+            "living_players": sorted(self.living_players),
+            "dead_players": sorted(self.dead_players),
+            "last_deaths": sorted(self.last_deaths),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GameState":
+        state = cls(dict(data["players"]))
+        state.living_players = set(data["living_players"])
+        state.dead_players = set(data["dead_players"])
+        state.last_deaths = set(data["last_deaths"])
+        state.living_counts = Counter(state.players[p] for p in state.living_players)
+        return state
@@ -1,13 +1,161 @@
 from datetime import datetime
+from typing import Optional
+import atexit
+import gzip
 import json
 import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+import warnings
+
+
+class _Writer:
+    """
+    The one background thread that appends every GameLogger's events to its file, so
+    a process running thousands of games at once still has a single writer. It's
+    started on first use, and again in a process forked after it started.
+    """
 
-class GameLogger:
     def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self.loggers = set()  # Open loggers, closed at exit if their game never ended
+
+    def put(self, logger: "GameLogger", item):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                threading.Thread(target=self._write_loop, args=(self._queue,), name="GameLogger", daemon=True).start()
+        self._queue.put((logger, item))
+
+    def _write_loop(self, events: queue.Queue):
+        batches = {}  # Logger -> its events not yet written
+        deadline = None  # When the oldest unwritten event is due
+        while True:
+            try:
+                logger, item = events.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                logger = item = None
+
+            if isinstance(item, threading.Event):
+                # flush() request - write what that logger has, then wake the caller
+                self._write(logger, batches.pop(logger, []))
+                item.set()
+                continue
+            if item is not None:
+                batch = batches.setdefault(logger, [])
+                batch.append(item)
+                due = time.monotonic() + logger.flush_interval
+                deadline = due if deadline is None else min(deadline, due)
+                if len(batch) >= logger.flush_size:
+                    self._write(logger, batches.pop(logger))
+                if time.monotonic() < deadline:
+                    continue
+
+            for logger, batch in batches.items():
+                self._write(logger, batch)
+            batches.clear()
+            deadline = None
+
+    def _write(self, logger: "GameLogger", batch: list):
+        # One game's log failing to write mustn't stop every other game's
+        try:
+            logger._write(batch)
+        except Exception as e:
+            warnings.warn(f"Couldn't write {len(batch)} events to {logger.path}: {e}", RuntimeWarning)
+
+    def close_all(self):
+        for logger in list(self.loggers):
+            logger.close()
+
+
+_writer = _Writer()
+# Flush whatever is buffered if the process exits without every game ending
+atexit.register(_writer.close_all)
+
+
+class GameLogger:
+    """
+    Writes game events to game_logs/<game_id>.jsonl.
+
+    Events are serialised when logged and handed to a background thread shared by
+    every logger in the process, which appends them in batches every flush_interval
+    seconds or flush_size events, so logging never blocks the game on file I/O. Call
+    close() when the game ends (the orchestrator does, including when a game crashes)
+    to flush the remaining events and optionally compress the finished log with
+    "gzip" or "zstd". Events logged after that are dropped with a warning.
+    """
+
+    def __init__(
+        self,
+        log_dir: str = "game_logs",
+        flush_interval: float = 1.0,
+        flush_size: int = 256,
+        compression: Optional[str] = None,
+        game_id: Optional[str] = None,
+    ):
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"Unknown log compression: {compression}")
+
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        os.makedirs("game_logs", exist_ok=True)
-        
+        # The random suffix keeps games that start in the same second apart. A resumed
+        # game passes its original id, and carries on appending to the same log.
+        self.game_id = game_id or f"{self.timestamp}_{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(log_dir, f"{self.game_id}.jsonl")
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.compression = compression
+        self.closed = False
+        os.makedirs(log_dir, exist_ok=True)
+        _writer.loggers.add(self)
+
     def log(self, event: dict):
+        if self.closed:
+            warnings.warn(f"Game {self.game_id} logged {event.get('event')!r} after its log was closed", RuntimeWarning, stacklevel=2)
+            return
         event["timestamp"] = datetime.now().isoformat()
-        with open(f"game_logs/{self.timestamp}.jsonl", "a") as f:
-            f.write(json.dumps(event) + "\n")
\ No newline at end of file
+        _writer.put(self, json.dumps(event))
+
+    def _write(self, batch: list):
+        if batch:
+            with open(self.path, "a") as f:
+                f.write("\n".join(batch) + "\n")
+
+    def flush(self):
+        """Block until every event logged so far is on disk"""
+        if self.closed:
+            return
+        done = threading.Event()
+        _writer.put(self, done)
+        done.wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        _writer.loggers.discard(self)
+
+        if self.compression and os.path.exists(self.path):
+            self.path = self._compress(self.path)
+
+    def _compress(self, path: str) -> str:
+        if self.compression == "gzip":
+            compressed = path + ".gz"
+            with open(path, "rb") as src, gzip.open(compressed, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("zstd log compression requires the zstandard package")
+            compressed = path + ".zst"
+            with open(path, "rb") as src, open(compressed, "wb") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+
+        os.remove(path)
+        return compressed
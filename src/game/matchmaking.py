@@ -0,0 +1,186 @@
+from src.analytics.ratings import FACTIONS, RatingEngine, expected_variance_reductions
+from src.game.role_manager import werewolf_count
+from src.llms.factory import model_by_snapshot, provider_for
+from src.llms.pricing import estimate_cost
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import queue
+import random
+import threading
+import time
+
+# Rough tokens (input, output) a model uses over one game, to price lineups before playing them
+SEAT_TOKENS = (60_000, 1_500)
+NARRATOR_TOKENS = (30_000, 1_500)
+
+# Floor on a game's estimated cost, so free models aren't infinitely good value
+MIN_GAME_COST = 0.01
+
+
+class QuotaExhausted(Exception):
+    """No lineup fits within the remaining per-provider seat quotas"""
+
+
+@dataclass
+class Lineup:
+    narrator: str  # Model snapshot
+    players: List[str]  # Model snapshot for each seat
+    roles: Optional[List[str]] = None  # Role for each seat, or None to deal them at random
+
+
+class MatchmakingScheduler:
+    """
+    Chooses each game's lineup to learn the most about the model rankings per dollar.
+
+    For each lineup it samples candidates (models for each seat and, with assign_roles,
+    which seats are werewolves) and picks the one whose expected reduction in rating
+    variance, per model and per model+role, is largest relative to its estimated cost.
+    Close matches between uncertain, cheap models win; games between models whose
+    ratings are already settled are rarely scheduled.
+
+    Lineups are planned by a background thread, lookahead games ahead of the players, so
+    a game never waits for one. Each planned lineup is credited with its expected variance
+    reduction straight away, so queued games are spread over different matchups until
+    their results arrive - ratings are refreshed from the game logs every refresh_interval
+    seconds. quotas caps the player seats given to each provider over the whole run.
+    """
+
+    def __init__(
+        self,
+        ratings: RatingEngine,
+        models: List[str],
+        log_paths: Iterable[str] = ("game_logs",),
+        quotas: Optional[Dict[str, int]] = None,
+        narrator_model: Optional[str] = None,
+        assign_roles: bool = True,
+        num_players: int = 7,
+        candidates: int = 256,
+        lookahead: int = 16,
+        refresh_interval: float = 30.0,
+        rng: random.Random = None,
+    ):
+        self.ratings = ratings
+        self.models = models
+        self.log_paths = list(log_paths)
+        self.quotas = quotas or {}
+        # Narrators aren't rated, so they're the cheapest model unless chosen
+        self.narrator_model = narrator_model or min(models, key=lambda m: estimate_cost(m, *NARRATOR_TOKENS))
+        self.assign_roles = assign_roles
+        self.num_players = num_players
+        self.candidates = candidates
+        self.refresh_interval = refresh_interval
+        self.rng = rng or random.Random()
+
+        self.seats_used: Dict[str, int] = {}
+        self.lineups = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=lookahead)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._planning = ratings.copy()
+        self._refreshed_at = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="matchmaking", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def next_lineup(self) -> Lineup:
+        """The next planned lineup, waiting for one if the planner has fallen behind"""
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            self._queue.put(item)  # Every later game gets the same error
+            raise item
+        return item
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if time.monotonic() - self._refreshed_at > self.refresh_interval:
+                self._refresh()
+            try:
+                item = self.plan()
+            except QuotaExhausted as e:
+                item = e
+            while not self._stopped.is_set():
+                try:
+                    self._queue.put(item, timeout=1.0)
+                    break
+                except queue.Full:
+                    pass
+            if isinstance(item, Exception):
+                return
+
+    def _refresh(self):
+        """Pick up results from finished games, and re-credit the lineups still queued"""
+        self.ratings.update(self.log_paths)
+        self._planning = self.ratings.copy()
+        for item in list(self._queue.queue):
+            if isinstance(item, Lineup):
+                self._credit(item)
+        self._refreshed_at = time.monotonic()
+
+    def plan(self) -> Lineup:
+        """Choose the next lineup, and count its seats against the quotas"""
+        lineup = max((self._candidate() for _ in range(self.candidates)), key=self.value)
+        for model in lineup.players:
+            provider = provider_for(model)
+            self.seats_used[provider] = self.seats_used.get(provider, 0) + 1
+        self._credit(lineup)
+        self.lineups += 1
+        if not self.assign_roles:
+            # The game deals its own roles, so the deal was only a sample to score against
+            lineup.roles = None
+        return lineup
+
+    def _remaining(self, provider: str) -> float:
+        if provider not in self.quotas:
+            return float("inf")
+        return self.quotas[provider] - self.seats_used.get(provider, 0)
+
+    def _deal(self) -> List[str]:
+        roles = ["werewolf"] * werewolf_count(self.num_players)
+        roles += ["villager"] * (self.num_players - len(roles))
+        self.rng.shuffle(roles)
+        return roles
+
+    def _candidate(self) -> Lineup:
+        seats, taken = [], {}
+        for _ in range(self.num_players):
+            available = [m for m in self.models if self._remaining(provider_for(m)) > taken.get(provider_for(m), 0)]
+            if not available:
+                raise QuotaExhausted(f"Provider seat quotas used up after {self.lineups} games: {self.seats_used}")
+            model = self.rng.choice(available)
+            taken[provider_for(model)] = taken.get(provider_for(model), 0) + 1
+            seats.append(model)
+        return Lineup(self.narrator_model, seats, self._deal())
+
+    def _sides(self, lineup: Lineup, by_role: bool, create: bool = False) -> list:
+        teams = {faction: [] for faction in FACTIONS.values()}
+        for model, role in zip(lineup.players, lineup.roles or self._deal()):
+            teams[FACTIONS[role]].append((model_by_snapshot(model)[1], role))
+        return list(self._planning.sides(teams, by_role, create).values())
+
+    def cost(self, lineup: Lineup) -> float:
+        """Estimated USD cost of playing a lineup"""
+        return estimate_cost(lineup.narrator, *NARRATOR_TOKENS) + sum(
+            estimate_cost(model, *SEAT_TOKENS) for model in lineup.players
+        )
+
+    def value(self, lineup: Lineup) -> float:
+        """Expected rating variance reduction, per model and per model+role, per estimated dollar"""
+        information = sum(
+            sum(expected_variance_reductions(*self._sides(lineup, by_role))) for by_role in (False, True)
+        )
+        return information / max(self.cost(lineup), MIN_GAME_COST)
+
+    def _credit(self, lineup: Lineup):
+        """Shrink the planning ratings by a planned lineup's expected variance reduction"""
+        for by_role in (False, True):
+            sides = self._sides(lineup, by_role, create=True)
+            members = [rating for side in sides for rating, _ in side]
+            for rating, reduction in zip(members, expected_variance_reductions(*sides)):
+                rating.sigma = max(rating.sigma ** 2 - reduction, 1e-6) ** 0.5
@@ -0,0 +1,142 @@
+from src.llms.streaming import visible_text, word_runs
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+import re
+
+# Confidence of each way a vote can resolve
+EXACT = 1.0
+ALIAS = 0.9
+FUZZY = 0.8  # Scaled down by the share of the name that had to be edited
+MENTION = 0.6
+
+# Votes longer than this are answers with commentary, so only looked up as mentions
+MAX_FUZZY_LENGTH = 48
+
+
+class Resolution(NamedTuple):
+    name: Optional[str]
+    confidence: float
+    method: str  # "exact", "alias", "fuzzy", "mention", "ambiguous" or "unresolved"
+
+
+def _normalise(text: str) -> str:
+    text = re.sub(r"\s+", " ", text.lower())
+    return text.strip(" \t\n\"'`*.,:;!?()[]{}")
+
+
+def _deletions(text: str, distance: int) -> Set[str]:
+    """Every string made by deleting up to distance characters from text"""
+    variants, frontier = {text}, {text}
+    for _ in range(distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    Resolves votes to players, built once per game when the players have their names.
+
+    A vote is matched, in order, against the players' full names ("Ash - o1"), their
+    aliases (the name before the model, if only one candidate has it), names within
+    a small edit distance of either, and finally names mentioned in a longer answer.
+    Each resolution carries a confidence for the kind of match. A vote that fits more
+    than one candidate equally well is ambiguous, rather than given to the first.
+
+    Lookups are hash lookups on the vote's deletion variants (and its word runs, for
+    mentions), so they cost the same however many players there are.
+    """
+
+    def __init__(self, names: Iterable[str], max_distance: int = 2):
+        self.names = list(names)
+        self.max_distance = max_distance
+        self._forms: Dict[str, Set[str]] = {}  # Normalised full name or alias -> players
+        self._full: Set[str] = set()
+        for name in self.names:
+            full = _normalise(name)
+            self._forms.setdefault(full, set()).add(name)
+            self._full.add(full)
+            alias = _normalise(name.split(" - ")[0])
+            self._forms.setdefault(alias, set()).add(name)
+
+        self._variants: Dict[str, Set[str]] = {}  # Deletion variant -> forms it can come from
+        for form in self._forms:
+            for variant in _deletions(form, self._allowed_distance(form)):
+                self._variants.setdefault(variant, set()).add(form)
+        self._max_words = max((len(form.split(" ")) for form in self._forms), default=0)
+
+    def _allowed_distance(self, form: str) -> int:
+        # Short names are only a couple of edits from each other, so allow fewer edits
+        return min(self.max_distance, len(form) // 4)
+
+    def _pick(self, forms: Iterable[str], candidates: Optional[Set[str]]) -> Set[str]:
+        players = set()
+        for form in forms:
+            players |= self._forms[form]
+        return players & candidates if candidates is not None else players
+
+    def resolve(self, vote: str, candidates: Optional[Set[str]] = None) -> Resolution:
+        """The player a vote is for, among candidates (eg. the living players) if given"""
+        text = _normalise(visible_text(vote or "") or "")
+        if not text:
+            return Resolution(None, 0.0, "unresolved")
+
+        if text in self._forms:
+            players = self._pick([text], candidates)
+            if len(players) == 1:
+                if text in self._full:
+                    return Resolution(players.pop(), EXACT, "exact")
+                return Resolution(players.pop(), ALIAS, "alias")
+            # Naming a player who can't be voted for (eg. a dead one) isn't a typo for another
+            return Resolution(None, 0.0, "ambiguous" if players else "unresolved")
+
+        if len(text) <= MAX_FUZZY_LENGTH:
+            resolution = self._fuzzy(text, candidates)
+            if resolution:
+                return resolution
+
+        return self._mention(text, candidates)
+
+    def _fuzzy(self, text: str, candidates: Optional[Set[str]]) -> Optional[Resolution]:
+        best, best_distance = set(), None
+        forms = set()
+        for variant in _deletions(text, self.max_distance):
+            forms |= self._variants.get(variant, set())
+        for form in forms:
+            distance = edit_distance(text, form)
+            if distance > self._allowed_distance(form) or not self._pick([form], candidates):
+                continue
+            if best_distance is None or distance < best_distance:
+                best, best_distance = {form}, distance
+            elif distance == best_distance:
+                best.add(form)
+
+        if best_distance is None:
+            return None
+        players = self._pick(best, candidates)
+        if len(players) != 1:
+            return Resolution(None, 0.0, "ambiguous")
+        form = next(iter(best))
+        return Resolution(players.pop(), FUZZY * (1 - best_distance / len(form)), "fuzzy")
+
+    def _mention(self, text: str, candidates: Optional[Set[str]]) -> Resolution:
+        found = {
+            phrase for phrase in word_runs(text, self._max_words)
+            if phrase in self._forms and self._pick([phrase], candidates)
+        }
+        # An alias also matches inside its full name, so keep only the longest matches
+        found = {form for form in found if not any(form != other and form in other for other in found)}
+        players = self._pick(found, candidates)
+        if len(players) == 1:
+            return Resolution(players.pop(), MENTION, "mention")
+        return Resolution(None, 0.0, "ambiguous" if players else "unresolved")
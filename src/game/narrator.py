@@ -1,65 +1,142 @@
 from src.llms.base_client import BaseLLMClient
+from src.llms.streaming import boolean_stop
 from src.game.conversation import GameMessage
-from typing import List
+from src.game.narrator_lines import NarratorLinePool, VICTIMS
+from typing import List, Optional
 
 class Narrator:
-    def __init__(self, llm_client: BaseLLMClient):
+    VOTE_PROMPT = "You are the narrator. Call for a vote dramatically but briefly."
+    NIGHT_PROMPT = "You are the narrator. Announce that night has fallen, dramatically but briefly."
+    DAWN_PROMPT = "You are the narrator. Announce that dawn has arrived, dramatically but briefly."
+
+    def __init__(self, llm_client: BaseLLMClient, lines: Optional[NarratorLinePool] = None):
         self.llm = llm_client
-        
-    def announce_deaths(self, deaths: set) -> str:
+        self.lines = lines  # Pre-generated announcements, used instead of calling the LLM when there are some
+
+    def _prompt(self, kind: str):
+        return {
+            "night": self.NIGHT_PROMPT,
+            "dawn": self.DAWN_PROMPT,
+            "vote": self.VOTE_PROMPT,
+            "deaths": self._deaths_prompt({VICTIMS}, template=True),
+        }[kind]
+
+    def generate_line(self, kind: str) -> str:
+        """A new announcement for a NarratorLinePool, with VICTIMS in place of the names for deaths"""
+        return self.llm.get_response(self._prompt(kind))
+
+    def _announce(self, kind: str, prompt) -> str:
+        line = self.lines.take(kind) if self.lines else None
+        if line is None:
+            line = self.llm.get_response(prompt)
+            if self.lines:
+                self.lines.add(kind, line)
+        return line
+
+    async def _announce_async(self, kind: str, prompt) -> str:
+        line = self.lines.take(kind) if self.lines else None
+        if line is None:
+            line = await self.llm.get_response_async(prompt)
+            if self.lines:
+                self.lines.add(kind, line)
+        return line
+
+    def _deaths_prompt(self, deaths: set, template: bool = False) -> list:
         system = f"""
         You are the narrator in a game of Werewolves. Announce the deaths concisely, with slight dramatic flair. Make sure to call for the players to deliberate about who they think is responsible, and should be exiled. That is their task!
 
-        Tonight's victim(s): {deaths}
+        Tonight's victim(s): {sorted(deaths)}
         """
-        messages= [{"role": "user", "content": system}]
-        return self.llm.get_response(messages)
-
-    def should_start_vote(self, conversation_history: List[GameMessage]) -> bool:        
-        # Add safety check - max 3 rounds of discussion
-        discussion_rounds = sum(1 for msg in conversation_history if msg.phase == "discussion")
-        if discussion_rounds >= 5:
-            print("Max discussion rounds reached, forcing vote")
-            return True
-            
+        if template:
+            system += f"Refer to the victim(s) only as {VICTIMS}, exactly as written, so the names can be filled in later.\n"
+        return [{"role": "user", "content": system}]
+
+    def announce_deaths(self, deaths: set) -> str:
+        line = self.lines.take("deaths", deaths) if self.lines else None
+        return line or self.llm.get_response(self._deaths_prompt(deaths))
+
+    async def announce_deaths_async(self, deaths: set) -> str:
+        line = self.lines.take("deaths", deaths) if self.lines else None
+        return line or await self.llm.get_response_async(self._deaths_prompt(deaths))
+
+    def _vote_check_prompt(self, conversation_history: List[GameMessage]) -> Optional[list]:
+        """Build the vote check prompt, or return None if there is no discussion to judge"""
         system = """You are the narrator in a game of Werewolves. Analyze the recent discussion to decide if it's time to call for a vote.
         Return EXACTLY one of these two responses:
         - "TRUE" if discussion seems complete (repeating/circular, no new info, clear consensus, or many turns)
         - "FALSE" if more discussion would be valuable"""
-        
+
         # Only look at discussion messages from the last round
         discussion_messages = [
             msg for msg in conversation_history[-10:]
             if msg.phase == "discussion"
         ]
-        
+
         if not discussion_messages:
-            return False
-            
+            return None
+
         discussion = "\n".join([f"{msg.player}: {msg.content}" for msg in discussion_messages])
-        messages = [
+        return [
             {"role": "user", "content": discussion},
             {"role": "user", "content": system}
         ]
-        
-        response = self.llm.get_response(messages)
+
+    def _parse_vote_decision(self, response: str) -> bool:
         response = response.strip().upper()
-        
+
         # Force a decision
         if response not in ["TRUE", "FALSE"]:
             print(f"Invalid narrator response: {response}, defaulting to continue discussion")
             return False
-            
+
         return response == "TRUE"
-    
+
+    def judgement_needed(self, conversation_history: List[GameMessage]) -> bool:
+        """Whether should_start_vote will ask the LLM, rather than answer straight away"""
+        return self._vote_check_prompt(conversation_history) is not None
+
+    def should_start_vote(self, conversation_history: List[GameMessage]) -> bool:
+        # The termination policy caps how many rounds a day's discussion can last
+        messages = self._vote_check_prompt(conversation_history)
+        if messages is None:
+            return False
+
+        return self._parse_vote_decision(self.llm.get_response_until(messages, boolean_stop))
+
+    async def should_start_vote_async(self, conversation_history: List[GameMessage]) -> bool:
+        messages = self._vote_check_prompt(conversation_history)
+        if messages is None:
+            return False
+
+        return self._parse_vote_decision(await self.llm.get_response_until_async(messages, boolean_stop))
+
+    def _summary_prompt(self, day: int, messages: List[GameMessage]) -> str:
+        transcript = "\n".join(f"{msg.player}: {msg.content}" for msg in messages)
+        return f"""You are the narrator in a game of Werewolves. Summarise day {day} of the game below for the players, in a few sentences.
+        Keep who died or was exiled, who accused or defended whom, and how people voted. Leave out pleasantries.
+
+        {transcript}"""
+
+    def summarize_day(self, day: int, messages: List[GameMessage]) -> str:
+        return self.llm.get_response(self._summary_prompt(day, messages))
+
+    async def summarize_day_async(self, day: int, messages: List[GameMessage]) -> str:
+        return await self.llm.get_response_async(self._summary_prompt(day, messages))
+
     def announce_vote(self) -> str:
-        system = "You are the narrator. Call for a vote dramatically but briefly."
-        return self.llm.get_response(system)
+        return self._announce("vote", self.VOTE_PROMPT)
 
     def announce_night(self) -> str:
-        system = "You are the narrator. Announce that night has fallen, dramatically but briefly."
-        return self.llm.get_response(system)
+        return self._announce("night", self.NIGHT_PROMPT)
 
     def announce_dawn(self) -> str:
-        system = "You are the narrator. Announce that dawn has arrived, dramatically but briefly."
-        return self.llm.get_response(system)
\ No newline at end of file
+        return self._announce("dawn", self.DAWN_PROMPT)
+
+    async def announce_vote_async(self) -> str:
+        return await self._announce_async("vote", self.VOTE_PROMPT)
+
+    async def announce_night_async(self) -> str:
+        return await self._announce_async("night", self.NIGHT_PROMPT)
+
+    async def announce_dawn_async(self) -> str:
+        return await self._announce_async("dawn", self.DAWN_PROMPT)
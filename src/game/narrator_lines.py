@@ -0,0 +1,141 @@
+from typing import Callable, Dict, Iterable, Optional, Set
+
+import json
+import logging
+import os
+import random
+import threading
+
+# Stands in for the victims' names in pooled death announcements
+VICTIMS = "[VICTIM]"
+
+KINDS = ("night", "dawn", "vote", "deaths")
+
+# Generated lines in a row that were repeats or unusable before a pool counts as full until the next refresh
+MAX_MISSES = 3
+
+log = logging.getLogger(__name__)
+
+
+class NarratorLinePool:
+    """
+    Ready-made narrator announcements, so phase changes don't wait on an LLM call.
+
+    Each kind of announcement (nightfall, dawn, the call to vote, and deaths, with
+    VICTIMS in place of the names) has a pool of lines, made by generate(kind) in a
+    background thread and saved to path so the next run starts with them. The thread
+    tops every pool up to size lines, then every refresh_interval seconds adds a fresh
+    line to each and drops its most used one, so the flavour text keeps changing over
+    a long tournament. Games take the least used line, ties broken at random, and
+    fall back to calling the narrator themselves while a pool is still empty.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str], Optional[str]],
+        path: Optional[str] = "narrator_lines.json",
+        size: int = 20,
+        refresh_interval: float = 300.0,
+        rng: random.Random = None,
+    ):
+        self.generate = generate
+        self.path = path
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.rng = rng or random.Random()
+        self.lines: Dict[str, Dict[str, int]] = {kind: {} for kind in KINDS}  # kind -> line -> times used
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._misses: Dict[str, int] = {kind: 0 for kind in KINDS}
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path) as f:
+            for kind, lines in json.load(f).items():
+                self.lines.setdefault(kind, {}).update(lines)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            state = {kind: dict(lines) for kind, lines in self.lines.items()}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="narrator-lines", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+        self.save()
+
+    def take(self, kind: str, victims: Iterable[str] = None) -> Optional[str]:
+        """A line for the announcement, with the victims filled in, or None if there are none yet"""
+        if kind == "deaths" and not victims:
+            return None
+        with self._lock:
+            lines = self.lines[kind]
+            if not lines:
+                return None
+            fewest = min(lines.values())
+            line = self.rng.choice([text for text, uses in lines.items() if uses == fewest])
+            lines[line] += 1
+        if kind == "deaths":
+            names = sorted(victims)
+            line = line.replace(VICTIMS, " and ".join(filter(None, [", ".join(names[:-1]), names[-1]])))
+        return line
+
+    def add(self, kind: str, line: Optional[str]) -> bool:
+        """Add a new line to a pool, dropping its most used line if that takes it over size"""
+        line = (line or "").strip()
+        if not line or (kind == "deaths") != (VICTIMS in line):
+            return False
+        with self._lock:
+            lines = self.lines[kind]
+            if line in lines:
+                return False
+            lines[line] = 0
+            while len(lines) > self.size:
+                del lines[max(lines, key=lines.get)]
+        return True
+
+    def _next_kind(self) -> Optional[str]:
+        """The kind with the fewest lines, if any pool is still below size"""
+        with self._lock:
+            filling = [k for k in KINDS if len(self.lines[k]) < self.size and self._misses[k] < MAX_MISSES]
+            return min(filling, key=lambda k: len(self.lines[k]), default=None)
+
+    def _generate(self, kind: str):
+        try:
+            added = self.add(kind, self.generate(kind))
+        except Exception:
+            log.warning("Narrator line generation failed for %s", kind, exc_info=True)
+            added = False
+            self._stopped.wait(5.0)
+        self._misses[kind] = 0 if added else self._misses[kind] + 1
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # Top up every pool, then add a fresh line to each, saving once they're all done
+            kind = self._next_kind()
+            while kind:
+                if self._stopped.is_set():
+                    return
+                self._generate(kind)
+                kind = self._next_kind()
+            for kind in KINDS:
+                if self._stopped.is_set():
+                    return
+                self._generate(kind)
+            self.save()
+
+            # Every pool is full (or the model keeps repeating itself); refresh them again later
+            self._stopped.wait(self.refresh_interval)
+            self._misses = {kind: 0 for kind in KINDS}
@@ -3,54 +3,180 @@ from src.game.narrator import Narrator
 from src.game.logger import GameLogger
 from src.game.conversation import GameMessage
 from src.game.conversation import ConversationManager
+from src.game.name_index import NameIndex
 from src.game.role_manager import RoleManager
-from typing import List
-from src.game.roles import BasePlayer, Villager, Werewolf
+from src.game.speakers import EveryoneSpeaks, SpeakerPolicy
+from src.game.termination import DiscussionSignals, TerminationPolicy, Verdict
+from typing import Callable, List, Optional, Set
+from src.game.roles import BasePlayer, Villager, Werewolf, create_player, player_from_dict
+from src.llms.base_client import StopPredicate
+from src.llms.instrumentation import label_client, set_phase
+from src.llms.streaming import name_stop
+
+from collections import Counter
 
 import random
 
 
 class GameOrchestrator:
-    def __init__(self, players: List[BasePlayer], narrator: Narrator, logger: GameLogger):
+    def __init__(
+        self,
+        players: List[BasePlayer],
+        narrator: Narrator,
+        logger: GameLogger,
+        rng: random.Random = None,
+        on_checkpoint: Optional[Callable[[dict], None]] = None,
+        roles: Optional[List[str]] = None,
+        speakers: Optional[SpeakerPolicy] = None,
+        termination: Optional[TerminationPolicy] = None,
+        structured_output: bool = True,
+    ):
         self.players = players
         self.narrator = narrator
         self.logger = logger
+        self.rng = rng or random  # Seeded per game by the tournament runner
+        self.on_checkpoint = on_checkpoint  # Receives a snapshot at every phase boundary
+        self.roles = roles  # Each seat's role, eg. from matchmaking; dealt at random if not given
+        self.speakers = speakers or EveryoneSpeaks()  # Who speaks in each round of discussion
+        self.termination = termination or DiscussionSignals()  # When each day's discussion ends
+        # Intros and votes as validated structured responses, rather than free text read as well as it can be
+        self.structured_output = structured_output
         self.conversation = ConversationManager()
         self.role_manager = None  # Will be initialized after introductions
         self.game_state = None
+        self.next_phase = None  # "night" or "day" once roles are assigned
+        self.name_index = None  # Built once players have their names
+        self.vote_tallies: List[dict] = []
 
     def run(self):
-        self.logger.log({"event": "game_start"})
-        self.introduction_phase()
-        self.role_assignment_phase()
-        
+        try:
+            return self._play()
+        except BaseException as e:
+            self.logger.log({"event": "game_error", "data": {"error": repr(e)}})
+            # Leave a crashed game's log uncompressed, so a resumed game can carry on appending to it
+            self.logger.compression = None
+            raise
+        finally:
+            # Flush buffered events whether the game finished or crashed
+            self.logger.close()
+
+    def _play(self):
+        if self.next_phase is None:
+            self.logger.log({"event": "game_start"})
+            self.introduction_phase()
+            self.role_assignment_phase()
+            self._checkpoint("night")
+        else:
+            self._log_resume()
+
         while not self.game_state.is_game_over():
-            self.logger.log({"event": "night_phase_start"})
-            self.night_phase()
-            if self.game_state.is_game_over():
-                break
-            
-            self.logger.log({"event": "day_phase_start"})
-            self.day_phase()
-            
-        self.end_game()
+            if self.next_phase == "night":
+                self.conversation.start_day()
+                if self._needs_summary():
+                    self._store_summary(self.narrator.summarize_day(*self._summary_request()))
+
+                self.logger.log({"event": "night_phase_start"})
+                self.night_phase()
+                self._checkpoint("day")
+            else:
+                self.logger.log({"event": "day_phase_start"})
+                self.day_phase()
+                self._checkpoint("night")
+
+        return self.end_game()
+
+    def _checkpoint(self, next_phase: str):
+        self.next_phase = next_phase
+        if self.on_checkpoint:
+            self.on_checkpoint(self.to_dict())
+
+    def to_dict(self) -> dict:
+        """Snapshot of the game between phases, for restore()"""
+        return {
+            "game_id": self.logger.game_id,
+            "next_phase": self.next_phase,
+            "rng": self.rng.getstate(),
+            "game_state": self.game_state.to_dict(),
+            "conversation": self.conversation.to_dict(),
+            "players": [player.to_dict() for player in self.players],
+            "narrator": {
+                "provider": self.narrator.llm.provider,
+                "model": self.narrator.llm.model,
+                "usage": dict(self.narrator.llm.usage_totals),
+            },
+            "vote_tallies": self.vote_tallies,
+            "speaker_turns": self.speakers.turns,
+        }
+
+    def restore(self, snapshot: dict):
+        """
+        Pick up a game from a to_dict snapshot, so run() continues from its next phase.
+        The orchestrator's players and narrator must be on the snapshot's models, in order.
+        """
+        version, internal, gauss = snapshot["rng"]
+        self.rng.setstate((version, tuple(internal), gauss))
+        self.game_state = GameState.from_dict(snapshot["game_state"])
+        self.conversation = ConversationManager.from_dict(snapshot["conversation"])
+        self.players = [player_from_dict(data, player.llm) for data, player in zip(snapshot["players"], self.players)]
+        for player in self.players:
+            player.prompt.summaries = self.conversation.day_summaries
+            label_client(player.llm, player.name)
+        self.narrator.llm.usage_totals.update(snapshot["narrator"]["usage"])
+        self.role_manager = RoleManager([p.name for p in self.players], rng=self.rng)
+        self.name_index = NameIndex([p.name for p in self.players])
+        self.vote_tallies = snapshot.get("vote_tallies", [])
+        self.speakers.turns = dict(snapshot.get("speaker_turns", {}))
+        self.next_phase = snapshot["next_phase"]
+
+    def _log_resume(self):
+        self.logger.log({
+            "event": "game_resumed",
+            "data": {"day": self.conversation.day, "next_phase": self.next_phase}
+        })
 
     def introduction_phase(self):
         self.logger.log({"event": "introduction_phase_start"})
+        set_phase("intro")
+        taken = set()
+        for seat, player in enumerate(self.players):
+            intro = player.introduce(
+                existing_names=[p.name for p in self.players if p.name], structured=self.structured_output
+            )
+            intro = self._unique_introduction(player, seat, intro, taken)
+            self._record_introduction(player, intro)
+        self._end_introduction_phase()
+
+    def _unique_introduction(self, player: BasePlayer, seat: int, intro: str, taken: Set[str]) -> str:
+        """
+        The player's intro, or a default one if their name is already taken - roles, votes
+        and the name index are all keyed by name, so no two players may share one
+        """
+        if player.name.lower() in taken:
+            intro = player.default_introduction(seat)
+        taken.add(player.name.lower())
+        return intro
+
+    def _record_introduction(self, player: BasePlayer, intro: str):
+        message = {
+            "phase": "intro",
+            "player": player.name,
+            "content": intro
+        }
+        self.conversation.add_message(GameMessage(**message))
+        self.logger.log({
+            "event": "player_introduction",
+            "data": message
+        })
+
+    def _end_introduction_phase(self):
+        # Label each player's LLM calls now that they have names
         for player in self.players:
-            intro = player.introduce(existing_names=[p.name for p in self.players if p.name])
-            message = {
-                "phase": "intro",
-                "player": player.name,
-                "content": intro
-            }
-            self.conversation.add_message(GameMessage(**message))
-            self.logger.log({
-                "event": "player_introduction",
-                "data": message
-            })
+            label_client(player.llm, player.name)
+
+        self.name_index = NameIndex([p.name for p in self.players])
+
         # Initialize role manager after all players have introduced themselves
-        self.role_manager = RoleManager([p.name for p in self.players])
+        self.role_manager = RoleManager([p.name for p in self.players], rng=self.rng, roles=self.roles)
         self.logger.log({"event": "introduction_phase_end"})
 
     def role_assignment_phase(self):
@@ -61,14 +187,13 @@ class GameOrchestrator:
         for player in self.players:
             role = roles[player.name]
             # Create new player instance of correct type
-            if role == "werewolf":
-                new_player = Werewolf(player.llm)
-            else:
-                new_player = Villager(player.llm)
+            new_player = create_player(role, player.llm)
             
             # Transfer existing player state
             new_player.name = player.name
             new_player.is_alive = player.is_alive
+            new_player.invalid_responses = player.invalid_responses
+            new_player.prompt.summaries = self.conversation.day_summaries
             
             # Replace player in list
             self.players[self.players.index(player)] = new_player
@@ -82,6 +207,27 @@ class GameOrchestrator:
         
         self.game_state = GameState(roles)
 
+    def _needs_summary(self) -> bool:
+        """Summarise the day that just ended once any player's prompt nears its token budget"""
+        previous_day = self.conversation.day - 1
+        return (
+            previous_day >= 1
+            and previous_day not in self.conversation.day_summaries
+            and any(p.prompt.near_budget for p in self.players if p.is_alive)
+        )
+
+    def _summary_request(self) -> tuple:
+        previous_day = self.conversation.day - 1
+        return previous_day, self.conversation.get_day_messages(previous_day)
+
+    def _store_summary(self, summary: str):
+        day = self.conversation.day - 1
+        self.conversation.day_summaries[day] = summary
+        self.logger.log({
+            "event": "day_summary",
+            "data": {"day": day, "summary": summary}
+        })
+
     def get_message(self, history: List[GameMessage]) -> dict:
         system = f"You are {self.name}, a {self.role}. Given the game state, share your thoughts about who might be a werewolf and why."
         messages = [{"content": msg.content} for msg in history]
@@ -90,8 +236,26 @@ class GameOrchestrator:
         return {"wants_to_speak": True, "message": response}
 
     def night_phase(self):
+        set_phase("night")
+
         # Announce night falling
-        night_start = self.narrator.announce_night()
+        self._record_night_start(self.narrator.announce_night())
+
+        # Werewolves choose victim
+        werewolves = [p for p in self.players if p.role == "werewolf" and p.is_alive]
+        if werewolves:
+            # Let werewolves deliberate
+            for wolf in werewolves:
+                decision = wolf.get_message(self.conversation.get_player_history(wolf.name), [p.name for p in self.players if p.is_alive])
+                self._record_werewolf_deliberation(wolf, decision)
+
+            victim = self._conduct_werewolf_vote(werewolves)
+            self._kill_werewolf_victim(victim)
+
+        # Announce night ending
+        self._record_dawn(self.narrator.announce_dawn())
+
+    def _record_night_start(self, night_start: str):
         self.conversation.add_message(GameMessage(
             phase="night",
             player="narrator",
@@ -103,35 +267,29 @@ class GameOrchestrator:
             "data": {"message": night_start}
         })
 
-        # Werewolves choose victim
-        werewolves = [p for p in self.players if p.role == "werewolf" and p.is_alive]
-        if werewolves:
-            # Let werewolves deliberate
-            for wolf in werewolves:
-                decision = wolf.get_message(self.conversation.get_player_history(wolf.name), [p.name for p in self.players if p.is_alive])
-                self.conversation.add_message(GameMessage(
-                    phase="night",
-                    player=wolf.name,
-                    content=decision,
-                    visibility="private"  # Only other werewolves can see
-                ))
-                self.logger.log({
-                    "event": "werewolf_deliberation",
-                    "data": {
-                        "player": wolf.name,
-                        "message": decision
-                    }
-                })
+    def _record_werewolf_deliberation(self, wolf: BasePlayer, decision: str):
+        self.conversation.add_message(GameMessage(
+            phase="night",
+            player=wolf.name,
+            content=decision,
+            visibility="werewolf"  # Only the werewolf team can see
+        ))
+        self.logger.log({
+            "event": "werewolf_deliberation",
+            "data": {
+                "player": wolf.name,
+                "message": decision
+            }
+        })
 
-            victim = self._conduct_werewolf_vote(werewolves)
-            self.game_state.kill_player(victim)
-            self.logger.log({
-                "event": "werewolf_kill",
-                "data": {"victim": victim.name}
-            })
+    def _kill_werewolf_victim(self, victim: BasePlayer):
+        self.game_state.kill_player(victim)
+        self.logger.log({
+            "event": "werewolf_kill",
+            "data": {"victim": victim.name}
+        })
 
-        # Announce night ending
-        night_end = self.narrator.announce_dawn()
+    def _record_dawn(self, night_end: str):
         self.conversation.add_message(GameMessage(
             phase="night",
             player="narrator",
@@ -144,89 +302,112 @@ class GameOrchestrator:
         if not werewolves:
             return None
             
-        votes = {}
-        # Each werewolf submits their vote
-        for werewolf in werewolves:
-            vote = werewolf.get_message(self.conversation.get_player_history(werewolf.name), [p.name for p in self.players if p.is_alive])
-            # Remove any whitespace and standardize case
-            vote = vote.strip().lower()
-            votes[vote] = votes.get(vote, 0) + 1
-            
-            self.logger.log({
-                "event": "werewolf_vote",
-                "data": {"voter": werewolf.name, "vote": vote}
-            })
-        
-        # Find the candidate with most votes
-        if not votes:
-            return None
-            
-        max_votes = max(votes.values())
-        candidates = [name for name, count in votes.items() if count == max_votes]
+        votes = Counter()
+        names = [p.name for p in self.players if p.is_alive]
+        candidates, stop = set(names), self._vote_stop(names)
         
-        # Break ties randomly
-        chosen_name = random.choice(candidates)
+        for werewolf in werewolves:
+            vote = werewolf.vote(self.conversation.get_player_history(werewolf.name), names, stop=stop)
+            self._record_vote(votes, "werewolf_vote", werewolf, vote, candidates)
 
-        # Find closest matching player name
-        for player in self.players:
-            if chosen_name in player.name.lower():
-                return player
+        return self._resolve_vote(votes, "werewolf_vote")
+
+    def _vote_stop(self, names: List[str]) -> Optional[StopPredicate]:
+        """What reads free-text votes, or None when votes are structured"""
+        return None if self.structured_output else name_stop(names)
+
+    def _record_vote(self, votes: Counter, event: str, voter: BasePlayer, vote: str, candidates: Set[str]):
+        resolution = self.name_index.resolve(vote, candidates)
+        if resolution.name:
+            votes[resolution.name] += 1
 
-        # Fallback to random living non-werewolf if no match
-        return random.choice([p for p in self.players if p.is_alive and p.role != "werewolf"])
+        self.logger.log({
+            "event": event,
+            "data": {
+                "voter": voter.name,
+                "vote": vote.strip(),
+                "target": resolution.name,
+                "confidence": resolution.confidence,
+                "method": resolution.method,
+            }
+        })
+
+    def _resolve_vote(self, votes: Counter, event: str) -> Optional[BasePlayer]:
+        """
+        Pick the player with the most votes, breaking ties randomly. If no vote named a
+        candidate, the werewolves still kill a random villager, but the village exiles
+        no one (None) rather than someone nobody voted for.
+        """
+        chosen = None
+        if votes:
+            max_votes = max(votes.values())
+            candidates = [name for name, count in votes.items() if count == max_votes]
+            # Break ties randomly
+            chosen_name = self.rng.choice(candidates)
+            chosen = next(p for p in self.players if p.name == chosen_name)
+        elif event == "werewolf_vote":
+            chosen = self.rng.choice([p for p in self.players if p.is_alive and p.role != "werewolf"])
 
-    def _conduct_vote(self) -> BasePlayer:
-        """Conducts village vote to exile a player"""
-        votes = {}
+        tally = {"vote": event, "day": self.conversation.day, "tally": dict(votes), "chosen": chosen.name if chosen else None}
+        self.vote_tallies.append(tally)
+        self.logger.log({"event": "vote_tally", "data": tally})
+        if chosen is None:
+            self.logger.log({"event": "vote_unresolved", "data": {"vote": event, "day": self.conversation.day}})
+        return chosen
+
+    def _conduct_vote(self) -> Optional[BasePlayer]:
+        """Conducts village vote to exile a player, returning None if no ballot named one"""
+        set_phase("vote")
+        votes = Counter()
         living_players = [p for p in self.players if p.is_alive]
         
         # Each living player submits their vote
+        names = [p.name for p in living_players]
+        candidates, stop = set(names), self._vote_stop(names)
+        vote_prompt = self._vote_prompt(living_players)
         for player in living_players:
-            # Add special voting prompt to history
-            vote_prompt = GameMessage(
-                phase="voting",
-                player="narrator",
-                content=f"""
-                    Cast your vote for who to exile. Your only options are {", ".join([p.name for p in living_players])}.
-                    You must respond only with their name, and no additional commentary whatsoever.
-                """,
-                visibility="public"
-            )
             history = self.conversation.get_player_history(player.name)
-            history.append(vote_prompt)
-            vote = player.get_message(history, names=[p.name for p in self.players if p.is_alive])
-            # Remove any whitespace and standardize case
-            vote = vote.strip().lower()
-            votes[vote] = votes.get(vote, 0) + 1
-            
-            self.logger.log({
-                "event": "village_vote",
-                "data": {"voter": player.name, "vote": vote}
-            })
-        
-        # Find candidate with most votes
-        if not votes:
-            return None
-        
-        print("votes:", votes)
-
-        max_votes = max(votes.values())
-        candidates = [name for name, count in votes.items() if count == max_votes]
+            vote = player.vote(history, names, prompt=vote_prompt, stop=stop)
+            self._record_vote(votes, "village_vote", player, vote, candidates)
 
-         # Break ties randomly
-        chosen_name = random.choice(candidates)
+        return self._resolve_vote(votes, "village_vote")
 
-        # Find closest matching player name
-        for player in self.players:
-            if chosen_name in player.name.lower():
-                return player
-
-        # Fallback to random living non-werewolf if no match
-        return random.choice([p for p in self.players if p.is_alive and p.role != "werewolf"])
+    def _vote_prompt(self, living_players: List[BasePlayer]) -> GameMessage:
+        # Special voting prompt, added after each player's history
+        return GameMessage(
+            phase="voting",
+            player="narrator",
+            content=f"""
+                Cast your vote for who to exile. Your only options are {", ".join([p.name for p in living_players])}.
+                You must respond only with their name, and no additional commentary whatsoever.
+            """,
+            visibility="public"
+        )
 
     def day_phase(self):
+        set_phase("discussion")
+
         # Announce deaths
-        deaths = self.narrator.announce_deaths(self.game_state.last_deaths)
+        self._record_deaths(self.narrator.announce_deaths(self.game_state.last_deaths))
+
+        self._start_discussion()
+        discussion_ended = False
+        while not discussion_ended:
+            self._conduct_discussion()
+
+            discussion_ended = self._discussion_verdict().end
+            if discussion_ended is None:
+                discussion_ended = self.narrator.should_start_vote(
+                    self.conversation.get_player_history("narrator")
+                )
+
+        self._record_vote_announcement(self.narrator.announce_vote())
+
+        exile = self._conduct_vote()
+        if exile:
+            self._exile_player(exile)
+
+    def _record_deaths(self, deaths: str):
         message = GameMessage(phase="day", player="narrator", content=deaths)
         self.conversation.add_message(message)
         self.logger.log({
@@ -234,68 +415,67 @@ class GameOrchestrator:
             "data": {"deaths": list(self.game_state.last_deaths), "message": deaths}
         })
 
-        discussion_ended = False
-        while not discussion_ended:
-            alive_players = [p for p in self.players if p.is_alive]
-            for player in alive_players:
-                response = player.get_message(self.conversation.get_player_history(player.name))
-                message = GameMessage(
-                    phase="discussion",
-                    player=player.name,
-                    content=response,
-                    visibility="public"
-                )
-                self.conversation.add_message(message)
-                self.logger.log({
-                    "event": "player_discussion",
-                    "data": {"player": player.name, "message": response}
-                })
-            
-            discussion_ended = self.narrator.should_start_vote(
-                self.conversation.get_player_history("narrator")
-            )
-        
-        vote_announcement = self.narrator.announce_vote()
-        self.conversation.add_message(GameMessage(
-            phase="voting",
-            player="narrator",
-            content=vote_announcement
-        ))
+    def _vote_announcement_message(self, vote_announcement: str) -> GameMessage:
+        return GameMessage(phase="voting", player="narrator", content=vote_announcement, day=self.conversation.day)
+
+    def _record_vote_announcement(self, vote_announcement: str, message: Optional[GameMessage] = None):
+        # A message already shown to players ahead of time (eg. by speculative votes) is recorded as it is
+        self.conversation.add_message(message or self._vote_announcement_message(vote_announcement))
 
         self.logger.log({
             "event": "voting_start",
             "data": {"message": vote_announcement}
         })
 
-        exile = self._conduct_vote()
+    def _exile_player(self, exile: BasePlayer):
         self.game_state.kill_player(exile)
         self.logger.log({
             "event": "player_exiled",
             "data": {"player": exile.name}
         })
 
+    def _start_discussion(self):
+        self.termination.start_day(self.name_index, [p.name for p in self.players if p.is_alive])
+
+    def _discussion_verdict(self) -> Verdict:
+        """Whether the round just finished ends the discussion, per the termination policy"""
+        verdict = self.termination.end_round()
+        self.logger.log({
+            "event": "discussion_round",
+            "data": {"day": self.conversation.day, "end": verdict.end, "reason": verdict.reason, **verdict.signals},
+        })
+        return verdict
+
+    def _speakers(self) -> List[BasePlayer]:
+        """This round's speakers, chosen by the speaker policy"""
+        speakers = self.speakers.select([p for p in self.players if p.is_alive], self.rng)
+        self.speakers.record(speakers)
+        return speakers
+
     def _conduct_discussion(self):
-        alive_players = [p for p in self.game_state.living_players]
-        for player in alive_players:
+        for player in self._speakers():
             response = player.get_message(self.conversation.get_player_history(player.name))
-            message = GameMessage(
-                phase="discussion",
-                player=player.name,
-                content=response,
-                visibility="public"
-            )
-            self.conversation.add_message(message)
-            self.logger.log({
-                "event": "player_discussion",
-                "data": {"player": player.name, "message": response}
-            })
+            self._record_discussion(player, response)
 
-    def end_game(self):
-        """End the game and log final state."""
+    def _record_discussion(self, player: BasePlayer, response: str):
+        message = GameMessage(
+            phase="discussion",
+            player=player.name,
+            content=response,
+            visibility="public"
+        )
+        self.conversation.add_message(message)
+        self.termination.observe(message)
+        self.logger.log({
+            "event": "player_discussion",
+            "data": {"player": player.name, "message": response}
+        })
+
+    def end_game(self) -> dict:
+        """End the game, log final state and return a summary of the result."""
         
         # Count surviving werewolves
-        werewolves = sum(1 for p in self.game_state.living_players 
-                        if self.game_state.players[p] == "werewolf")
+        werewolves = self.game_state.living("werewolf")
         villagers = len(self.game_state.living_players) - werewolves
         
         # Determine winner
@@ -328,6 +508,8 @@ class GameOrchestrator:
         )
 
         self.conversation.add_message(final_message)
+        # Before game_end, so a log that has its game_end has everything (see EventStore.ingest)
+        self._log_usage()
         self.logger.log({
             "event": "game_end",
             "data": {
@@ -337,3 +519,32 @@ class GameOrchestrator:
                 "villagers": final_state['Villagers'],
             }
         })
+
+        return {
+            "winner": winner,
+            "players": [
+                {
+                    "name": player.name,
+                    "model": player.model,
+                    "role": player.role,
+                    "alive": player.is_alive,
+                    "invalid_responses": player.invalid_responses,
+                }
+                for player in self.players
+            ],
+        }
+
+    def _log_usage(self):
+        """Log each client's token usage, including how much of its prompts came from the provider's cache"""
+        clients = [("narrator", self.narrator.llm)] + [(p.name, p.llm) for p in self.players]
+        for name, llm in clients:
+            totals = llm.usage_totals
+            self.logger.log({
+                "event": "llm_usage",
+                "data": {
+                    "player": name,
+                    "model": llm.model_alias,
+                    **totals,
+                    "cache_hit_rate": totals["cached_input_tokens"] / totals["input_tokens"] if totals["input_tokens"] else 0.0,
+                }
+            })
@@ -0,0 +1,143 @@
+from src.game.conversation import GameMessage
+from src.llms.base_client import CACHE_POINT
+from src.llms.tokens import estimate_text_tokens, MESSAGE_OVERHEAD_TOKENS
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import copy
+
+# Prompt budgets per model alias, in estimated input tokens. Reasoning models get a
+# tighter budget since they're slower and pricier per token.
+DEFAULT_TOKEN_BUDGET = 6000
+TOKEN_BUDGETS = {
+    "o1": 4000,
+    "o3": 4000,
+    "r1": 4000,
+}
+
+# Players past this fraction of their budget ask for old days to be summarised
+COMPACT_THRESHOLD = 0.75
+
+# When old messages have to be dropped, drop down to this fraction of the budget, so
+# the prompt prefix (and the provider's prompt cache) stays stable for a while after
+DROP_TARGET = 0.8
+
+
+def token_budget(model_alias: str) -> int:
+    return TOKEN_BUDGETS.get(model_alias, DEFAULT_TOKEN_BUDGET)
+
+
+@dataclass
+class _Entry:
+    day: int
+    pinned: bool  # Never compacted or dropped, eg. the player's role
+    public: bool
+    message: dict
+    tokens: int
+
+
+def _entry(message: GameMessage) -> _Entry:
+    return _Entry(
+        day=message.day,
+        pinned=message.phase == "role_assignment",
+        public=message.visibility == "public",
+        message={"role": "user", "content": message.content},
+        tokens=estimate_text_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS,
+    )
+
+
+class PromptBuilder:
+    """
+    Builds a player's prompt from their history without re-reading the whole game.
+
+    Messages are appended as the player's timeline grows. When the prompt goes over
+    the token budget, the public messages of finished days are replaced by that day's
+    narrator summary (from the shared summaries dict, keyed by day), and if that isn't
+    enough the oldest messages are dropped. The player's role is always kept.
+
+    The history part of the prompt only ever grows between compactions, so its last
+    message is marked as a cache point: everything up to it can be served from the
+    provider's prompt cache, and only the new messages and the per-turn suffix aren't.
+    """
+
+    def __init__(self, budget: int = DEFAULT_TOKEN_BUDGET, summaries: Optional[Dict[int, str]] = None):
+        self.budget = budget
+        self.summaries = summaries if summaries is not None else {}
+        self.entries: List[_Entry] = []
+        self.tokens = 0
+        self._consumed = 0
+        self._last: Optional[GameMessage] = None
+        self._compacted_days = set()
+
+    def fork(self) -> "PromptBuilder":
+        """A copy that builds prompts from here on without changing this builder, eg. for speculative calls"""
+        fork = copy.copy(self)
+        fork.entries = list(self.entries)
+        fork._compacted_days = set(self._compacted_days)
+        return fork
+
+    @property
+    def near_budget(self) -> bool:
+        return self.tokens >= self.budget * COMPACT_THRESHOLD
+
+    def _sync(self, history: Sequence[GameMessage]):
+        # Histories are append-only timelines, so only read what's new since last time -
+        # unless this isn't the history we've been following, then start over
+        if len(history) < self._consumed or (self._consumed and history[self._consumed - 1] is not self._last):
+            self.entries, self.tokens, self._consumed = [], 0, 0
+            self._compacted_days = set()
+
+        for message in history[self._consumed:]:
+            entry = _entry(message)
+            self.entries.append(entry)
+            self.tokens += entry.tokens
+        if len(history):
+            self._consumed = len(history)
+            self._last = history[-1]
+
+    def _compact(self, current_day: int):
+        for day in sorted(self.summaries):
+            if self.tokens <= self.budget:
+                return
+            if day >= current_day or day in self._compacted_days:
+                continue
+
+            summary = _Entry(
+                day=day,
+                pinned=False,
+                public=True,
+                message={"role": "user", "content": f"Summary of day {day}: {self.summaries[day]}"},
+                tokens=estimate_text_tokens(self.summaries[day]) + MESSAGE_OVERHEAD_TOKENS,
+            )
+            kept, placed = [], False
+            for entry in self.entries:
+                if entry.day == day and entry.public and not entry.pinned:
+                    if not placed:
+                        kept.append(summary)
+                        placed = True
+                    continue
+                kept.append(entry)
+            self.entries = kept
+            self.tokens = sum(e.tokens for e in kept)
+            self._compacted_days.add(day)
+
+    def _drop_oldest(self):
+        if self.tokens <= self.budget:
+            return
+        while self.tokens > self.budget * DROP_TARGET:
+            index = next((i for i, e in enumerate(self.entries) if not e.pinned), None)
+            if index is None:
+                return
+            self.tokens -= self.entries.pop(index).tokens
+
+    def build(self, history: Sequence[GameMessage], suffix: List[dict] = None) -> List[dict]:
+        self._sync(history)
+        if self.tokens > self.budget:
+            current_day = history[-1].day if len(history) else 0
+            self._compact(current_day)
+            self._drop_oldest()
+
+        messages = [entry.message for entry in self.entries]
+        if messages:
+            messages[-1] = {**messages[-1], CACHE_POINT: True}
+        return messages + (suffix or [])
@@ -1,22 +1,30 @@
 import random
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+
+def werewolf_count(num_players: int) -> int:
+    return max(1, num_players // 4)
 
 
 class RoleManager:
-    def __init__(self, players: List[str]):
+    def __init__(self, players: List[str], rng: random.Random = None, roles: Optional[List[str]] = None):
         self.num_players = len(players)
         self.players = players
+        self.rng = rng or random
+        self.roles = roles  # Each seat's role, in player order, instead of a random deal
 
     def _generate_roles(self) -> List[str]:
         """Generate role distribution based on player count"""
         if self.num_players < 4:
             raise ValueError("Need at least 4 players")
+        if self.roles is not None:
+            return list(self.roles)
 
-        num_werewolves = max(1, self.num_players // 4)
+        num_werewolves = werewolf_count(self.num_players)
 
         roles = ["werewolf"] * num_werewolves
         roles.extend(["villager"] * (self.num_players - num_werewolves))
-        random.shuffle(roles)
+        self.rng.shuffle(roles)
 
         return roles
 
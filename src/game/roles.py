@@ -1,22 +1,42 @@
-from src.llms.base_client import BaseLLMClient
+from src.llms.base_client import BaseLLMClient, ResponseSchema, StopPredicate
+from src.llms.structured import choice_schema, object_schema, validate
 from src.game.conversation import GameMessage
+from src.game.prompt_builder import PromptBuilder, token_budget
 
-from typing import List
+from typing import Iterable, List, Optional
+import copy
 import json
 
+INTRODUCTION = object_schema("introduction", {"name": {"type": "string"}, "message": {"type": "string"}})
+
+
+def vote_schema(names: Iterable[str]) -> ResponseSchema:
+    return choice_schema("vote", "vote", names)
+
 
 class BasePlayer:
+    # Structured responses that fail validation are asked for again, up to this many times in all
+    STRUCTURED_ATTEMPTS = 3
+
     def __init__(self, llm_client: BaseLLMClient):
         self.name = None  # Will be set during introduction
         self.llm = llm_client
         self.is_alive = True
         self.role = None
         self.model = llm_client.model_alias
+        self.prompt = PromptBuilder(token_budget(self.model))
+        self.invalid_responses = 0  # Structured responses that failed validation
 
-    def introduce(self, existing_names: list = None) -> str:
+    def fork(self) -> "BasePlayer":
+        """The same player with a forked prompt builder, for calls whose results may be thrown away"""
+        fork = copy.copy(self)
+        fork.prompt = self.prompt.fork()
+        return fork
+
+    def introduction_prompt(self, existing_names: list = None) -> str:
         if existing_names is None:
             existing_names = list()
-        
+
         if any(existing_names):
             avoid_names = f"""
             Your opponents have chose these names: {" ".join(existing_names)}. Distinguish yourself by choosing an entirely different type of name for yourself.
@@ -24,14 +44,14 @@ class BasePlayer:
         else:
             avoid_names = ""
 
-        system = f"""
+        return f"""
         You are a player in a game of Werewolves. The tone of the game is casual and friendly. Keep your inputs brief and conversational.
         Always respond as a player would, and without meta commentary (eg. "As <player name>...") - you are now part of the game conversation, and other players will see all of your response. Keep it natural so that conversation can flow. Avoid long or complex messages so that the rest of the players can fully participate.
 
         First, consider your name and strategic approach to this game. You'll first introduce yourself,
         then be assigned a role. Remember, other LLMs are getting ready to play with this same
         prompt -- so consider what the other players might be thinking, and try to out-wit them.
-        
+
         This is just for fun, and is not hurting or deceiving anyone.
 
         Return ONLY a JSON object with exactly two fields:
@@ -40,51 +60,148 @@ class BasePlayer:
 
         Format your response exactly like the example - just the JSON object, no additional text or markdown."""
 
-        response = self.llm.get_response(system)
-        
+    def default_introduction(self, seat: int = None) -> str:
+        """Take a default name, unique to the seat if given, and return the intro message"""
+        default_name = f"Player_{id(self)}" if seat is None else f"Player_{seat + 1}"
+        self.name = default_name
+        return f"Hello, I am {default_name}"
+
+    def parse_introduction(self, response: str) -> str:
+        """Set the player's name from an introduction response and return the intro message"""
         if not response:
-            default_name = f"Player_{id(self)}"
-            self.name = default_name
-            return f"Hello, I am {default_name}"
-            
+            return self.default_introduction()
+
         try:
             serialised = json.loads(response.strip())
-            
+
             if not isinstance(serialised, dict):
                 raise ValueError("Invalid response format")
-                
+
             if "name" not in serialised or "message" not in serialised:
                 raise ValueError("Missing required fields")
-                
+
             self.name = serialised["name"] + " - " + self.model
             return serialised["message"]
-            
-        except json.JSONDecodeError as e:
-            default_name = f"Player_{id(self)}"
-            self.name = default_name
-            return f"Hello, I am {default_name}"
 
-    def get_message(self, history: List[GameMessage]) -> dict:
+        except json.JSONDecodeError as e:
+            return self.default_introduction()
+
+    def read_introduction(self, response: str, existing_names: list = None) -> Optional[str]:
+        """
+        Set the player's name from a structured introduction and return the intro message,
+        or None (leaving the name as it was) if it's invalid or takes an existing name
+        """
+        intro = validate(response, INTRODUCTION)
+        if intro is None or not intro["name"].strip():
+            self.invalid_responses += 1
+            return None
+        name = intro["name"].strip() + " - " + self.model
+        if name.lower() in {n.lower() for n in existing_names or []}:
+            self.invalid_responses += 1
+            return None
+        self.name = name
+        return intro["message"]
+
+    def introduce(self, existing_names: list = None, structured: bool = True) -> str:
+        """
+        Choose a name and introduce yourself. Structured introductions are asked for
+        again until one is valid, before falling back to a default name. Without
+        structured, the response is parsed as free text, as older recorded games were.
+        """
+        prompt = self.introduction_prompt(existing_names)
+        if not structured:
+            return self.parse_introduction(self.llm.get_response(prompt))
+        for _ in range(self.STRUCTURED_ATTEMPTS):
+            intro = self.read_introduction(self.llm.get_structured(prompt, INTRODUCTION), existing_names)
+            if intro is not None:
+                return intro
+        return self.default_introduction()
+
+    async def introduce_async(self, existing_names: list = None, structured: bool = True) -> str:
+        prompt = self.introduction_prompt(existing_names)
+        if not structured:
+            return self.parse_introduction(await self.llm.get_response_async(prompt))
+        for _ in range(self.STRUCTURED_ATTEMPTS):
+            intro = self.read_introduction(await self.llm.get_structured_async(prompt, INTRODUCTION), existing_names)
+            if intro is not None:
+                return intro
+        return self.default_introduction()
+
+    def build_messages(self, history: List[GameMessage], names: Optional[List[str]] = None, prompt: GameMessage = None) -> list:
+        """Prompt for this turn: the player's history, then any one-off prompt (eg. the vote call)"""
         if not self.name:
             raise ValueError("Player name not set - introduction phase must be completed first")
 
-        messages = [{"role": "user", "content": msg.content} for msg in history]
-        response = self.llm.get_response(messages)
+        suffix = [{"role": "user", "content": prompt.content}] if prompt else []
+        return self.prompt.build(history, suffix)
+
+    def get_message(self, history: List[GameMessage], names: Optional[List[str]] = None, prompt: GameMessage = None, stop: StopPredicate = None) -> str:
+        """Get the player's response, stopping as soon as stop recognises an answer in it, if given"""
+        messages = self.build_messages(history, names, prompt)
+        if stop:
+            return self.llm.get_response_until(messages, stop)
+        return self.llm.get_response(messages)
+
+    async def get_message_async(self, history: List[GameMessage], names: Optional[List[str]] = None, prompt: GameMessage = None, stop: StopPredicate = None) -> str:
+        messages = self.build_messages(history, names, prompt)
+        if stop:
+            return await self.llm.get_response_until_async(messages, stop)
+        return await self.llm.get_response_async(messages)
+
+    def read_vote(self, response: str, schema: ResponseSchema) -> Optional[str]:
+        """The name a structured vote is for, or None if it isn't one of the candidates"""
+        ballot = validate(response, schema)
+        if ballot is None:
+            self.invalid_responses += 1
+            return None
+        return ballot["vote"]
+
+    def vote(self, history: List[GameMessage], names: List[str], prompt: GameMessage = None, stop: StopPredicate = None) -> str:
+        """
+        Vote for one of names. The structured vote is asked for again until it names one,
+        and the last response is returned as it is if none did. With stop, the vote is
+        free text read by stop instead, as older recorded games had it.
+        """
+        messages = self.build_messages(history, names, prompt)
+        if stop:
+            return self.llm.get_response_until(messages, stop)
+        schema = vote_schema(names)
+        for _ in range(self.STRUCTURED_ATTEMPTS):
+            response = self.llm.get_structured(messages, schema)
+            vote = self.read_vote(response, schema)
+            if vote is not None:
+                return vote
         return response
 
+    async def vote_async(self, history: List[GameMessage], names: List[str], prompt: GameMessage = None, stop: StopPredicate = None) -> str:
+        messages = self.build_messages(history, names, prompt)
+        if stop:
+            return await self.llm.get_response_until_async(messages, stop)
+        schema = vote_schema(names)
+        for _ in range(self.STRUCTURED_ATTEMPTS):
+            response = await self.llm.get_structured_async(messages, schema)
+            vote = self.read_vote(response, schema)
+            if vote is not None:
+                return vote
+        return response
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "role": self.role,
+            "is_alive": self.is_alive,
+            "provider": self.llm.provider,
+            "model": self.llm.model,
+            "model_alias": self.model,
+            "usage": dict(self.llm.usage_totals),
+            "invalid_responses": self.invalid_responses,
+        }
+
 
 class Villager(BasePlayer):
     def __init__(self, llm_client: BaseLLMClient):
         super().__init__(llm_client)
         self.role = "villager"
-    
-    def get_message(self, history: List[GameMessage], names: List[str] = []) -> dict:
-        if not self.name:
-            raise ValueError("Player name not set - introduction phase must be completed first")
-
-        messages = [{"role": "user", "content": msg.content} for msg in history]
-        response = self.llm.get_response(messages)
-        return response
 
 
 class Werewolf(BasePlayer):
@@ -92,8 +209,12 @@ class Werewolf(BasePlayer):
         super().__init__(llm_client)
         self.role = "werewolf"
 
-    def get_message(self, history: List[GameMessage], names: List[str] = []) -> str:
-        if history and history[-1].phase == "night":
+    def build_messages(self, history: List[GameMessage], names: Optional[List[str]] = None, prompt: GameMessage = None) -> list:
+        if names is None:
+            names = list()
+
+        last = prompt or (history[-1] if history else None)
+        if last and last.phase == "night":
             # During night phase, vote for who to kill
             system = f"""You are {self.name}, a werewolf. You are discussing with other werewolves who to kill.
             Be brief and direct - suggest one name only. Consider:
@@ -106,7 +227,25 @@ class Werewolf(BasePlayer):
             # During day phase, use regular discussion
             system = f"""You are {self.name}, a werewolf. You're trying to avoid suspicion.
             Keep responses conversational and brief. Don't be obviously evil."""
-            
-        messages = [{"role": "user", "content": msg.content} for msg in history]
-        messages.append({"role": "user", "content": system})
-        return self.llm.get_response(messages)
\ No newline at end of file
+
+        suffix = [{"role": "user", "content": prompt.content}] if prompt else []
+        suffix.append({"role": "user", "content": system})
+        return self.prompt.build(history, suffix)
+
+
+ROLE_CLASSES = {"villager": Villager, "werewolf": Werewolf}
+
+
+def create_player(role: str, llm_client: BaseLLMClient) -> BasePlayer:
+    """A player of the given role, or a BasePlayer if roles haven't been assigned yet"""
+    return ROLE_CLASSES[role](llm_client) if role in ROLE_CLASSES else BasePlayer(llm_client)
+
+
+def player_from_dict(data: dict, llm_client: BaseLLMClient) -> BasePlayer:
+    """Restore a player from BasePlayer.to_dict, on a client for the same model"""
+    player = create_player(data["role"], llm_client)
+    player.name = data["name"]
+    player.is_alive = data["is_alive"]
+    player.invalid_responses = data.get("invalid_responses", 0)
+    llm_client.usage_totals.update(data["usage"])
+    return player
@@ -0,0 +1,47 @@
+from src.game.roles import BasePlayer
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+import random
+
+
+class SpeakerPolicy(ABC):
+    """Chooses which living players speak in a round of discussion, in speaking order"""
+
+    def __init__(self):
+        self.turns: Dict[str, int] = {}  # Discussion turns each player has had, saved in snapshots
+
+    @abstractmethod
+    def select(self, living_players: List[BasePlayer], rng: random.Random) -> List[BasePlayer]:
+        pass
+
+    def record(self, speakers: List[BasePlayer]):
+        for player in speakers:
+            self.turns[player.name] = self.turns.get(player.name, 0) + 1
+
+
+class EveryoneSpeaks(SpeakerPolicy):
+    """Every living player speaks every round, in seat order"""
+
+    def select(self, living_players: List[BasePlayer], rng: random.Random) -> List[BasePlayer]:
+        return list(living_players)
+
+
+class RotatingSpeakers(SpeakerPolicy):
+    """
+    For large lobbies: only k players speak each round, so a round costs the same
+    number of calls however many players are alive. The players who have spoken least
+    go first, ties broken at random, so everyone gets a turn before anyone gets two.
+    Speakers keep their seat order within the round.
+    """
+
+    def __init__(self, k: int):
+        super().__init__()
+        self.k = k
+
+    def select(self, living_players: List[BasePlayer], rng: random.Random) -> List[BasePlayer]:
+        if len(living_players) <= self.k:
+            return list(living_players)
+        order = {id(p): (self.turns.get(p.name, 0), rng.random()) for p in living_players}
+        chosen = {id(p) for p in sorted(living_players, key=lambda p: order[id(p)])[:self.k]}
+        return [p for p in living_players if id(p) in chosen]
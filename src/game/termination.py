@@ -0,0 +1,151 @@
+from src.game.conversation import GameMessage
+from src.game.name_index import NameIndex
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+
+import re
+
+# Words that make a player named in the same sentence the target of an accusation, or a
+# vote intent. Talk of wolves only counts when it says someone is one, since every
+# message is about finding the werewolves.
+ACCUSATION = re.compile(
+    r"\b(vot(e|es|ed|ing)|exil\w*|eliminat\w*|lynch\w*|suspect\w*|suspicious|sus|accus\w*|lying|liar"
+    r"|dodg\w*|deflect\w*|keep an eye|feeling about|(is|are|'s) (a |the |one of the )?(wolf|wolves|werewol\w*))\b"
+)
+
+# Where a message splits into the sentences accusations are looked for in
+SENTENCE_BREAK = re.compile(r"[.!?;\n]+\s*|\s+but\s+")
+
+# Fewest vote intents before they can be said to converge
+MIN_INTENTS = 3
+
+
+class Verdict(NamedTuple):
+    end: Optional[bool]  # Whether to start the vote, or None to leave it to the narrator
+    reason: str
+    signals: Dict[str, float]
+
+
+def _words(text: str) -> Set[str]:
+    return set(re.findall(r"[a-z']{3,}", text.lower()))
+
+
+class TerminationPolicy(ABC):
+    """Decides, after each round of discussion, whether it's time for the day's vote"""
+
+    def start_day(self, name_index: NameIndex, living: Iterable[str]):
+        pass
+
+    def observe(self, message: GameMessage):
+        pass
+
+    @abstractmethod
+    def end_round(self) -> Verdict:
+        pass
+
+
+class NarratorJudge(TerminationPolicy):
+    """Asks the narrator's LLM after every round, as games always used to, and ends discussion after max_rounds"""
+
+    def __init__(self, max_rounds: int = 3):
+        self.max_rounds = max_rounds
+        self.rounds = 0
+
+    def start_day(self, name_index: NameIndex, living: Iterable[str]):
+        self.rounds = 0
+
+    def end_round(self) -> Verdict:
+        self.rounds += 1
+        if self.rounds >= self.max_rounds:
+            return Verdict(True, "max_rounds", {"round": self.rounds})
+        return Verdict(None, "narrator", {"round": self.rounds})
+
+
+class DiscussionSignals(TerminationPolicy):
+    """
+    Ends discussion from signals kept up to date as each message is recorded, without
+    an LLM call: the vote is called once the players' accusations converge on one
+    player, once most speakers repeat the accusation they made the round before, or
+    once a round mostly repeats the words of the last one - and after max_rounds in
+    any case. A message accuses the player it names in the same sentence as a vote or
+    accusation word (the last one, if it accuses more than one). With judge set,
+    rounds where none of these fire are left to the narrator's LLM check instead of
+    carrying on.
+    """
+
+    def __init__(
+        self,
+        max_rounds: int = 3,
+        convergence: float = 0.5,
+        stability: float = 0.75,
+        repetition: float = 0.5,
+        judge: bool = False,
+    ):
+        self.max_rounds = max_rounds
+        self.convergence = convergence  # Share of vote intents on the most accused player
+        self.stability = stability  # Share of a round's speakers repeating their last accusation
+        self.repetition = repetition  # Overlap (Jaccard) between the words of this round and the last
+        self.judge = judge
+        self.start_day(None, [])
+
+    def start_day(self, name_index: NameIndex, living: Iterable[str]):
+        self.name_index = name_index
+        self.living = set(living)
+        self.rounds = 0
+        self.intents: Dict[str, str] = {}  # Speaker -> the player they most recently accused today
+        self._speakers = 0
+        self._repeats = 0
+        self._words: Set[str] = set()
+        self._previous_words: Optional[Set[str]] = None
+
+    def observe(self, message: GameMessage):
+        if message.phase != "discussion":
+            return
+        self._speakers += 1
+        self._words |= _words(message.content)
+        accused = self.accused(message)
+        if accused:
+            self._repeats += self.intents.get(message.player) == accused
+            self.intents[message.player] = accused
+
+    def accused(self, message: GameMessage) -> Optional[str]:
+        """The player a message accuses, or None"""
+        if not self.name_index:
+            return None
+        accused = None
+        for sentence in SENTENCE_BREAK.split(message.content):
+            if ACCUSATION.search(sentence.lower()):
+                accused = self.name_index.resolve(sentence, self.living - {message.player}).name or accused
+        return accused
+
+    def end_round(self) -> Verdict:
+        self.rounds += 1
+        most_accused = Counter(self.intents.values()).most_common(1)
+        signals = {
+            "round": self.rounds,
+            "convergence": most_accused[0][1] / len(self.intents) if len(self.intents) >= MIN_INTENTS else 0.0,
+            "stability": self._repeats / self._speakers if self.rounds > 1 and self._speakers else 0.0,
+            "repetition": (
+                len(self._words & self._previous_words) / max(len(self._words | self._previous_words), 1)
+                if self._previous_words is not None else 0.0
+            ),
+        }
+        self._previous_words, self._words = self._words, set()
+        self._speakers = self._repeats = 0
+
+        if self.rounds >= self.max_rounds:
+            return Verdict(True, "max_rounds", signals)
+        for signal in ("convergence", "stability", "repetition"):
+            if signals[signal] >= getattr(self, signal):
+                return Verdict(True, signal, signals)
+        if self.judge:
+            return Verdict(None, "undecided", signals)
+        return Verdict(False, "continue", signals)
+
+
+TERMINATION_POLICIES = {
+    "signals": DiscussionSignals,
+    "judge": lambda: DiscussionSignals(judge=True),
+    "narrator": NarratorJudge,
+}
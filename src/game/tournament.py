@@ -0,0 +1,257 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Awaitable, Callable, Dict, List, Optional
+from src.game.checkpoint import CheckpointStore
+from src.llms.batch import BatchCollector
+from src.llms.rate_limit import set_rate_limit
+
+import asyncio
+import time
+import traceback
+
+
+def _configure_worker(rate_limits: Dict[str, Dict[str, float]]):
+    for provider, limits in rate_limits.items():
+        set_rate_limit(provider, **limits)
+
+
+def _finish(result: dict, seed: int, started: float, checkpoints: Optional[CheckpointStore]) -> dict:
+    result["seed"] = seed
+    result["duration"] = time.monotonic() - started
+    if checkpoints and "error" not in result:
+        checkpoints.save_result(seed, result)
+    return result
+
+
+def _play(play_game: Callable[[int], dict], seed: int, checkpoints: Optional[CheckpointStore] = None) -> dict:
+    started = time.monotonic()
+    try:
+        result = play_game(seed)
+    except Exception as e:
+        traceback.print_exc()
+        result = {"error": f"{type(e).__name__}: {e}"}
+    return _finish(result, seed, started, checkpoints)
+
+
+async def _play_batched(
+    play_game: Callable[[int, BatchCollector], Awaitable[dict]],
+    collector: BatchCollector,
+    seed: int,
+    checkpoints: Optional[CheckpointStore] = None,
+) -> dict:
+    started = time.monotonic()
+    try:
+        result = await play_game(seed, collector)
+    except Exception as e:
+        traceback.print_exc()
+        result = {"error": f"{type(e).__name__}: {e}"}
+    return _finish(result, seed, started, checkpoints)
+
+
+class TournamentRunner:
+    """
+    Plays many games in parallel and aggregates their results.
+
+    play_game receives a seed derived from (seed, game index) for the game's RNG and
+    returns the orchestrator's end_game result, plus "llm_calls" if it counted them. With
+    processes, each worker gets an equal share of the per-provider rate limits.
+
+    With checkpoints, each finished game's result is saved, and games that already have
+    a result from an earlier run are counted without being played again.
+    """
+
+    def __init__(
+        self,
+        play_game: Callable[[int], dict],
+        num_games: int,
+        workers: int = 8,
+        seed: int = 0,
+        use_processes: bool = False,
+        rate_limits: Optional[Dict[str, Dict[str, float]]] = None,  # provider -> set_rate_limit kwargs
+        checkpoints: Optional[CheckpointStore] = None,
+    ):
+        self.play_game = play_game
+        self.num_games = num_games
+        self.workers = workers
+        self.seed = seed
+        self.use_processes = use_processes
+        self.rate_limits = rate_limits or {}
+        self.checkpoints = checkpoints
+        self.results: List[dict] = []
+        self.skipped = 0  # Results at the start of results that were finished by an earlier run
+
+    def game_seed(self, index: int) -> int:
+        return self.seed * 1_000_003 + index
+
+    def _seeds_to_play(self) -> List[int]:
+        """Seeds of the games still to play, collecting the results of games finished in earlier runs"""
+        seeds = []
+        for i in range(self.num_games):
+            seed = self.game_seed(i)
+            result = self.checkpoints.load_result(seed) if self.checkpoints else None
+            if result is None:
+                seeds.append(seed)
+            else:
+                self.results.append(result)
+        self.skipped = len(self.results)
+        if self.skipped:
+            print(f"Skipping {self.skipped} games finished in an earlier run")
+        return seeds
+
+    def _executor(self):
+        if self.use_processes:
+            per_worker = {
+                provider: {name: value / self.workers for name, value in limits.items()}
+                for provider, limits in self.rate_limits.items()
+            }
+            return ProcessPoolExecutor(self.workers, initializer=_configure_worker, initargs=(per_worker,))
+
+        _configure_worker(self.rate_limits)
+        return ThreadPoolExecutor(self.workers)
+
+    def run(self) -> dict:
+        started = time.monotonic()
+        seeds = self._seeds_to_play()
+        with self._executor() as executor:
+            futures = [
+                executor.submit(_play, self.play_game, seed, self.checkpoints)
+                for seed in seeds
+            ]
+            for future in as_completed(futures):
+                self.results.append(future.result())
+                self._report_progress(time.monotonic() - started)
+
+        summary = self.summarise(time.monotonic() - started)
+        self.print_summary(summary)
+        return summary
+
+    @property
+    def played(self) -> List[dict]:
+        """Results of the games played in this run, which throughput is measured over"""
+        return self.results[self.skipped:]
+
+    def _report_progress(self, elapsed: float):
+        done = len(self.results)
+        failed = sum(1 for r in self.results if "error" in r)
+        calls = sum(r.get("llm_calls", 0) for r in self.played)
+        print(
+            f"[{done}/{self.num_games}] {len(self.played) / elapsed * 60:.1f} games/min, "
+            f"{calls / elapsed:.1f} calls/s, {failed} failed"
+        )
+
+    def summarise(self, elapsed: float) -> dict:
+        completed = [r for r in self.results if "error" not in r]
+        wins = {"Villagers": 0, "Werewolves": 0}
+        models: Dict[str, Dict[str, int]] = {}
+
+        for result in completed:
+            wins[result["winner"]] += 1
+            for player in result["players"]:
+                stats = models.setdefault(
+                    player["model"], {"games": 0, "wins": 0, "werewolf_games": 0, "invalid_responses": 0}
+                )
+                stats["games"] += 1
+                stats["werewolf_games"] += player["role"] == "werewolf"
+                stats["invalid_responses"] += player.get("invalid_responses", 0)
+                faction = "Werewolves" if player["role"] == "werewolf" else "Villagers"
+                stats["wins"] += faction == result["winner"]
+
+        return {
+            "games": len(self.results),
+            "completed": len(completed),
+            "failed": len(self.results) - len(completed),
+            "elapsed": elapsed,
+            "played": len(self.played),
+            "games_per_minute": len(self.played) / elapsed * 60 if elapsed else 0.0,
+            "llm_calls": sum(r.get("llm_calls", 0) for r in self.played),
+            "wins": wins,
+            "models": models,
+            "speculation": self._speculation(completed),
+        }
+
+    @staticmethod
+    def _speculation(results: List[dict]) -> Optional[dict]:
+        """Speculation stats added up over the games that used it"""
+        games = [r["speculation"] for r in results if "speculation" in r]
+        if not games:
+            return None
+        total = {"judgements": 0, "votes": 0, "saved_seconds": 0.0, "wasted_tokens": 0}
+        by_model = {"saved_seconds_by_model": {}, "wasted_tokens_by_model": {}}
+        for stats in games:
+            for key in total:
+                total[key] += stats[key]
+            for key, models in by_model.items():
+                for model, value in stats[key].items():
+                    models[model] = models.get(model, 0) + value
+        return {**total, **by_model}
+
+    def print_summary(self, summary: dict):
+        print(
+            f"\nTournament finished: {summary['completed']}/{summary['games']} games completed "
+            f"in {summary['elapsed']:.0f}s ({summary['played']} played in this run, "
+            f"{summary['games_per_minute']:.1f} games/min, {summary['llm_calls']} LLM calls)"
+        )
+        print(f"Villagers won {summary['wins']['Villagers']}, Werewolves won {summary['wins']['Werewolves']}")
+        for model, stats in sorted(summary["models"].items(), key=lambda kv: -kv[1]["wins"] / kv[1]["games"]):
+            print(
+                f"  {model}: {stats['wins']}/{stats['games']} wins "
+                f"({stats['wins'] / stats['games']:.0%}), werewolf in {stats['werewolf_games']}"
+                + (f", {stats['invalid_responses']} invalid intros/votes retried" if stats["invalid_responses"] else "")
+            )
+
+        speculation = summary.get("speculation")
+        if speculation:
+            print(
+                f"Speculation: {speculation['judgements']} judgements ({speculation['votes']} ended discussion), "
+                f"saved {speculation['saved_seconds']:.1f}s, wasted ~{speculation['wasted_tokens']:,} tokens"
+            )
+            for model, seconds in sorted(speculation["saved_seconds_by_model"].items()):
+                print(f"  narrator {model}: saved {seconds:.1f}s")
+            for model, tokens in sorted(speculation["wasted_tokens_by_model"].items()):
+                print(f"  player {model}: wasted ~{tokens:,} tokens")
+
+
+class BatchTournamentRunner(TournamentRunner):
+    """
+    Plays many games together on one event loop, so their LLM calls can be sent as
+    provider batches by the collector - for sweeps where throughput and cost matter
+    more than latency.
+
+    play_game is async, and receives the game's seed and the collector. workers is the
+    number of games in flight at once, which is how many calls each batch can collect.
+    """
+
+    def __init__(
+        self,
+        play_game: Callable[[int, BatchCollector], Awaitable[dict]],
+        num_games: int,
+        collector: BatchCollector,
+        workers: int = 1000,
+        seed: int = 0,
+        rate_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+    ):
+        super().__init__(play_game, num_games, workers=workers, seed=seed, rate_limits=rate_limits, checkpoints=checkpoints)
+        self.collector = collector
+
+    def run(self) -> dict:
+        return asyncio.run(self._run())
+
+    async def _run(self) -> dict:
+        # Calls to providers without a batch backend are made as usual, within the rate limits
+        _configure_worker(self.rate_limits)
+        started = time.monotonic()
+        in_flight = asyncio.Semaphore(self.workers)
+
+        async def play(seed: int) -> dict:
+            async with in_flight:
+                return await _play_batched(self.play_game, self.collector, seed, self.checkpoints)
+
+        for game in asyncio.as_completed([play(seed) for seed in self._seeds_to_play()]):
+            self.results.append(await game)
+            self._report_progress(time.monotonic() - started)
+
+        summary = self.summarise(time.monotonic() - started)
+        summary["batches"] = self.collector.batches
+        self.print_summary(summary)
+        print(f"{self.collector.requests} requests sent in {self.collector.batches} batches")
+        return summary
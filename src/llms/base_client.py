@@ -1,16 +1,204 @@
+import asyncio
+import json
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, NamedTuple, Optional
+
+from src.llms.tokens import estimate_text_tokens, estimate_tokens
+
+# Message key marking the end of a prompt's stable prefix, which providers with prompt
+# caching can cache between calls. Clients remove it before sending.
+CACHE_POINT = "cache_point"
+
+
+def strip_cache_points(messages):
+    if isinstance(messages, str):
+        return messages
+    return [
+        {k: v for k, v in message.items() if k != CACHE_POINT} if CACHE_POINT in message else message
+        for message in messages
+    ]
+
+
+# The usage of the call in progress, see call_usage()
+_call_usage: ContextVar[Optional[dict]] = ContextVar("llm_call_usage", default=None)
+
+
+@contextmanager
+def call_usage():
+    """
+    Collect the usage that a call made inside this block records, however many clients
+    it goes through. Each call gets its own dict, so calls running at the same time in
+    other threads or asyncio tasks can't overwrite it. Worker threads started with
+    asyncio.to_thread record into their caller's dict.
+    """
+    usage = {}
+    token = _call_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _call_usage.reset(token)
+
+
+# Reads the response text received so far while it streams in, and returns the answer
+# once it can tell what it is, or None to keep reading. See src/llms/streaming.py.
+StopPredicate = Callable[[str], Optional[str]]
+
+
+class ResponseSchema(NamedTuple):
+    """A JSON object a structured response must be, see src/llms/structured.py"""
+    name: str  # Names the format (or tool) for providers that need one
+    json: dict  # JSON schema
+
+
+def with_schema_instructions(messages, schema: ResponseSchema):
+    """The prompt, asking for a response matching schema at the end"""
+    instructions = (
+        "Respond only with a JSON object matching this JSON schema, with no other text or markdown: "
+        + json.dumps(schema.json)
+    )
+    if isinstance(messages, str):
+        return f"{messages}\n\n{instructions}"
+    if isinstance(messages, dict):
+        messages = [messages]
+    return list(messages) + [{"role": "user", "content": instructions}]
+
 
 class BaseLLMClient(ABC):
-   @abstractmethod
-   def get_response(self, messages: list, system: str) -> str:
-       """
-       Send a chat message to the LLM.
-       
-       Args:
-           messages: List of message dicts with 'role' and 'content'
-           system: System prompt string
-           
-       Returns:
-           str: The LLM's response
-       """
-       pass
\ No newline at end of file
+    # Sampling settings sent with every request, used to tell cached responses apart
+    sampling_params: dict = {}
+    # Whether cancelling an async call stops the request. Calls run in a worker thread
+    # (the default async methods) carry on, and are paid for, after they're cancelled.
+    cancellable: bool = False
+
+    def __init__(self):
+        # Token usage of the latest call, and running totals, as reported by the provider
+        self.last_usage = None
+        self.usage_totals = {"input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+
+    def record_usage(self, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0, batched: bool = False):
+        """
+        Record a call's usage. input_tokens includes the cached_input_tokens read from the
+        prompt cache, and batched calls were answered by a batch API at its discount.
+        """
+        self.last_usage = {
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "output_tokens": output_tokens,
+        }
+        for key, value in self.last_usage.items():
+            self.usage_totals[key] += value
+        usage = _call_usage.get()
+        if usage is not None:
+            usage.update(self.last_usage, batched=batched)
+
+    @abstractmethod
+    def get_response(self, messages) -> str:
+        """
+        Send a chat message to the LLM.
+
+        Args:
+            messages: Prompt string, or list of message dicts with 'role' and 'content'
+
+        Returns:
+            str: The LLM's response
+        """
+        pass
+
+    async def get_response_async(self, messages) -> str:
+        """
+        Async variant of get_response.
+
+        Providers without a native async SDK run the blocking call in a worker
+        thread, so concurrent callers still overlap their network round-trips.
+        """
+        return await asyncio.to_thread(self.get_response, messages)
+
+    def record_estimated_usage(self, messages, response: str):
+        """Record estimated usage, for calls the provider didn't report usage for (eg. cancelled streams)"""
+        self.record_usage(estimate_tokens(messages), estimate_text_tokens(response))
+
+    def stream_response(self, messages) -> Iterator[str]:
+        """
+        Yield the response in chunks as it arrives. Closing the generator early
+        cancels the request. Providers without streaming yield the whole response.
+        """
+        yield self.get_response(messages)
+
+    def get_response_until(self, messages, stop: StopPredicate) -> str:
+        """
+        Stream the response until stop recognises an answer in it, and drop the rest.
+
+        Returns stop's answer, or the whole response if stop never recognised one.
+        """
+        text = ""
+        stream = self.stream_response(messages)
+        try:
+            for chunk in stream:
+                text += chunk
+                answer = stop(text)
+                if answer is not None:
+                    return answer
+        finally:
+            stream.close()
+        return text
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        """Async variant of get_response_until, streaming in a worker thread unless the provider has an async stream"""
+        return await asyncio.to_thread(self.get_response_until, messages, stop)
+
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        """
+        Ask for a JSON object matching schema, returned as JSON text. Providers that can
+        enforce a schema (eg. OpenAI's response_format) override this; others are only
+        asked for it in the prompt, so callers still validate the response.
+        """
+        return self.get_response(with_schema_instructions(messages, schema))
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        return await asyncio.to_thread(self.get_structured, messages, schema)
+
+
+class ClientWrapper(BaseLLMClient):
+    """Base for clients that add behaviour around another client, e.g. rate limiting"""
+
+    def __init__(self, inner: BaseLLMClient):
+        self.inner = inner
+        self.model = inner.model
+        self.model_alias = inner.model_alias
+        self.provider = getattr(inner, "provider", None)
+        self.sampling_params = inner.sampling_params
+
+    def get_response(self, messages) -> str:
+        return self.inner.get_response(messages)
+
+    async def get_response_async(self, messages) -> str:
+        return await self.inner.get_response_async(messages)
+
+    def get_response_until(self, messages, stop: StopPredicate) -> str:
+        return self.inner.get_response_until(messages, stop)
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        return await self.inner.get_response_until_async(messages, stop)
+
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        return self.inner.get_structured(messages, schema)
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        return await self.inner.get_structured_async(messages, schema)
+
+    @property
+    def cancellable(self):
+        return self.inner.cancellable
+
+    @property
+    def last_usage(self):
+        return self.inner.last_usage
+
+    @property
+    def usage_totals(self):
+        return self.inner.usage_totals
+
+    def record_usage(self, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0, batched: bool = False):
+        self.inner.record_usage(input_tokens, output_tokens, cached_input_tokens, batched)
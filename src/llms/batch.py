@@ -0,0 +1,292 @@
+from src.llms.base_client import BaseLLMClient, ClientWrapper, ResponseSchema, StopPredicate, strip_cache_points
+from src.llms.local import LocalClient
+from src.llms.structured import response_format
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import asyncio
+import io
+import itertools
+import json
+import time
+
+CHAT_COMPLETIONS = "/v1/chat/completions"
+
+
+class BatchRequestError(Exception):
+    """A request in a batch failed, or the batch finished without answering it"""
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    model: str
+    messages: list
+    sampling_params: dict
+    future: asyncio.Future = field(repr=False)
+    attempts: int = 0
+    response_format: Optional[dict] = None  # For structured responses
+
+
+@dataclass
+class BatchResult:
+    response: Optional[str] = None
+    usage: dict = field(default_factory=dict)  # record_usage kwargs
+    error: Optional[str] = None
+
+
+def chat_messages(messages) -> list:
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    if isinstance(messages, dict):
+        messages = [messages]
+    return strip_cache_points(messages)
+
+
+def request_line(request: BatchRequest) -> str:
+    """A request in the OpenAI Batch API's JSONL input format"""
+    body = {**request.sampling_params, "model": request.model, "messages": request.messages}
+    if request.response_format:
+        body["response_format"] = request.response_format
+    return json.dumps({"custom_id": request.custom_id, "method": "POST", "url": CHAT_COMPLETIONS, "body": body})
+
+
+def parse_output_line(line: str) -> Tuple[str, BatchResult]:
+    """A (custom_id, result) pair from a line of OpenAI Batch API output"""
+    record = json.loads(line)
+    response = record.get("response") or {}
+    if record.get("error") or response.get("status_code") != 200:
+        error = record.get("error") or response.get("body", {}).get("error")
+        return record["custom_id"], BatchResult(error=json.dumps(error))
+
+    body = response["body"]
+    usage = body.get("usage") or {}
+    return record["custom_id"], BatchResult(
+        response=body["choices"][0]["message"]["content"],
+        usage={
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "cached_input_tokens": (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
+        },
+    )
+
+
+class BatchBackend(ABC):
+    """Submits a batch of requests to a provider, and blocks until its results are in"""
+
+    @abstractmethod
+    def run(self, requests: List[BatchRequest]) -> Dict[str, BatchResult]:
+        """Results keyed by custom_id. Requests missing from them are retried like failed ones."""
+        pass
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """
+    The OpenAI Batch API: uploads the requests as a JSONL file, creates a batch and
+    polls it until it ends, then downloads the output (and error) files.
+    """
+    FINISHED = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(self, poll_interval: float = 30.0, completion_window: str = "24h"):
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+
+    def run(self, requests: List[BatchRequest]) -> Dict[str, BatchResult]:
+        # Imported here so only processes that send OpenAI batches load the SDK
+        from src.llms.openai import shared_client
+
+        client = shared_client()
+        lines = "\n".join(request_line(r) for r in requests) + "\n"
+        upload = client.files.create(file=("batch.jsonl", io.BytesIO(lines.encode())), purpose="batch")
+        batch = client.batches.create(
+            input_file_id=upload.id, endpoint=CHAT_COMPLETIONS, completion_window=self.completion_window
+        )
+
+        while batch.status not in self.FINISHED:
+            time.sleep(self.poll_interval)
+            batch = client.batches.retrieve(batch.id)
+
+        results = {}
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if file_id:
+                for line in client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        custom_id, result = parse_output_line(line)
+                        results[custom_id] = result
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    Stand-in batch server for testing batch mode offline. Requests go through the same
+    JSONL formats as the OpenAI Batch API, and the whole batch is answered by
+    LocalClient (with its error rate, but not its per-call latency) after turnaround seconds.
+    """
+
+    def __init__(self, turnaround: float = 0.0):
+        self.turnaround = turnaround
+        self._clients: Dict[str, LocalClient] = {}
+
+    def _answer(self, line: str) -> str:
+        request = json.loads(line)
+        model = request["body"]["model"]
+        if model not in self._clients:
+            self._clients[model] = LocalClient("local", model)
+        client = self._clients[model]
+        schema = request["body"].get("response_format", {}).get("json_schema")
+        try:
+            content = client.answer(
+                request["body"]["messages"], ResponseSchema(schema["name"], schema["schema"]) if schema else None
+            )
+        except Exception as e:
+            return json.dumps({"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}})
+
+        usage = client.last_usage
+        return json.dumps({
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": {
+                        "prompt_tokens": usage["input_tokens"],
+                        "completion_tokens": usage["output_tokens"],
+                    },
+                },
+            },
+            "error": None,
+        })
+
+    def run(self, requests: List[BatchRequest]) -> Dict[str, BatchResult]:
+        time.sleep(self.turnaround)
+        return dict(parse_output_line(self._answer(request_line(r))) for r in requests)
+
+
+class BatchCollector:
+    """
+    Collects LLM calls from many games on one event loop into provider batches.
+
+    The first call waiting for a provider opens a batch, which is submitted flush_after
+    seconds later (or as soon as it holds max_batch_size calls). Games advance phase by
+    phase in step: every game blocked on a call joins the same batch, and resumes when
+    the batch's results are in, while other batches can still be in flight. Failed
+    requests are resubmitted with the next batch, up to max_attempts times.
+    """
+
+    def __init__(
+        self,
+        backends: Dict[str, BatchBackend],
+        flush_after: float = 0.1,
+        max_batch_size: int = 50_000,
+        max_attempts: int = 2,
+    ):
+        self.backends = backends
+        self.flush_after = flush_after
+        self.max_batch_size = max_batch_size
+        self.max_attempts = max_attempts
+        self.pending: Dict[str, List[BatchRequest]] = {}
+        self.batches = 0
+        self.requests = 0
+        self._ids = itertools.count()
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._in_flight = set()
+
+    def handles(self, provider: str) -> bool:
+        return provider in self.backends
+
+    async def request(self, client: BaseLLMClient, messages, schema: ResponseSchema = None) -> BatchResult:
+        request = BatchRequest(
+            custom_id=f"request-{next(self._ids)}",
+            model=client.model,
+            messages=chat_messages(messages),
+            sampling_params=client.sampling_params,
+            future=asyncio.get_running_loop().create_future(),
+            response_format=response_format(schema) if schema else None,
+        )
+        self._enqueue(client.provider, request)
+        return await request.future
+
+    def _enqueue(self, provider: str, request: BatchRequest):
+        pending = self.pending.setdefault(provider, [])
+        pending.append(request)
+        if len(pending) >= self.max_batch_size:
+            self._flush(provider)
+        elif provider not in self._timers:
+            self._timers[provider] = asyncio.get_running_loop().call_later(self.flush_after, self._flush, provider)
+
+    def _flush(self, provider: str):
+        timer = self._timers.pop(provider, None)
+        if timer:
+            timer.cancel()
+        batch = self.pending.pop(provider, [])
+        if batch:
+            task = asyncio.ensure_future(self._submit(provider, batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _submit(self, provider: str, batch: List[BatchRequest]):
+        self.batches += 1
+        self.requests += len(batch)
+        try:
+            # Backends block until the batch ends, which can take hours - keep the loop free meanwhile
+            results = await asyncio.to_thread(self.backends[provider].run, batch)
+        except Exception as e:
+            results = {r.custom_id: BatchResult(error=repr(e)) for r in batch}
+
+        for request in batch:
+            if request.future.done():
+                continue  # The game gave up waiting
+            result = results.get(request.custom_id) or BatchResult(error="No result in batch output")
+            if result.error is None:
+                request.future.set_result(result)
+            elif request.attempts + 1 < self.max_attempts:
+                request.attempts += 1
+                self._enqueue(provider, request)
+            else:
+                request.future.set_exception(BatchRequestError(f"{request.custom_id}: {result.error}"))
+
+
+class BatchingClient(ClientWrapper):
+    """
+    Sends async calls through the batch collector, for providers it has a backend for.
+    Other providers, and sync calls, go straight to the wrapped client.
+
+    Batches can't be streamed, so calls with a stop predicate get the whole response
+    and apply it afterwards.
+    """
+
+    def __init__(self, inner: BaseLLMClient, collector: BatchCollector):
+        super().__init__(inner)
+        self.collector = collector
+        self.calls = 0
+
+    @property
+    def cancellable(self):
+        # A batched request is sent with its batch whether or not anyone still wants it
+        return not self.collector.handles(self.provider) and self.inner.cancellable
+
+    async def get_response_async(self, messages) -> str:
+        if not self.collector.handles(self.provider):
+            return await self.inner.get_response_async(messages)
+
+        self.calls += 1
+        result = await self.collector.request(self, messages)
+        self.record_usage(**result.usage, batched=True)
+        return result.response
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        if not self.collector.handles(self.provider):
+            return await self.inner.get_response_until_async(messages, stop)
+
+        response = await self.get_response_async(messages)
+        return stop(response) or response
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        if not self.collector.handles(self.provider):
+            return await self.inner.get_structured_async(messages, schema)
+
+        self.calls += 1
+        result = await self.collector.request(self, messages, schema)
+        self.record_usage(**result.usage, batched=True)
+        return result.response
@@ -1,12 +1,27 @@
 import boto3
-import os
-from dotenv import load_dotenv
-from src.llms.base_client import BaseLLMClient
+import json
+from botocore.config import Config
+from src.config import getenv
+from src.llms.base_client import BaseLLMClient, CACHE_POINT, ResponseSchema
+from src.llms.registry import registry, REQUEST_TIMEOUT
 
+# Models that take cachePoint blocks in the Converse API, without the cross-region inference
+# profile's prefix. Others (eg. Claude 3.5 Sonnet) reject them, so their prompts go uncached.
+PROMPT_CACHING_MODELS = {
+    "anthropic.claude-3-5-haiku-20241022-v1:0",
+    "anthropic.claude-3-7-sonnet-20250219-v1:0",
+    "anthropic.claude-sonnet-4-20250514-v1:0",
+    "anthropic.claude-opus-4-20250514-v1:0",
+    "amazon.nova-micro-v1:0",
+    "amazon.nova-lite-v1:0",
+    "amazon.nova-pro-v1:0",
+}
+INFERENCE_PROFILE_PREFIXES = {"us", "eu", "apac", "us-gov", "global"}
 
-load_dotenv()
 
 class BedrockClient(BaseLLMClient):
+    provider = "Bedrock"
+
     def __init__(self, model_alias, model_snapshot):
         super().__init__()
         self.client = self.instantiate_client()
@@ -14,8 +29,18 @@ class BedrockClient(BaseLLMClient):
         self.model_alias = model_alias
 
     def instantiate_client(self):
-        session = boto3.Session(profile_name=os.getenv("AWS_PROFILE"))
-        return session.client(service_name="bedrock-runtime")
+        # Sessions resolve credentials on creation, so build one client per process and share it
+        def create(pool_size):
+            session = boto3.Session(profile_name=getenv("AWS_PROFILE"))
+            config = Config(
+                max_pool_connections=pool_size,
+                tcp_keepalive=True,
+                read_timeout=REQUEST_TIMEOUT,
+                retries={"max_attempts": 1, "mode": "standard"},
+            )
+            return session.client(service_name="bedrock-runtime", config=config)
+
+        return registry.get("Bedrock", create)
 
     def get_response(self, messages):
         # Wrap string prompts into a list of message objects.
@@ -29,8 +54,67 @@ class BedrockClient(BaseLLMClient):
             messages=fixed_messages,
         )
 
+        self._record_usage(response.get("usage", {}))
+
         return response["output"]["message"]["content"][0]["text"]
 
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        # Bedrock has no JSON mode, but a model made to call a tool answers with its input
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+
+        response = self.client.converse(
+            modelId=self.model,
+            messages=self.fix_messages(messages),
+            toolConfig={
+                "tools": [{"toolSpec": {"name": schema.name, "inputSchema": {"json": schema.json}}}],
+                "toolChoice": {"tool": {"name": schema.name}},
+            },
+        )
+
+        self._record_usage(response.get("usage", {}))
+
+        for block in response["output"]["message"]["content"]:
+            if "toolUse" in block:
+                return json.dumps(block["toolUse"]["input"])
+        return ""
+
+    def stream_response(self, messages):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+
+        response = self.client.converse_stream(
+            modelId=self.model,
+            messages=self.fix_messages(messages),
+        )
+        stream = response["stream"]
+        text, usage = "", None
+        try:
+            for event in stream:
+                if "contentBlockDelta" in event:
+                    content = event["contentBlockDelta"]["delta"].get("text", "")
+                    if content:
+                        text += content
+                        yield content
+                elif "metadata" in event:
+                    usage = event["metadata"].get("usage")
+        finally:
+            stream.close()
+            if usage is not None:
+                self._record_usage(usage)
+            else:
+                # Closed before the metadata event - Bedrock only reports usage at the end
+                self.record_estimated_usage(messages, text)
+
+    def _record_usage(self, usage: dict):
+        cache_read = usage.get("cacheReadInputTokens", 0)
+        # Bedrock reports cached and newly cached prompt tokens separately from inputTokens
+        self.record_usage(
+            usage.get("inputTokens", 0) + cache_read + usage.get("cacheWriteInputTokens", 0),
+            usage.get("outputTokens", 0),
+            cache_read,
+        )
+
     def vote(self, messages):
         return self.get_response(messages)
     
@@ -38,9 +122,22 @@ class BedrockClient(BaseLLMClient):
         if isinstance(messages, dict):
             messages = [messages]
         
-        # This is horrific, but is easier to deal with here as Anthropic is the only standout
+        # This is horrific, but is easier to deal with here as Anthropic is the only standout.
+        # Copy rather than edit in place - callers keep their message lists between calls
+        fixed = []
         for message in messages:
-            if not isinstance(message["content"], list):
-                message["content"] = [{"text": message["content"]}]
-        
-        return messages
+            content = message["content"]
+            if not isinstance(content, list):
+                content = [{"text": content}]
+            # Only the role and content are kept, so other models never see the cache point
+            if message.get(CACHE_POINT) and self.supports_prompt_caching:
+                # Cache everything up to and including this message
+                content = content + [{"cachePoint": {"type": "default"}}]
+            fixed.append({"role": message["role"], "content": content})
+
+        return fixed
+
+    @property
+    def supports_prompt_caching(self) -> bool:
+        prefix, _, model = self.model.partition(".")
+        return (model if prefix in INFERENCE_PROFILE_PREFIXES else self.model) in PROMPT_CACHING_MODELS
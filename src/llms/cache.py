@@ -0,0 +1,280 @@
+from src.llms.base_client import BaseLLMClient, ClientWrapper, ResponseSchema, StopPredicate
+from typing import Dict, Optional
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+MODES = ("cache", "record", "replay")
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a call has no recorded response"""
+
+
+def normalize_messages(messages) -> list:
+    """Reduce the prompt shapes the clients accept to a plain list of role/text dicts"""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    elif isinstance(messages, dict):
+        messages = [messages]
+
+    normalized = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            # Bedrock-style content blocks
+            content = "".join(block.get("text", "") for block in content)
+        normalized.append({"role": message.get("role", "user"), "content": content})
+    return normalized
+
+
+def cache_key(provider: str, model: str, messages, sampling_params: dict, occurrence: int = 0) -> str:
+    material = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "messages": normalize_messages(messages),
+            "params": sampling_params,
+            "occurrence": occurrence,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class ResponseStore:
+    """
+    SQLite store of LLM responses keyed by cache_key, evicting least recently used
+    entries once it holds more than max_entries responses or max_bytes of text.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite", max_entries: int = 100_000, max_bytes: int = 1 << 30):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                response TEXT,
+                size INTEGER,
+                last_used REAL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+        self.entries, self.bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, provider: str, model: str, response: str):
+        size = len(response.encode())
+        with self._lock:
+            existing = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if existing:
+                self.entries -= 1
+                self.bytes -= existing[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, size, time.time()),
+            )
+            self.entries += 1
+            self.bytes += size
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        while self.entries > self.max_entries or self.bytes > self.max_bytes:
+            key, size = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.entries -= 1
+            self.bytes -= size
+
+    def import_game_log(self, path: str) -> int:
+        """Load the responses a recorded game logged (compressed or not), returning the number imported"""
+        # Imported here so games that never import logs don't load the analytics modules
+        from src.analytics.events import read_log
+
+        imported = 0
+        for event in read_log(path):
+            if event.get("event") == "llm_response":
+                data = event["data"]
+                self.put(data["key"], data["provider"], data["model"], data["response"])
+                imported += 1
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_stores: Dict[str, ResponseStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path: str) -> ResponseStore:
+    """The process's shared ResponseStore for path, opened on first use"""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ResponseStore(path)
+        return _stores[path]
+
+
+class ResponseCache:
+    """
+    One game's view of a ResponseStore.
+
+    "cache" answers from the store when it can and stores new responses, "record" always
+    calls the provider and also logs every response to the game log, and "replay" only
+    answers from the store, raising CacheMissError instead of touching the network.
+    Identical prompts within a game are told apart by how many times they've been asked,
+    so a replayed game gets back the same sequence of responses the recorded one did.
+    """
+
+    def __init__(self, store: ResponseStore, mode: str = "cache", logger=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.store = store
+        self.mode = mode
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self._occurrences: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, client: BaseLLMClient) -> "CachingClient":
+        return CachingClient(client, self)
+
+    def key_for(self, client: BaseLLMClient, messages, schema: ResponseSchema = None) -> str:
+        params = client.sampling_params
+        if schema is not None:
+            # A structured response answers the same prompt differently
+            params = {**params, "response_schema": schema._asdict()}
+        base = cache_key(client.provider, client.model, messages, params)
+        with self._lock:
+            occurrence = self._occurrences.get(base, 0)
+            self._occurrences[base] = occurrence + 1
+        return cache_key(client.provider, client.model, messages, params, occurrence)
+
+    def lookup(self, key: str) -> Optional[str]:
+        if self.mode == "record":
+            return None
+
+        response = self.store.get(key)
+        if response is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"No recorded response for call {key}")
+        return response
+
+    def save(self, key: str, client: BaseLLMClient, response: str):
+        self.store.put(key, client.provider, client.model, response)
+        if self.mode == "record" and self.logger:
+            self.logger.log({
+                "event": "llm_response",
+                "data": {"key": key, "provider": client.provider, "model": client.model, "response": response}
+            })
+
+
+class CachingClient(ClientWrapper):
+    def __init__(self, inner: BaseLLMClient, cache: ResponseCache):
+        super().__init__(inner)
+        self.cache = cache
+
+    def get_response(self, messages) -> str:
+        key = self.cache.key_for(self, messages)
+        response = self.cache.lookup(key)
+        if response is None:
+            response = self.inner.get_response(messages)
+            self.cache.save(key, self, response)
+        else:
+            self.record_usage(0, 0)
+        return response
+
+    async def get_response_async(self, messages) -> str:
+        key = self.cache.key_for(self, messages)
+        response = self.cache.lookup(key)
+        if response is None:
+            response = await self.inner.get_response_async(messages)
+            self.cache.save(key, self, response)
+        else:
+            self.record_usage(0, 0)
+        return response
+
+    # Streamed calls store the answer they stopped at, so a hit reads the same as a fresh call
+
+    def get_response_until(self, messages, stop: StopPredicate) -> str:
+        key = self.cache.key_for(self, messages)
+        response = self.cache.lookup(key)
+        if response is None:
+            response = self.inner.get_response_until(messages, stop)
+            self.cache.save(key, self, response)
+        else:
+            self.record_usage(0, 0)
+            response = stop(response) or response
+        return response
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        key = self.cache.key_for(self, messages)
+        response = self.cache.lookup(key)
+        if response is None:
+            response = await self.inner.get_response_until_async(messages, stop)
+            self.cache.save(key, self, response)
+        else:
+            self.record_usage(0, 0)
+            response = stop(response) or response
+        return response
+
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        key = self.cache.key_for(self, messages, schema)
+        response = self.cache.lookup(key)
+        if response is None:
+            response = self.inner.get_structured(messages, schema)
+            self.cache.save(key, self, response)
+        else:
+            self.record_usage(0, 0)
+        return response
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        key = self.cache.key_for(self, messages, schema)
+        response = self.cache.lookup(key)
+        if response is None:
+            response = await self.inner.get_structured_async(messages, schema)
+            self.cache.save(key, self, response)
+        else:
+            self.record_usage(0, 0)
+        return response
+
+
+class ReplayOnlyClient(BaseLLMClient):
+    """Stands in for a provider client when replaying, so no SDK client is ever built"""
+    cancellable = True  # Nothing is ever sent
+
+    def __init__(self, provider: str, model_alias: str, model_snapshot: str, sampling_params: dict = None):
+        super().__init__()
+        self.provider = provider
+        self.model = model_snapshot
+        self.model_alias = model_alias
+        self.sampling_params = sampling_params or {}
+
+    def get_response(self, messages) -> str:
+        raise CacheMissError(f"{self.provider} {self.model} cannot be called while replaying")
@@ -1,35 +1,98 @@
-from src.llms.openai import OpenAIClient
-from src.llms.fireworks import FireworksClient
-from src.llms.bedrock import BedrockClient
+from src.llms.rate_limit import RateLimitedClient
+from src.llms.resilience import ResilientClient
+from src.llms.cache import ReplayOnlyClient
+from typing import Dict, Iterable, Union
 
-import os
+import importlib
 import random
 
 MODELS = {
     "OpenAI": [('o1-2024-12-17', 'o1'), ('gpt-4o-2024-08-06', '4o-aug'), ('gpt-4o-2024-11-20', '4o-nov'), ('o3-mini-2025-01-31', 'o3')],
     "Bedrock": [('eu.anthropic.claude-3-5-sonnet-20240620-v1:0', 'sonnet')],
     # "Fireworks": [('accounts/fireworks/models/llama-v3p1-405b-instruct', 'llama'), ('accounts/fireworks/models/deepseek-r1', 'r1')],
+    "Local": [('local-mock', 'local')],
 }
 
-def choose_random_model():
-    flattened = [i for s in list(MODELS.values()) for i in s]
-    return random.choice(flattened)
+# Providers that are only used when asked for explicitly, never in random lineups
+OFFLINE_PROVIDERS = {"Local"}
+
+# Each provider's client class, as "module:Class". A provider's module (and its SDK) is
+# only imported when one of its models is first used, so a process playing Local or
+# Bedrock games never loads openai or requests.
+PROVIDERS = {
+    "OpenAI": "src.llms.openai:OpenAIClient",
+    "Fireworks": "src.llms.fireworks:FireworksClient",
+    "Bedrock": "src.llms.bedrock:BedrockClient",
+    "Local": "src.llms.local:LocalClient",
+}
+
+_client_classes: Dict[str, type] = {}
+
+def register_provider(provider: str, client: Union[str, type], models: Iterable[tuple] = (), offline: bool = False):
+    """
+    Add a provider, or replace one's client: a client class or its "module:Class" path,
+    and the (snapshot, alias) of models it serves. Offline providers are never picked at random.
+    """
+    PROVIDERS[provider] = client if isinstance(client, str) else f"{client.__module__}:{client.__qualname__}"
+    _client_classes.pop(provider, None)
+    if not isinstance(client, str):
+        _client_classes[provider] = client
+    MODELS.setdefault(provider, []).extend(m for m in models if m not in MODELS[provider])
+    if offline:
+        OFFLINE_PROVIDERS.add(provider)
+
+def client_class(provider: str) -> type:
+    """The provider's client class, importing its module the first time"""
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    if provider not in _client_classes:
+        module, name = PROVIDERS[provider].split(":")
+        _client_classes[provider] = getattr(importlib.import_module(module), name)
+    return _client_classes[provider]
+
+def models_for(providers: list = None) -> list:
+    """(snapshot, alias) of every model from the given providers, or from every online provider"""
+    if providers is None:
+        providers = [p for p in MODELS if p not in OFFLINE_PROVIDERS]
+    return [i for p in providers for i in MODELS[p]]
+
+def choose_random_model(rng: random.Random = None, providers: list = None):
+    rng = rng or random
+    return rng.choice(models_for(providers))
+
+def provider_for(model_snapshot: str) -> str:
+    for provider, models in MODELS.items():
+        if model_snapshot in [m[0] for m in models]:
+            return provider
+    raise ValueError(f"Unknown model: {model_snapshot}")
+
+def model_by_snapshot(model_snapshot: str) -> tuple:
+    provider = provider_for(model_snapshot)
+    return next(m for m in MODELS[provider] if m[0] == model_snapshot)
 
 class LLMFactory:
-    def __init__(self):
-        self.model_tuple = choose_random_model()
+    def __init__(self, rng: random.Random = None, providers: list = None, model_snapshot: str = None):
+        # A random model, unless a specific one is asked for (eg. to resume a game)
+        self.model_tuple = model_by_snapshot(model_snapshot) if model_snapshot else choose_random_model(rng, providers)
         self.model_snapshot = self.model_tuple[0]
         self.model_alias = self.model_tuple[1]
+        self.provider = provider_for(self.model_snapshot)
+
+    def create_client(self, game: str = None):
+        """A client for the chosen model. Offline clients seed their responses from game, a seat in a game"""
+        if game is not None and self.provider in OFFLINE_PROVIDERS:
+            client = client_class(self.provider)(self.model_alias, self.model_snapshot, game)
+        else:
+            client = client_class(self.provider)(self.model_alias, self.model_snapshot)
+        # Every client shares its provider's rate limit (unlimited unless configured) and
+        # circuit breaker, and retries throttling and server errors with backoff
+        return ResilientClient(RateLimitedClient(client))
 
-    def create_client(self):
-        for provider, models in MODELS.items():
-            model_snapshots = [m[0] for m in models]
-            if self.model_snapshot in model_snapshots:
-                if provider == "OpenAI":
-                    return OpenAIClient(self.model_alias, self.model_snapshot)
-                elif provider == "Fireworks":
-                    return FireworksClient(self.model_alias, self.model_snapshot)
-                elif provider == "Bedrock":
-                    return BedrockClient(self.model_alias, self.model_snapshot)
-                else:
-                    raise ValueError(f"Unknown LLM provider: {provider}")
\ No newline at end of file
+    def create_replay_client(self, sampling_params: dict = None):
+        """
+        A client for the chosen model that can only answer from recorded responses. Given
+        the sampling params the recording used, the provider's module isn't imported.
+        """
+        if sampling_params is None:
+            sampling_params = client_class(self.provider).sampling_params
+        return ReplayOnlyClient(self.provider, self.model_alias, self.model_snapshot, sampling_params)
@@ -1,48 +1,124 @@
 import requests
-import os
 import json
-from dotenv import load_dotenv
-from src.llms.base_client import BaseLLMClient
-
-load_dotenv()
+from requests.adapters import HTTPAdapter
+from src.config import getenv
+from src.llms.base_client import BaseLLMClient, ResponseSchema, strip_cache_points
+from src.llms.registry import registry, REQUEST_TIMEOUT
 
 
 class FireworksClient(BaseLLMClient):
+    provider = "Fireworks"
+    URL = "https://api.fireworks.ai/inference/v1/chat/completions"
+    sampling_params = {
+        "top_p": 1,
+        "top_k": 40,
+        "presence_penalty": 0,
+        "frequency_penalty": 0,
+        "temperature": 0.7,
+    }
+
     def __init__(self, model_alias, model_snapshot):
         super().__init__()
+        self.session = self.instantiate_session()
         self.model = model_snapshot
         self.model_alias = model_alias
 
-    def get_response(self, messages, temperature=0.7):
-        url = "https://api.fireworks.ai/inference/v1/chat/completions"
-        messages = [{"role": "user", "content": message} for message in messages]
+    def instantiate_session(self):
+        # A shared session keeps connections to the API alive between calls
+        def create(pool_size):
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            return session
+
+        return registry.get("Fireworks", create)
+
+    def _request(self, messages, temperature: float, stream: bool = False, response_format: dict = None):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        # Fireworks caches shared prompt prefixes automatically
+        messages = strip_cache_points(messages)
         payload = {
+            **self.sampling_params,
             "model": self.model,
-            "top_p": 1,
-            "top_k": 40,
-            "presence_penalty": 0,
-            "frequency_penalty": 0,
             "temperature": temperature,
             "messages": messages,
         }
+        if stream:
+            payload["stream"] = True
+        if response_format:
+            payload["response_format"] = response_format
         headers = {
-            "Accept": "application/json",
+            "Accept": "text/event-stream" if stream else "application/json",
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {os.getenv('FIREWORKS_API_KEY')}"
+            "Authorization": f"Bearer {getenv('FIREWORKS_API_KEY')}"
         }
-        response = requests.request("POST", url, headers=headers, data=json.dumps(payload))
-        text = json.loads(response.text)
+        return self.session.request(
+            "POST", self.URL, headers=headers, data=json.dumps(payload), timeout=REQUEST_TIMEOUT, stream=stream
+        )
+
+    def _record_usage(self, usage: dict):
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        self.record_usage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), cached)
+
+    def get_response(self, messages, temperature=0.7, response_format: dict = None):
+        response = self._request(messages, temperature, response_format=response_format)
+        # Raises requests.HTTPError, carrying the status code, for throttling and server errors
+        response.raise_for_status()
+        text = response.json()
+        if not text.get("choices"):
+            raise ValueError(f"Fireworks returned no choices: {response.text[:500]}")
         message = text['choices'][0]['message']['content']
 
+        self._record_usage(text.get("usage") or {})
+
         if "deepseek-r1" in self.model:
             return self.remove_thinking(message)
         else:
             return message
 
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        # JSON mode with a schema constrains decoding to it (with a grammar, server side)
+        return self.get_response(messages, response_format={"type": "json_object", "schema": schema.json})
+
+    def stream_response(self, messages, temperature=0.7):
+        response = self._request(messages, temperature, stream=True)
+        response.raise_for_status()
+        # deepseek-r1 thinks before it answers - hold everything back until the thinking ends
+        thinking = "deepseek-r1" in self.model
+        text, usage = "", None
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                if not chunk.get("choices"):
+                    continue
+                content = chunk["choices"][0].get("delta", {}).get("content") or ""
+                text += content
+                if thinking:
+                    if "</think>" not in text:
+                        continue
+                    thinking = False
+                    content = text.split("</think>")[-1]
+                content = content.replace("\n", "")
+                if content:
+                    yield content
+        finally:
+            response.close()
+            if usage is not None:
+                self._record_usage(usage)
+            else:
+                self.record_estimated_usage(messages, text)
+
     def vote(self, messages):
         return self.get_response(messages)
 
     def remove_thinking(self, message):
-        split_thinking = message.split("</think>")[1]
+        split_thinking = message.split("</think>")[-1]
         stripped_newlines = split_thinking.replace("\n", "")
         return stripped_newlines
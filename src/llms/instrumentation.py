@@ -0,0 +1,255 @@
+from src.llms.base_client import BaseLLMClient, ClientWrapper, ResponseSchema, StopPredicate, call_usage
+from src.llms.pricing import estimate_cost
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+import asyncio
+import random
+import threading
+import time
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# The game phase LLM calls are made in. The orchestrator sets it as phases change, and
+# it follows calls into worker threads and asyncio tasks.
+current_phase: ContextVar[str] = ContextVar("llm_phase", default="unknown")
+
+LABELS = ("provider", "model", "phase", "player")
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def set_phase(phase: str):
+    current_phase.set(phase)
+
+
+def _escape_label(value) -> str:
+    """A label value escaped for the Prometheus text format, which only escapes backslashes, quotes and newlines"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    In-process counters and latency distributions, labelled by provider, model, phase
+    and player. Distributions keep a uniform sample of up to max_samples observations
+    per label set for percentiles. Thread-safe.
+    """
+
+    def __init__(self, max_samples: int = 2048):
+        self.max_samples = max_samples
+        self.counters: Dict[str, Dict[Tuple, float]] = {}
+        self.samples: Dict[str, Dict[Tuple, List[float]]] = {}
+        self.observations: Dict[str, Dict[Tuple, Tuple[int, float]]] = {}  # count, sum
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: Tuple, value: float = 1.0):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0.0) + value
+
+    def observe(self, name: str, labels: Tuple, value: float):
+        with self._lock:
+            count, total = self.observations.setdefault(name, {}).get(labels, (0, 0.0))
+            count += 1
+            self.observations[name][labels] = (count, total + value)
+
+            samples = self.samples.setdefault(name, {}).setdefault(labels, [])
+            if len(samples) < self.max_samples:
+                samples.append(value)
+            else:
+                # Reservoir sampling keeps every observation equally likely to be kept
+                index = random.randrange(count)
+                if index < self.max_samples:
+                    samples[index] = value
+
+    def percentile(self, name: str, q: float, **match) -> Optional[float]:
+        """The q-th quantile of a distribution, across every label set matching the given labels"""
+        with self._lock:
+            values = sorted(
+                v
+                for labels, samples in self.samples.get(name, {}).items()
+                if all(dict(zip(LABELS, labels)).get(k) == want for k, want in match.items())
+                for v in samples
+            )
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def total(self, name: str, **match) -> float:
+        with self._lock:
+            return sum(
+                value
+                for labels, value in self.counters.get(name, {}).items()
+                if all(dict(zip(LABELS, labels)).get(k) == want for k, want in match.items())
+            )
+
+    def to_prometheus(self, prefix: str = "wolves_") -> str:
+        """Export in the Prometheus text exposition format - counters, and distributions as summaries"""
+        def label_text(labels, extra=""):
+            pairs = [f'{k}="{_escape_label(v)}"' for k, v in zip(LABELS, labels)]
+            if extra:
+                pairs.append(extra)
+            return "{" + ",".join(pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}{name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{prefix}{name}{label_text(labels)} {value}")
+
+            for name, series in sorted(self.observations.items()):
+                lines.append(f"# TYPE {prefix}{name} summary")
+                for labels, (count, total) in series.items():
+                    values = sorted(self.samples[name][labels])
+                    for q in QUANTILES:
+                        value = values[min(len(values) - 1, int(q * len(values)))]
+                        lines.append(f'{prefix}{name}{label_text(labels, f"quantile={chr(34)}{q}{chr(34)}")} {value}')
+                    lines.append(f"{prefix}{name}_sum{label_text(labels)} {total}")
+                    lines.append(f"{prefix}{name}_count{label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class InstrumentedClient(ClientWrapper):
+    """
+    Times every call and records its tokens and estimated cost in the metrics registry,
+    as an llm_call event in the game log (when given a logger), and as an OpenTelemetry
+    span when opentelemetry is installed.
+
+    Calls are labelled with the current phase (see set_phase), or with phase if it is
+    given, eg. "narrator" for the narrator's client, and with the player using the client.
+    Cancelled calls (eg. speculative ones that weren't needed) are recorded too, as
+    cancelled rather than failed.
+    """
+
+    def __init__(self, inner: BaseLLMClient, logger=None, player: str = None, phase: str = None, registry: MetricsRegistry = None):
+        super().__init__(inner)
+        self.logger = logger
+        self.player = player
+        self.phase = phase
+        self.metrics = registry or metrics
+
+    def _start(self):
+        span = None
+        if trace is not None:
+            span = trace.get_tracer("wolves.llm").start_span("llm.get_response")
+        return time.monotonic(), span
+
+    def _finish(self, started: float, span, usage: dict, error: BaseException = None, first_token_at: float = None):
+        latency = time.monotonic() - started
+        # Calls that aren't streamed get their whole response at once
+        ttft = first_token_at - started if first_token_at else latency
+        input_tokens = usage.get("input_tokens", 0)
+        cached = usage.get("cached_input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        cost = estimate_cost(self.model, input_tokens, output_tokens, cached, batch=usage.get("batched", False))
+        phase = self.phase or current_phase.get()
+        labels = (self.provider, self.model_alias, phase, self.player or "unknown")
+        cancelled = isinstance(error, asyncio.CancelledError)
+
+        self.metrics.inc("llm_calls_total", labels)
+        if cancelled:
+            self.metrics.inc("llm_cancelled_total", labels)
+        elif error is not None:
+            self.metrics.inc("llm_errors_total", labels)
+        self.metrics.observe("llm_latency_seconds", labels, latency)
+        self.metrics.observe("llm_time_to_first_token_seconds", labels, ttft)
+        self.metrics.inc("llm_input_tokens_total", labels, input_tokens)
+        self.metrics.inc("llm_cached_input_tokens_total", labels, cached)
+        self.metrics.inc("llm_output_tokens_total", labels, output_tokens)
+        self.metrics.inc("llm_cost_usd_total", labels, cost)
+
+        data = {
+            "provider": self.provider,
+            "model": self.model_alias,
+            "phase": phase,
+            "player": self.player,
+            "latency": round(latency, 4),
+            "time_to_first_token": round(ttft, 4),
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached,
+            "output_tokens": output_tokens,
+            "cost": cost,
+        }
+        if cancelled:
+            data["cancelled"] = True
+        elif error is not None:
+            data["error"] = repr(error)
+
+        if span is not None:
+            for key, value in data.items():
+                if value is not None:
+                    span.set_attribute(f"llm.{key}", value)
+            span.end()
+        if self.logger:
+            self.logger.log({"event": "llm_call", "data": data})
+
+    def _timed(self, call, first_token: list = None):
+        started, span = self._start()
+        error = None
+        with call_usage() as usage:
+            try:
+                return call()
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._finish(started, span, usage, error, first_token[0] if first_token else None)
+
+    async def _timed_async(self, call, first_token: list = None):
+        started, span = self._start()
+        error = None
+        with call_usage() as usage:
+            try:
+                return await call()
+            except BaseException as e:
+                # Including cancellation, so the span still ends
+                error = e
+                raise
+            finally:
+                self._finish(started, span, usage, error, first_token[0] if first_token else None)
+
+    @staticmethod
+    def _watch_first_token(stop: StopPredicate, first_token: list) -> StopPredicate:
+        # The stop predicate reads every chunk as it arrives, so its first call times the first token
+        def watched(text: str):
+            if not first_token:
+                first_token.append(time.monotonic())
+            return stop(text)
+        return watched
+
+    def get_response(self, messages) -> str:
+        return self._timed(lambda: self.inner.get_response(messages))
+
+    async def get_response_async(self, messages) -> str:
+        return await self._timed_async(lambda: self.inner.get_response_async(messages))
+
+    def get_response_until(self, messages, stop: StopPredicate) -> str:
+        first_token = []
+        watched = self._watch_first_token(stop, first_token)
+        return self._timed(lambda: self.inner.get_response_until(messages, watched), first_token)
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        first_token = []
+        watched = self._watch_first_token(stop, first_token)
+        return await self._timed_async(lambda: self.inner.get_response_until_async(messages, watched), first_token)
+
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        return self._timed(lambda: self.inner.get_structured(messages, schema))
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        return await self._timed_async(lambda: self.inner.get_structured_async(messages, schema))
+
+
+def label_client(client: BaseLLMClient, player: str):
+    """Label calls made through client with the player using it, if it is instrumented"""
+    while client is not None:
+        if isinstance(client, InstrumentedClient):
+            client.player = player
+            return
+        client = getattr(client, "inner", None)
@@ -0,0 +1,163 @@
+from src.llms.base_client import BaseLLMClient, ResponseSchema, StopPredicate
+from src.llms.structured import json_object
+from src.llms.tokens import estimate_tokens, estimate_text_tokens
+
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import re
+import time
+
+NAMES = [
+    "Ash", "Birch", "Cedar", "Dune", "Ember", "Fern", "Grove", "Hollow", "Iris", "Juniper",
+    "Kestrel", "Lark", "Moss", "Nettle", "Onyx", "Pike", "Quill", "Rowan", "Sage", "Thorn",
+]
+
+CHATTER = [
+    "I've got a weird feeling about {name}, they've been very quiet.",
+    "Honestly {name} is the only one making sense to me right now.",
+    "Can we talk about {name}? That last message felt rehearsed.",
+    "I'm a simple villager, but I'd keep an eye on {name}.",
+    "Not accusing anyone yet, but {name} dodged the question.",
+]
+
+DEATHS = [
+    "Dawn breaks, and {name} lies still. Who among you did this? Deliberate, and choose who to exile.",
+    "The village wakes to find {name} gone. One of you knows why - talk, and decide who must leave.",
+]
+
+
+class LocalProviderError(Exception):
+    """A synthetic provider failure, carrying the HTTP status a real provider would return"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Local provider returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+class LocalClient(BaseLLMClient):
+    """
+    Offline stand-in for a provider, for load testing the engine without endpoints.
+
+    It recognises the game's prompts and answers with valid intro JSON, a legal name
+    for votes and TRUE/FALSE for the narrator's vote check, and canned chatter
+    otherwise. Structured calls get the same answers, as the schema's object.
+    Responses are seeded from the provider, model and game (the game's seed and the
+    client's seat in it), so an offline run plays the same games on any thread or process.
+    Latency is drawn uniformly from latency ± latency_jitter seconds, and error_rate
+    of calls fail with a LocalProviderError (429 or 500, split by rate_limit_share).
+    """
+    provider = "Local"
+    cancellable = True
+
+    # Shared settings, see configure()
+    seed = 0
+    latency = 0.0
+    latency_jitter = 0.0
+    error_rate = 0.0
+    rate_limit_share = 0.5
+    vote_probability = 0.4
+
+    def __init__(self, model_alias, model_snapshot, game: str = None):
+        super().__init__()
+        self.model = model_snapshot
+        self.model_alias = model_alias
+        self.stream = f"{self.provider}:{model_snapshot}:{game}"
+        self._call_index = itertools.count()
+
+    @classmethod
+    def configure(cls, **settings):
+        for name, value in settings.items():
+            if not hasattr(cls, name) or name.startswith("_"):
+                raise ValueError(f"Unknown local provider setting: {name}")
+            setattr(cls, name, value)
+
+    def _prompt_text(self, messages) -> str:
+        if isinstance(messages, str):
+            return messages
+        if isinstance(messages, dict):
+            messages = [messages]
+        return "\n".join(str(m["content"]) for m in messages)
+
+    def _rng(self, text: str) -> random.Random:
+        digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+        return random.Random(f"{self.seed}:{self.stream}:{next(self._call_index)}:{digest}")
+
+    def _delay(self, rng: random.Random) -> float:
+        return max(0.0, self.latency + rng.uniform(-self.latency_jitter, self.latency_jitter))
+
+    def _maybe_fail(self, rng: random.Random):
+        if rng.random() < self.error_rate:
+            raise LocalProviderError(429 if rng.random() < self.rate_limit_share else 500)
+
+    def _respond(self, text: str, rng: random.Random) -> str:
+        if "Return ONLY a JSON object" in text:
+            free = [n for n in NAMES if n not in text] or [f"{rng.choice(NAMES)}{rng.randint(2, 999)}"]
+            return json.dumps({"name": rng.choice(free), "message": "Hey all, happy to be here!"})
+
+        if '"TRUE"' in text and '"FALSE"' in text:
+            return "TRUE" if rng.random() < self.vote_probability else "FALSE"
+
+        options = re.search(r"Your only options are (.+?)\.\s*\n", text)
+        if options:
+            return rng.choice(options.group(1).split(", "))
+
+        options = re.search(r"no additional commentary: (\[.*?\])", text)
+        if options:
+            names = json.loads(options.group(1).replace("'", '"'))
+            me = re.search(r"You are (.+?), a werewolf", text)
+            targets = [n for n in names if not me or n != me.group(1)] or names
+            return rng.choice(targets)
+
+        # Death announcements for the narrator's line pool, with the victims left as a placeholder
+        placeholder = re.search(r"victim\(s\) only as (\S+),", text)
+        if placeholder:
+            return rng.choice(DEATHS).format(name=placeholder.group(1))
+
+        names = re.findall(r"\b(\w+) - \w", text) or NAMES
+        return rng.choice(CHATTER).format(name=rng.choice(names))
+
+    def _reply(self, messages, text: str, rng: random.Random, schema: ResponseSchema = None) -> str:
+        self._maybe_fail(rng)
+        response = self._respond(text, rng)
+        if schema is not None and json_object(response) is None:
+            # A bare answer (eg. a vote's name) is the value of the schema's one property
+            response = json.dumps({next(iter(schema.json["properties"])): response})
+        self.record_usage(estimate_tokens(messages), estimate_text_tokens(response))
+        return response
+
+    def answer(self, messages, schema: ResponseSchema = None) -> str:
+        """Answer straight away, without the simulated latency"""
+        text = self._prompt_text(messages)
+        return self._reply(messages, text, self._rng(text), schema)
+
+    def get_response(self, messages) -> str:
+        text = self._prompt_text(messages)
+        rng = self._rng(text)
+        time.sleep(self._delay(rng))
+        return self._reply(messages, text, rng)
+
+    async def get_response_async(self, messages) -> str:
+        text = self._prompt_text(messages)
+        rng = self._rng(text)
+        await asyncio.sleep(self._delay(rng))
+        return self._reply(messages, text, rng)
+
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        text = self._prompt_text(messages)
+        rng = self._rng(text)
+        time.sleep(self._delay(rng))
+        return self._reply(messages, text, rng, schema)
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        text = self._prompt_text(messages)
+        rng = self._rng(text)
+        await asyncio.sleep(self._delay(rng))
+        return self._reply(messages, text, rng, schema)
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        # Answers arrive whole, so there is nothing to stop early - but don't tie up a thread
+        response = await self.get_response_async(messages)
+        return stop(response) or response
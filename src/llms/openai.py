@@ -1,31 +1,150 @@
-from src.llms.base_client import BaseLLMClient
-from openai import OpenAI
-import os
+from src.llms.base_client import BaseLLMClient, ResponseSchema, StopPredicate, strip_cache_points
+from src.config import getenv
+from src.llms.registry import registry, REQUEST_TIMEOUT
+from src.llms.structured import response_format
+from openai import OpenAI, AsyncOpenAI
+import httpx
 
-from dotenv import load_dotenv
 
-load_dotenv()
+def _limits(pool_size: int) -> httpx.Limits:
+    """Keep up to pool_size connections open"""
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+
+def shared_client() -> OpenAI:
+    """One pooled keep-alive client shared by every OpenAI model in the process"""
+    return registry.get("OpenAI", lambda pool_size: OpenAI(
+        api_key=getenv("OPENAI_API_KEY"),
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0,
+        http_client=httpx.Client(limits=_limits(pool_size)),
+    ))
+
+
+def shared_async_client() -> AsyncOpenAI:
+    """The running event loop's pooled async client, shared by every OpenAI model in the games on it"""
+    return registry.get_async("OpenAI", lambda pool_size: AsyncOpenAI(
+        api_key=getenv("OPENAI_API_KEY"),
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=_limits(pool_size)),
+    ))
+
 
 class OpenAIClient(BaseLLMClient):
+    provider = "OpenAI"
+    cancellable = True  # The async SDK closes the request's connection
+
     def __init__(self, model_alias, model_snapshot):
         super().__init__()
         self.client = self.instantiate_client()
         self.model = model_snapshot
         self.model_alias = model_alias
-    
+
     def instantiate_client(self):
-        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return shared_client()
 
-    def get_response(self, prompt):
+    def instantiate_async_client(self):
+        # Async connections belong to an event loop, so this is looked up on each call
+        return shared_async_client()
+
+    def _to_messages(self, prompt):
         # If prompt is a string, wrap it in a message object.
         if isinstance(prompt, str):
-            messages = [{"role": "user", "content": prompt}]
-        else:
-            messages = prompt
+            return [{"role": "user", "content": prompt}]
+        # OpenAI caches long prompt prefixes automatically, so cache points aren't sent
+        return strip_cache_points(prompt)
 
+    def _record_usage(self, response):
+        usage = response.usage
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        self.record_usage(usage.prompt_tokens, usage.completion_tokens, cached)
+
+    def get_response(self, prompt):
         response = self.client.chat.completions.create(
             model=self.model,
-            messages=messages,
+            messages=self._to_messages(prompt),
         )
+        self._record_usage(response)
         message_text = response.choices[0].message.content
-        return message_text
\ No newline at end of file
+        return message_text
+
+    async def get_response_async(self, prompt):
+        response = await self.instantiate_async_client().chat.completions.create(
+            model=self.model,
+            messages=self._to_messages(prompt),
+        )
+        self._record_usage(response)
+        return response.choices[0].message.content
+
+    # Structured outputs: the model can only answer with JSON matching the schema (or a refusal, returned as "")
+
+    def get_structured(self, prompt, schema: ResponseSchema) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._to_messages(prompt),
+            response_format=response_format(schema),
+        )
+        self._record_usage(response)
+        return response.choices[0].message.content or ""
+
+    async def get_structured_async(self, prompt, schema: ResponseSchema) -> str:
+        response = await self.instantiate_async_client().chat.completions.create(
+            model=self.model,
+            messages=self._to_messages(prompt),
+            response_format=response_format(schema),
+        )
+        self._record_usage(response)
+        return response.choices[0].message.content or ""
+
+    def _stream_kwargs(self, messages) -> dict:
+        # The usage chunk only comes at the end, so streams closed early estimate their usage
+        return dict(model=self.model, messages=messages, stream=True, stream_options={"include_usage": True})
+
+    def _read_chunk(self, chunk, received: list) -> str:
+        if chunk.usage is not None:
+            received.append(chunk)
+        if chunk.choices and chunk.choices[0].delta.content:
+            return chunk.choices[0].delta.content
+        return ""
+
+    def _record_stream_usage(self, messages, text: str, received: list):
+        if received:
+            self._record_usage(received[-1])
+        else:
+            self.record_estimated_usage(messages, text)
+
+    def stream_response(self, prompt):
+        messages = self._to_messages(prompt)
+        stream = self.client.chat.completions.create(**self._stream_kwargs(messages))
+        text, received = "", []
+        try:
+            for chunk in stream:
+                content = self._read_chunk(chunk, received)
+                if content:
+                    text += content
+                    yield content
+        finally:
+            stream.close()
+            self._record_stream_usage(messages, text, received)
+
+    async def get_response_until_async(self, prompt, stop: StopPredicate) -> str:
+        messages = self._to_messages(prompt)
+        stream = await self.instantiate_async_client().chat.completions.create(**self._stream_kwargs(messages))
+        text, received = "", []
+        try:
+            async for chunk in stream:
+                content = self._read_chunk(chunk, received)
+                if not content:
+                    continue
+                text += content
+                answer = stop(text)
+                if answer is not None:
+                    return answer
+        finally:
+            await stream.close()
+            self._record_stream_usage(messages, text, received)
+        return text
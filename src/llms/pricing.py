@@ -0,0 +1,25 @@
+# Estimated list prices in USD per million tokens: (input, cached input, output).
+# Cached input is what a prompt cache read costs; models without one repeat the input price.
+PRICES = {
+    'o1-2024-12-17': (15.00, 7.50, 60.00),
+    'gpt-4o-2024-08-06': (2.50, 1.25, 10.00),
+    'gpt-4o-2024-11-20': (2.50, 1.25, 10.00),
+    'o3-mini-2025-01-31': (1.10, 0.55, 4.40),
+    'eu.anthropic.claude-3-5-sonnet-20240620-v1:0': (3.00, 0.30, 15.00),
+    'accounts/fireworks/models/llama-v3p1-405b-instruct': (3.00, 3.00, 3.00),
+    'accounts/fireworks/models/deepseek-r1': (3.00, 3.00, 8.00),
+    'local-mock': (0.0, 0.0, 0.0),
+}
+
+# Batch APIs bill at a fraction of the synchronous price
+BATCH_DISCOUNT = 0.5
+
+
+def estimate_cost(
+    model_snapshot: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0, batch: bool = False
+) -> float:
+    """Estimated USD cost of a call, or 0.0 for models we don't have prices for"""
+    input_price, cached_price, output_price = PRICES.get(model_snapshot, (0.0, 0.0, 0.0))
+    uncached = input_tokens - cached_input_tokens
+    cost = (uncached * input_price + cached_input_tokens * cached_price + output_tokens * output_price) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
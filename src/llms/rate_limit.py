@@ -0,0 +1,134 @@
+from src.llms.base_client import BaseLLMClient, ClientWrapper, ResponseSchema, StopPredicate
+from src.llms.tokens import estimate_tokens
+from typing import Dict, Optional
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Refills at per_minute / 60 units a second, up to burst_seconds worth of capacity.
+
+    Callers reserve units up front and are told how long to wait for them, so the level
+    can go negative while reservations are outstanding. Not thread-safe on its own.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+
+class RateLimiter:
+    """
+    Shared requests/minute and tokens/minute limits for one provider. Thread-safe.
+
+    Each call reserves one request and its estimated input tokens plus
+    expected_output_tokens, and waits until both buckets can cover it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        expected_output_tokens: int = 256,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.expected_output_tokens = expected_output_tokens
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve capacity for a call and return how long to wait for it"""
+        if not self.requests and not self.tokens:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(tokens + self.expected_output_tokens, now))
+            return delay
+
+    def acquire(self, tokens: int = 0):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int = 0):
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# One limiter per provider, shared by every client in the process
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def set_rate_limit(
+    provider: str,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+):
+    with _limiters_lock:
+        _limiters[provider] = RateLimiter(requests_per_minute, tokens_per_minute)
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter()
+        return _limiters[provider]
+
+
+class RateLimitedClient(ClientWrapper):
+    """Waits on the provider's shared limiter before each call, and counts calls made"""
+
+    def __init__(self, inner: BaseLLMClient):
+        super().__init__(inner)
+        self.limiter = get_rate_limiter(self.provider)
+        self.calls = 0
+
+    def get_response(self, messages) -> str:
+        self.limiter.acquire(estimate_tokens(messages))
+        self.calls += 1
+        return self.inner.get_response(messages)
+
+    async def get_response_async(self, messages) -> str:
+        await self.limiter.acquire_async(estimate_tokens(messages))
+        self.calls += 1
+        return await self.inner.get_response_async(messages)
+
+    def get_response_until(self, messages, stop: StopPredicate) -> str:
+        self.limiter.acquire(estimate_tokens(messages))
+        self.calls += 1
+        return self.inner.get_response_until(messages, stop)
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        await self.limiter.acquire_async(estimate_tokens(messages))
+        self.calls += 1
+        return await self.inner.get_response_until_async(messages, stop)
+
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        self.limiter.acquire(estimate_tokens(messages))
+        self.calls += 1
+        return self.inner.get_structured(messages, schema)
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        await self.limiter.acquire_async(estimate_tokens(messages))
+        self.calls += 1
+        return await self.inner.get_structured_async(messages, schema)
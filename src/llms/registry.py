@@ -0,0 +1,102 @@
+from src.config import getenv
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List
+
+import asyncio
+import atexit
+import inspect
+import threading
+import weakref
+
+# Per-request timeout for every provider. Retries are handled by ResilientClient, so
+# the SDKs' own retry loops are switched off where clients are created.
+REQUEST_TIMEOUT = float(getenv("LLM_REQUEST_TIMEOUT", 120))
+
+
+class ClientRegistry:
+    """
+    Process-wide store of provider SDK clients.
+
+    Creating an SDK client sets up an HTTP connection pool and looks up credentials, so
+    every BaseLLMClient for a provider shares one client (and one keep-alive pool) instead
+    of building its own. Clients are created on first use with a pool of pool_size
+    connections; on_create/on_close hooks run when a client is created or torn down.
+
+    Async SDK clients hold connections tied to an event loop, so get_async keeps one per
+    loop instead. Games running on a loop hold loop_scope() while they play, and the
+    loop's clients are closed when the last of them ends.
+    """
+
+    def __init__(self, pool_size: int = 32):
+        self.pool_size = pool_size
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._on_create: List[Callable[[str, Any], None]] = []
+        self._on_close: List[Callable[[str, Any], None]] = []
+        self._loop_clients = weakref.WeakKeyDictionary()  # Event loop -> {key: async client}
+        self._loop_users = weakref.WeakKeyDictionary()  # Event loop -> games holding loop_scope()
+
+    def configure(self, pool_size: int):
+        """Set the pool size for clients created from now on"""
+        self.pool_size = pool_size
+
+    def on_create(self, hook: Callable[[str, Any], None]):
+        self._on_create.append(hook)
+
+    def on_close(self, hook: Callable[[str, Any], None]):
+        self._on_close.append(hook)
+
+    def _get(self, clients: Dict[str, Any], key: str, create: Callable[[int], Any]) -> Any:
+        with self._lock:
+            if key not in clients:
+                client = create(self.pool_size)
+                for hook in self._on_create:
+                    hook(key, client)
+                clients[key] = client
+            return clients[key]
+
+    def get(self, key: str, create: Callable[[int], Any]) -> Any:
+        """Return the shared client for key, calling create(pool_size) the first time"""
+        return self._get(self._clients, key, create)
+
+    def get_async(self, key: str, create: Callable[[int], Any]) -> Any:
+        """Return the running event loop's client for key, calling create(pool_size) the first time on each loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._loop_clients.setdefault(loop, {})
+        return self._get(clients, key, create)
+
+    @asynccontextmanager
+    async def loop_scope(self):
+        """Held by a game while it plays, so the running loop's async clients are closed after the last game on it"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._loop_users[loop] = self._loop_users.get(loop, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._loop_users[loop] -= 1
+                clients = self._loop_clients.pop(loop, {}) if not self._loop_users[loop] else {}
+            for key, client in clients.items():
+                for hook in self._on_close:
+                    hook(key, client)
+                close = getattr(client, "close", None)
+                result = close() if close else None
+                if inspect.isawaitable(result):
+                    await result
+
+    def close_all(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+
+        for key, client in clients.items():
+            for hook in self._on_close:
+                hook(key, client)
+            close = getattr(client, "close", None)
+            if close:
+                close()
+
+
+registry = ClientRegistry(pool_size=int(getenv("LLM_POOL_SIZE", 32)))
+atexit.register(registry.close_all)
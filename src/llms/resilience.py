@@ -0,0 +1,272 @@
+from src.llms.base_client import BaseLLMClient, ClientWrapper, ResponseSchema, StopPredicate
+from typing import Dict, Optional, Tuple
+
+import asyncio
+import random
+import threading
+import time
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# Bedrock reports throttling and outages as botocore ClientError codes
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+
+# Connection failures and timeouts from the SDKs, matched by name so this module
+# doesn't need to import openai, requests or botocore
+RETRYABLE_EXCEPTION_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "ConnectionError",
+    "Timeout",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "ReadTimeoutError",
+    "EndpointConnectionError",
+    "TimeoutError",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Provider circuit is open after repeated failures, retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+def status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None and getattr(error, "response", None) is not None:
+        response = error.response
+        if isinstance(response, dict):
+            # botocore ClientError
+            code = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        else:
+            code = getattr(response, "status_code", None)
+    return code
+
+
+def is_retryable(error: Exception) -> bool:
+    if status_code(error) in RETRYABLE_STATUS_CODES:
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(response, dict) and response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES:
+        return True
+    return any(cls.__name__ in RETRYABLE_EXCEPTION_NAMES for cls in type(error).__mro__)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """The provider's requested wait from a Retry-After header, if it sent one"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: attempt n waits a random time up to
+    base_delay * 2^n (capped at max_delay), or the provider's Retry-After if longer.
+    No attempt starts, and no wait runs, past deadline seconds from the first attempt.
+    """
+
+    def __init__(self, max_attempts: int = 6, base_delay: float = 1.0, max_delay: float = 60.0, deadline: float = 300.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a provider after failure_threshold consecutive retryable failures.
+
+    Once open, calls fail fast with CircuitOpenError for reset_timeout seconds, after
+    which a single trial call is let through: success closes the circuit again and
+    failure reopens it. Calls made while the trial is in flight are told to retry in
+    trial_wait seconds, and a trial that is cancelled lets the next call be the trial.
+    Thread-safe.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, trial_wait: float = 1.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_wait = trial_wait
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if the call can't go ahead, else return whether it is the trial call"""
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            closes_in = self.opened_at + self.reset_timeout - time.monotonic()
+            if closes_in > 0:
+                raise CircuitOpenError(closes_in)
+            if self.trial_in_flight:
+                raise CircuitOpenError(self.trial_wait)
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """The trial call ended without an answer either way (eg. it was cancelled)"""
+        with self._lock:
+            self.trial_in_flight = False
+
+
+# One breaker per provider, shared by every client in the process
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker()
+        return _breakers[provider]
+
+
+class ResilientClient(ClientWrapper):
+    """
+    Retries throttling, server errors and dropped connections with backoff, behind the
+    provider's circuit breaker. Wrap it around the RateLimitedClient so every retry
+    waits its turn on the rate limit too. Other errors are raised straight away.
+
+    While the circuit is open, calls wait for it to half-open if that is within their
+    deadline, so a struggling provider gets a pause instead of every game failing.
+    """
+
+    def __init__(self, inner: BaseLLMClient, policy: RetryPolicy = None):
+        super().__init__(inner)
+        self.policy = policy or RetryPolicy()
+        self.breaker = get_circuit_breaker(self.provider)
+        self.retries = 0
+
+    def _should_retry(self, error: Exception, attempt: int, started: float) -> Optional[float]:
+        """Record the failure and return how long to back off, or None to give up"""
+        if not is_retryable(error):
+            # The provider answered, it just didn't like the request
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+
+        delay = self.policy.backoff(attempt, error)
+        remaining = self.policy.deadline - (time.monotonic() - started)
+        if attempt + 1 >= self.policy.max_attempts or delay >= remaining:
+            return None
+        self.retries += 1
+        return delay
+
+    def _circuit_wait(self, started: float) -> Tuple[float, bool]:
+        """
+        Seconds to wait for the circuit to let a call through (raising if past the deadline),
+        and whether the call is the circuit's trial
+        """
+        try:
+            return 0.0, self.breaker.before_call()
+        except CircuitOpenError as e:
+            if time.monotonic() - started + e.retry_in >= self.policy.deadline:
+                raise
+            return e.retry_in, False
+
+    def _call(self, call):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait, trial = self._circuit_wait(started)
+            if wait:
+                time.sleep(wait)
+                continue
+            try:
+                response = call()
+            except Exception as e:
+                delay = self._should_retry(e, attempt, started)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+            except BaseException:
+                # Interrupted before the provider answered, so the trial told us nothing
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return response
+
+    async def _call_async(self, call):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait, trial = self._circuit_wait(started)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            remaining = self.policy.deadline - (time.monotonic() - started)
+            try:
+                response = await asyncio.wait_for(call(), remaining)
+            except Exception as e:
+                delay = self._should_retry(e, attempt, started)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled before the provider answered (eg. a speculative call that
+                # wasn't needed), so the trial told us nothing
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return response
+
+    def get_response(self, messages) -> str:
+        return self._call(lambda: self.inner.get_response(messages))
+
+    async def get_response_async(self, messages) -> str:
+        return await self._call_async(lambda: self.inner.get_response_async(messages))
+
+    def get_response_until(self, messages, stop: StopPredicate) -> str:
+        return self._call(lambda: self.inner.get_response_until(messages, stop))
+
+    async def get_response_until_async(self, messages, stop: StopPredicate) -> str:
+        return await self._call_async(lambda: self.inner.get_response_until_async(messages, stop))
+
+    def get_structured(self, messages, schema: ResponseSchema) -> str:
+        return self._call(lambda: self.inner.get_structured(messages, schema))
+
+    async def get_structured_async(self, messages, schema: ResponseSchema) -> str:
+        return await self._call_async(lambda: self.inner.get_structured_async(messages, schema))
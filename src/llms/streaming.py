@@ -0,0 +1,76 @@
+from src.llms.base_client import StopPredicate
+from collections import Counter
+from typing import Iterator, List, Optional
+
+import re
+
+# Reasoning models (eg. deepseek-r1) think out loud before answering, and the answer
+# can't be read from the thinking
+THINK_START = "<think>"
+THINK_END = "</think>"
+
+
+def visible_text(text: str) -> Optional[str]:
+    """The answer part of a response so far, or None while the model is still thinking"""
+    if text.lstrip().startswith(THINK_START):
+        if THINK_END not in text:
+            return None
+        return text.split(THINK_END)[-1]
+    return text
+
+
+def _complete_words(text: str) -> str:
+    """Drop a trailing partial word - the next chunk could still extend it"""
+    return re.sub(r"\w+\Z", "", text)
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[\w-]+", text.lower())
+
+
+def word_runs(text: str, max_words: int) -> Iterator[str]:
+    """Every run of up to max_words consecutive words in text, lowercased and space-separated"""
+    words = _words(text)
+    for size in range(1, max_words + 1):
+        for start in range(len(words) - size + 1):
+            yield " ".join(words[start:start + size])
+
+
+def name_stop(names: List[str]) -> StopPredicate:
+    """
+    Stop once the response names exactly one of the given players.
+
+    Players answer with their full name ("Ash - gpt-4o") or just the part before the
+    model ("Ash"). The answer is the name as written, so it resolves like a full response.
+    Names are found by looking up the answer's runs of words, so each check costs the
+    same however many players there are.
+    """
+    candidates = {" ".join(_words(name)): name for name in names}
+    short_forms = Counter(name.split(" - ")[0] for name in names)
+    for form, count in short_forms.items():
+        # Players sharing a name with different models have to be named in full
+        if count == 1:
+            candidates.setdefault(" ".join(_words(form)), form)
+    max_words = max((len(form.split(" ")) for form in candidates), default=0)
+
+    def stop(text: str) -> Optional[str]:
+        answer = visible_text(text)
+        if answer is None:
+            return None
+        found = {run for run in word_runs(_complete_words(answer), max_words) if run in candidates}
+        # A short form matches inside the full name, so keep only the longest matches
+        found = [form for form in found if not any(form != other and form in other for other in found)]
+        if len(found) != 1:
+            return None
+        return candidates[found[0]]
+
+    return stop
+
+
+def boolean_stop(text: str) -> Optional[str]:
+    """Stop once the response has said TRUE or FALSE"""
+    answer = visible_text(text)
+    if answer is None:
+        return None
+    match = re.search(r"\b(TRUE|FALSE)\b", _complete_words(answer).upper())
+    return match.group(1) if match else None
@@ -0,0 +1,67 @@
+from src.llms.base_client import ResponseSchema
+from typing import Dict, Iterable, Optional
+
+import json
+
+# JSON schema types of the values a structured response can hold
+JSON_TYPES = {"string": str, "integer": int, "number": (int, float), "boolean": bool}
+
+
+def object_schema(name: str, properties: Dict[str, dict]) -> ResponseSchema:
+    """
+    A schema for an object with exactly these properties, all of them required, as
+    OpenAI's strict mode and Bedrock's tool inputs both accept
+    """
+    return ResponseSchema(name, {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    })
+
+
+def choice_schema(name: str, field: str, options: Iterable[str]) -> ResponseSchema:
+    """A schema for an object whose one field must be one of options"""
+    return object_schema(name, {field: {"type": "string", "enum": list(options)}})
+
+
+def response_format(schema: ResponseSchema) -> dict:
+    """The schema as an OpenAI response_format, which the Batch API also takes"""
+    return {"type": "json_schema", "json_schema": {"name": schema.name, "schema": schema.json, "strict": True}}
+
+
+def json_object(text: str) -> Optional[dict]:
+    """
+    The JSON object in a response, or None if there isn't one. Anything around the
+    outermost braces (markdown fences, a reasoning model's thinking) is ignored.
+    """
+    if not text:
+        return None
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        value = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def validate(text: str, schema: ResponseSchema) -> Optional[dict]:
+    """The response's object if it has every required property, of the right type and in its enum, else None"""
+    value = json_object(text)
+    if value is None:
+        return None
+    properties = schema.json.get("properties", {})
+    for field in schema.json.get("required", properties):
+        if field not in value:
+            return None
+    for field, spec in properties.items():
+        if field not in value:
+            continue
+        expected = JSON_TYPES.get(spec.get("type"))
+        if expected and not isinstance(value[field], expected):
+            return None
+        if "enum" in spec and value[field] not in spec["enum"]:
+            return None
+    return value
@@ -0,0 +1,24 @@
+# Rough token counts for budgeting, without pulling in a provider tokenizer.
+# English text averages about four characters per token across the models we use.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_tokens(messages) -> int:
+    """Estimate the input tokens of a prompt string or list of messages"""
+    if isinstance(messages, str):
+        return estimate_text_tokens(messages) + MESSAGE_OVERHEAD_TOKENS
+    if isinstance(messages, dict):
+        messages = [messages]
+
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") for block in content)
+        total += estimate_text_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    return total
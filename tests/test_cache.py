@@ -0,0 +1,80 @@
+from src.llms.base_client import BaseLLMClient
+from src.llms.cache import CacheMissError, ResponseCache, ResponseStore
+
+import gzip
+import json
+
+import pytest
+
+
+class CountingClient(BaseLLMClient):
+    """Answers each call with how many calls it has had, so repeated prompts get different answers"""
+    provider = "Test"
+
+    def __init__(self):
+        super().__init__()
+        self.model = self.model_alias = "counting"
+        self.calls = 0
+
+    def get_response(self, messages) -> str:
+        self.calls += 1
+        return f"answer {self.calls}"
+
+
+class ListLogger:
+    def __init__(self):
+        self.events = []
+
+    def log(self, event: dict):
+        self.events.append(event)
+
+
+def test_repeated_prompts_get_successive_occurrence_keys():
+    cache = ResponseCache(ResponseStore(":memory:"))
+    client = CountingClient()
+    first, second = cache.key_for(client, "Who do you vote for?"), cache.key_for(client, "Who do you vote for?")
+    assert first != second
+
+    # A new game asks again from the first occurrence
+    fresh = ResponseCache(cache.store)
+    assert [fresh.key_for(client, "Who do you vote for?") for _ in range(2)] == [first, second]
+
+
+def test_replay_returns_the_recorded_sequence():
+    store = ResponseStore(":memory:")
+    logger = ListLogger()
+    recorder = ResponseCache(store, "record", logger).wrap(CountingClient())
+    recorded = [recorder.get_response("Same prompt") for _ in range(3)]
+    assert recorded == ["answer 1", "answer 2", "answer 3"]
+    assert [event["event"] for event in logger.events] == ["llm_response"] * 3
+
+    inner = CountingClient()
+    replayer = ResponseCache(store, "replay").wrap(inner)
+    assert [replayer.get_response("Same prompt") for _ in range(3)] == recorded
+    assert inner.calls == 0
+
+    # A fourth ask was never recorded
+    with pytest.raises(CacheMissError):
+        replayer.get_response("Same prompt")
+
+
+def test_record_mode_always_calls_the_provider():
+    store = ResponseStore(":memory:")
+    ResponseCache(store).wrap(CountingClient()).get_response("Hello")
+
+    inner = CountingClient()
+    ResponseCache(store, "record").wrap(inner).get_response("Hello")
+    assert inner.calls == 1
+
+
+def test_import_game_log_reads_compressed_logs(tmp_path):
+    logger = ListLogger()
+    ResponseCache(ResponseStore(":memory:"), "record", logger).wrap(CountingClient()).get_response("Hello")
+    path = tmp_path / "game.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(json.dumps({"event": "game_start"}) + "\n")
+        f.writelines(json.dumps(event) + "\n" for event in logger.events)
+
+    store = ResponseStore(":memory:")
+    assert store.import_game_log(str(path)) == 1
+    assert ResponseCache(store, "replay").wrap(CountingClient()).get_response("Hello") == "answer 1"
@@ -0,0 +1,64 @@
+from src.analytics.events import EventStore
+
+import gzip
+import json
+import os
+
+
+def write_log(path: str, finished: bool, partial: bool = False):
+    events = [
+        {"event": "game_config", "data": {"seed": 0}},
+        {"event": "role_assigned", "data": {"player": "Ash - local", "role": "villager"}},
+    ]
+    if finished:
+        events.append({"event": "game_end", "data": {"winner": "Villagers"}})
+    text = "".join(json.dumps(e) + "\n" for e in events)
+    if partial:
+        text += '{"event": "player_disc'
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        f.write(text)
+
+
+def games(store: EventStore) -> list:
+    return sorted({row["game"] for row in store.rows(["game"])})
+
+
+def test_ingest_skips_unfinished_games_until_they_end(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    write_log(str(logs / "done.jsonl"), finished=True)
+    write_log(str(logs / "playing.jsonl"), finished=False, partial=True)
+    store = EventStore(str(tmp_path / "store"), format="wcol")
+
+    assert store.ingest([str(logs)]) == 1
+    assert games(store) == ["done"]
+
+    write_log(str(logs / "playing.jsonl"), finished=True)
+    assert store.ingest([str(logs)]) == 1
+    assert games(store) == ["done", "playing"]
+
+
+def test_ingest_recognises_a_log_after_it_is_compressed(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    write_log(str(logs / "game.jsonl"), finished=True)
+    store = EventStore(str(tmp_path / "store"), format="wcol")
+    assert store.ingest([str(logs)]) == 1
+
+    os.remove(logs / "game.jsonl")
+    write_log(str(logs / "game.jsonl.gz"), finished=True)
+    assert store.ingest([str(logs)]) == 0
+    # Also across runs, from the manifest
+    assert EventStore(str(tmp_path / "store"), format="wcol").ingest([str(logs)]) == 0
+
+
+def test_ingest_adds_a_game_once_when_both_its_logs_exist(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    # Caught part way through compressing it
+    write_log(str(logs / "game.jsonl"), finished=True)
+    write_log(str(logs / "game.jsonl.gz"), finished=True)
+    store = EventStore(str(tmp_path / "store"), format="wcol")
+    assert store.ingest([str(logs)]) == 1
+    assert len(list(store.rows(["game"]))) == 3
@@ -0,0 +1,114 @@
+from src.llms import instrumentation
+from src.llms.base_client import BaseLLMClient
+from src.llms.instrumentation import InstrumentedClient, MetricsRegistry
+
+import asyncio
+
+
+class ThreadedClient(BaseLLMClient):
+    """Records (tokens, delay) prompts' usage, with no async client so async calls run in a worker thread"""
+    provider = "Test"
+
+    def __init__(self):
+        super().__init__()
+        self.model = self.model_alias = "test"
+
+    def get_response(self, messages) -> str:
+        tokens, _ = messages
+        self.record_usage(tokens, 1)
+        return "ok"
+
+
+class SlowClient(ThreadedClient):
+    """Answers after delay seconds, recording usage before the wait for odd token counts and after it for even ones"""
+
+    async def get_response_async(self, messages) -> str:
+        tokens, delay = messages
+        if tokens % 2:
+            self.record_usage(tokens, 1)
+            await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+            self.record_usage(tokens, 1)
+        return "ok"
+
+
+class ListLogger:
+    def __init__(self):
+        self.events = []
+
+    def log(self, event: dict):
+        self.events.append(event)
+
+
+def instrumented(inner: BaseLLMClient, logger: ListLogger) -> InstrumentedClient:
+    return InstrumentedClient(inner, logger=logger, player="Ash", registry=MetricsRegistry())
+
+
+def test_concurrent_calls_keep_their_own_usage():
+    logger = ListLogger()
+    client = instrumented(SlowClient(), logger)
+
+    async def both():
+        # The first call records its usage, then the second records its own before the first finishes
+        await asyncio.gather(client.get_response_async((11, 0.05)), client.get_response_async((20, 0.01)))
+
+    asyncio.run(both())
+    assert sorted(event["data"]["input_tokens"] for event in logger.events) == [11, 20]
+    assert client.metrics.total("llm_input_tokens_total") == 31
+
+
+def test_usage_recorded_in_a_worker_thread_is_the_calls():
+    logger = ListLogger()
+    client = instrumented(ThreadedClient(), logger)
+    asyncio.run(client.get_response_async((7, 0)))
+    assert logger.events[0]["data"]["input_tokens"] == 7
+
+
+class Span:
+    def __init__(self):
+        self.attributes = {}
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.ended = True
+
+
+class Tracer:
+    def __init__(self):
+        self.spans = []
+
+    def get_tracer(self, name):
+        return self
+
+    def start_span(self, name):
+        self.spans.append(Span())
+        return self.spans[-1]
+
+
+def test_cancelled_call_ends_its_span(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(instrumentation, "trace", tracer)
+    logger = ListLogger()
+    client = instrumented(SlowClient(), logger)
+
+    async def cancel():
+        task = asyncio.create_task(client.get_response_async((2, 60)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel())
+    assert tracer.spans[0].ended and tracer.spans[0].attributes["llm.cancelled"] is True
+    assert logger.events[0]["data"]["cancelled"] and "error" not in logger.events[0]["data"]
+    assert client.metrics.total("llm_cancelled_total") == 1 and client.metrics.total("llm_errors_total") == 0
+
+
+def test_prometheus_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.inc("llm_calls_total", ("Test", 'C:\\models\\"big"\nv2', "vote", "Ash"))
+    line = registry.to_prometheus().splitlines()[1]
+    assert line == 'wolves_llm_calls_total{provider="Test",model="C:\\\\models\\\\\\"big\\"\\nv2",phase="vote",player="Ash"} 1.0'
@@ -0,0 +1,48 @@
+from src.game.name_index import ALIAS, EXACT, FUZZY, MENTION, NameIndex
+
+import pytest
+
+PLAYERS = ["Ash - o1", "Juniper - 4o-aug", "Kestrel - sonnet", "Rowan - o3", "Rowan - sonnet"]
+
+
+@pytest.fixture
+def index() -> NameIndex:
+    return NameIndex(PLAYERS)
+
+
+def test_exact_full_name(index):
+    assert index.resolve("Juniper - 4o-aug") == ("Juniper - 4o-aug", EXACT, "exact")
+    # Case, spacing and punctuation around the name don't matter
+    assert index.resolve('  "kestrel   -  sonnet". ') == ("Kestrel - sonnet", EXACT, "exact")
+
+
+def test_alias_needs_a_single_player(index):
+    assert index.resolve("Juniper") == ("Juniper - 4o-aug", ALIAS, "alias")
+    assert index.resolve("Rowan") == (None, 0.0, "ambiguous")
+    # Unless only one of them can be voted for
+    assert index.resolve("Rowan", {"Rowan - o3", "Ash - o1"}) == ("Rowan - o3", ALIAS, "alias")
+
+
+def test_naming_someone_who_cant_be_voted_for_is_unresolved(index):
+    assert index.resolve("Juniper", {"Ash - o1", "Kestrel - sonnet"}) == (None, 0.0, "unresolved")
+
+
+def test_fuzzy_match_within_the_edit_distance(index):
+    name, confidence, method = index.resolve("Junipr")
+    assert (name, method) == ("Juniper - 4o-aug", "fuzzy")
+    assert confidence == pytest.approx(FUZZY * (1 - 1 / len("juniper")))
+
+    # Short names allow fewer edits, so "Ax" isn't taken for Ash
+    assert index.resolve("Ax").method == "unresolved"
+
+
+def test_mention_in_a_longer_answer(index):
+    vote = "After everything said today, I'm voting for Kestrel, they dodged every question."
+    assert index.resolve(vote) == ("Kestrel - sonnet", MENTION, "mention")
+    assert index.resolve("Either Ash or Juniper, I can't decide").method == "ambiguous"
+    assert index.resolve("I'm not sure about anyone").method == "unresolved"
+
+
+def test_empty_vote(index):
+    assert index.resolve("") == (None, 0.0, "unresolved")
+    assert index.resolve(None) == (None, 0.0, "unresolved")
@@ -0,0 +1,139 @@
+from src.game.async_orchestrator import AsyncGameOrchestrator
+from src.game.narrator import Narrator
+from src.game.orchestrator import GameOrchestrator
+from src.game.roles import BasePlayer
+from src.game.termination import NarratorJudge
+from src.llms.local import LocalClient
+from collections import Counter
+
+import asyncio
+import json
+import random
+
+
+class ListLogger:
+    game_id = "test"
+    compression = None
+
+    def __init__(self):
+        self.events = []
+
+    def log(self, event: dict):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+    def kinds(self) -> list:
+        return [event["event"] for event in self.events]
+
+
+def new_game(orchestrator_class=GameOrchestrator, players: int = 7, client_class=LocalClient, **options):
+    """A game against Local clients, the narrator's in seat 0"""
+    clients = [client_class("local", "local-model", game=f"test:{seat}") for seat in range(players + 1)]
+    return orchestrator_class(
+        [BasePlayer(client) for client in clients[1:]], Narrator(clients[0]), ListLogger(),
+        rng=random.Random(0), **options,
+    )
+
+
+def local_game(**options):
+    """A game with everyone introduced and dealt a role"""
+    game = new_game(**options)
+    game.introduction_phase()
+    game.role_assignment_phase()
+    return game
+
+
+def test_a_village_vote_naming_no_one_exiles_no_one():
+    game = local_game()
+    for player in game.players:
+        player.vote = lambda *args, **kwargs: "I'd rather not say"
+
+    game.day_phase()
+    assert all(player.is_alive for player in game.players)
+    assert "player_exiled" not in game.logger.kinds()
+    assert game.vote_tallies[-1]["chosen"] is None
+    assert game.logger.events[-1] == {"event": "vote_unresolved", "data": {"vote": "village_vote", "day": game.conversation.day}}
+
+
+def test_werewolves_naming_no_one_still_kill_a_villager():
+    game = local_game()
+    victim = game._resolve_vote(Counter(), "werewolf_vote")
+    assert victim.role == "villager" and victim.is_alive
+
+
+def test_speculation_runs_in_a_seven_player_game():
+    game = new_game(AsyncGameOrchestrator, termination=NarratorJudge(), speculate=True)
+    result = asyncio.run(game.run())
+    judgements = game.logger.kinds().count("speculation")
+    assert judgements > 0
+    assert result["speculation"]["judgements"] == judgements
+
+
+def test_no_speculation_when_a_call_cant_be_cancelled():
+    game = new_game(AsyncGameOrchestrator, termination=NarratorJudge(), speculate=True)
+    game.players[3].llm.cancellable = False  # As if it ran its calls in a worker thread
+    result = asyncio.run(game.run())
+    assert result["speculation"]["judgements"] == 0
+    assert "speculation" not in game.logger.kinds()
+
+
+def test_speculation_cancels_its_calls_when_it_fails():
+    game = new_game(AsyncGameOrchestrator, speculate=True)
+
+    async def judge():
+        await asyncio.sleep(60)
+
+    async def announcement():
+        raise RuntimeError("narrator failed")
+
+    async def speculate():
+        game._semaphore = asyncio.Semaphore(game.max_concurrency)
+        await game.introduction_phase()
+        game.role_assignment_phase()
+        game._start_discussion()
+        await game._conduct_discussion()
+        try:
+            await game._speculate(judge(), announcement())
+        except RuntimeError:
+            pass
+        await asyncio.sleep(0)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+
+    assert asyncio.run(speculate()) == []
+
+
+class SameNameClient(LocalClient):
+    """Always introduces itself as Ash, recording the names it was asked to avoid"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prompts = []
+
+    async def get_structured_async(self, messages, schema):
+        if schema.name == "introduction":
+            self.prompts.append(messages)
+            return json.dumps({"name": "Ash", "message": "Hi, I'm Ash!"})
+        return await super().get_structured_async(messages, schema)
+
+
+def test_async_introductions_retry_names_that_collide():
+    game = new_game(AsyncGameOrchestrator, client_class=SameNameClient)
+
+    async def introduce():
+        game._semaphore = asyncio.Semaphore(game.max_concurrency)
+        await game.introduction_phase()
+
+    asyncio.run(introduce())
+
+    names = [p.name for p in game.players]
+    assert names[0] == "Ash - local"
+    assert len({name.lower() for name in names}) == len(names)
+    # The first player kept their name, so was only asked once. Everyone else was asked again
+    # with Ash to avoid, and rejected it until they were given a default name
+    assert len(game.players[0].llm.prompts) == 1
+    for player in game.players[1:]:
+        retries = player.llm.prompts[1:]
+        assert retries and all("Ash - local" in prompt for prompt in retries)
+        assert player.name.startswith("Player_")
@@ -0,0 +1,71 @@
+from src.game.conversation import GameMessage
+from src.game.prompt_builder import DROP_TARGET, PromptBuilder
+from src.llms.base_client import CACHE_POINT
+
+
+def message(content: str, day: int, phase: str = "discussion", visibility: str = "public") -> GameMessage:
+    return GameMessage(phase, "Ash", content, visibility, day)
+
+
+def contents(messages) -> list:
+    return [m["content"] for m in messages]
+
+
+ROLE = message("You are a villager.", 0, phase="role_assignment", visibility="private")
+
+
+def test_under_budget_keeps_everything_and_marks_the_cache_point():
+    history = [ROLE, message("Hello", 0)]
+    prompt = PromptBuilder(budget=1000).build(history, suffix=[{"role": "user", "content": "Your turn"}])
+    assert contents(prompt) == ["You are a villager.", "Hello", "Your turn"]
+    assert prompt[1][CACHE_POINT] and CACHE_POINT not in prompt[0] and CACHE_POINT not in prompt[2]
+
+
+def test_only_new_messages_are_read():
+    builder = PromptBuilder(budget=1000)
+    history = [ROLE, message("Hello", 0)]
+    builder.build(history)
+    tokens = builder.tokens
+    history.append(message("Again", 1))
+    assert contents(builder.build(history)) == ["You are a villager.", "Hello", "Again"]
+    assert builder.tokens > tokens and len(builder.entries) == 3
+
+
+def test_a_different_history_starts_over():
+    builder = PromptBuilder(budget=1000)
+    builder.build([ROLE, message("Hello", 0)])
+    assert contents(builder.build([message("Other game", 0)])) == ["Other game"]
+
+
+def test_over_budget_finished_days_are_replaced_by_their_summary():
+    secret = message("Wolves, pick a target", 1, phase="night", visibility="werewolf")
+    history = [ROLE] + [message("x" * 200, 1) for _ in range(4)] + [secret, message("Today's news", 2)]
+    builder = PromptBuilder(budget=150, summaries={1: "Ash was suspected", 2: "Not over yet"})
+    prompt = contents(builder.build(history))
+    # Day 1's public messages collapse into one summary; its private message, the role and
+    # the current day are kept
+    assert prompt == [
+        "You are a villager.", "Summary of day 1: Ash was suspected", "Wolves, pick a target", "Today's news",
+    ]
+    assert builder.tokens <= builder.budget
+
+
+def test_oldest_messages_are_dropped_when_summaries_are_not_enough():
+    history = [ROLE] + [message(f"{i} " + "x" * 100, 1) for i in range(10)]
+    builder = PromptBuilder(budget=200)
+    prompt = contents(builder.build(history))
+    assert prompt[0] == "You are a villager."
+    # The newest messages survive, in order, down to the drop target
+    kept = [int(text.split()[0]) for text in prompt[1:]]
+    assert kept == list(range(10 - len(kept), 10)) and 0 < len(kept) < 10
+    assert builder.tokens <= builder.budget * DROP_TARGET
+
+
+def test_fork_leaves_the_builder_alone():
+    builder = PromptBuilder(budget=1000)
+    history = [ROLE, message("Hello", 0)]
+    builder.build(history)
+    fork = builder.fork()
+    fork.build(history + [message("Speculative", 1)])
+    assert len(builder.entries) == 2
+    assert contents(builder.build(history)) == ["You are a villager.", "Hello"]
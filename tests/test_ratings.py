@@ -0,0 +1,76 @@
+from src.analytics.ratings import MU, SIGMA, Rating, RatingEngine, rate_match
+
+import gzip
+import json
+import os
+
+import pytest
+
+ROLES = [("Ash - 4o", "villager"), ("Birch - 4o", "villager"), ("Cedar - o1", "werewolf")]
+
+
+def lines(events) -> str:
+    return "".join(json.dumps(e) + "\n" for e in events)
+
+
+ROLE_LINES = lines({"event": "role_assigned", "data": {"player": p, "role": r}} for p, r in ROLES)
+END_LINE = lines([{"event": "game_end", "data": {"winner": "Werewolves"}}])
+
+
+def test_rate_match_moves_winners_up_and_losers_down():
+    winner, loser = Rating(), Rating()
+    rate_match([(winner, 1.0)], [(loser, 1.0)])
+    assert winner.mu > MU > loser.mu
+    assert winner.mu - MU == pytest.approx(MU - loser.mu)
+    assert winner.sigma < SIGMA and loser.sigma < SIGMA
+
+
+def test_rate_match_learns_more_from_an_upset():
+    expected_winner, expected_loser = Rating(mu=35), Rating(mu=15)
+    rate_match([(expected_winner, 1.0)], [(expected_loser, 1.0)])
+    underdog, favourite = Rating(mu=15), Rating(mu=35)
+    rate_match([(underdog, 1.0)], [(favourite, 1.0)])
+    assert underdog.mu - 15 > expected_winner.mu - 35
+
+
+def test_rate_match_weights_each_members_share():
+    full, half, opponent = Rating(), Rating(), Rating()
+    rate_match([(full, 1.0), (half, 0.5)], [(opponent, 1.0)])
+    assert full.mu - MU == pytest.approx(2 * (half.mu - MU))
+
+
+def test_read_resumes_from_a_partial_line(tmp_path):
+    path = str(tmp_path / "game.jsonl")
+    with open(path, "w") as f:
+        f.write(ROLE_LINES + END_LINE[:10])
+    engine = RatingEngine(state_path=None)
+
+    # The writer is part way through game_end, so it isn't read yet
+    assert engine.update([path]) == 0
+    assert engine.logs["game"]["offset"] == len(ROLE_LINES)
+    assert len(engine.logs["game"]["roles"]) == 3
+
+    with open(path, "a") as f:
+        f.write(END_LINE[10:])
+    assert engine.update([path]) == 1
+    assert engine.logs["game"] == {"done": True}
+    assert engine.models["o1"].wins == 1 and engine.models["4o"].wins == 0
+
+    # A finished game is never rated again
+    assert engine.update([path]) == 0
+
+
+def test_read_continues_after_the_log_is_compressed(tmp_path):
+    path = str(tmp_path / "game.jsonl")
+    with open(path, "w") as f:
+        f.write(ROLE_LINES)
+    state = str(tmp_path / "ratings.json")
+    assert RatingEngine(state).update([path]) == 0
+
+    # The game ends and its log is compressed, and a new run picks it up from the saved offset
+    os.remove(path)
+    with gzip.open(path + ".gz", "wt") as f:
+        f.write(ROLE_LINES + END_LINE)
+    engine = RatingEngine(state)
+    assert engine.update([path + ".gz"]) == 1
+    assert engine.models["o1"].games == 1
@@ -0,0 +1,117 @@
+from src.llms.base_client import BaseLLMClient
+from src.llms.resilience import CircuitBreaker, CircuitOpenError, ResilientClient, RetryPolicy
+
+import asyncio
+
+import pytest
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedClient(BaseLLMClient):
+    """Fails with each status code in script in turn, then answers"""
+    provider = "Test"
+
+    def __init__(self, *script: int):
+        super().__init__()
+        self.model = self.model_alias = "scripted"
+        self.script = list(script)
+        self.calls = 0
+
+    def get_response(self, messages) -> str:
+        self.calls += 1
+        if self.script:
+            raise ProviderError(self.script.pop(0))
+        return "ok"
+
+
+class HangingClient(ScriptedClient):
+    async def get_response_async(self, messages) -> str:
+        self.calls += 1
+        await asyncio.sleep(60)
+
+
+def resilient(inner: BaseLLMClient, breaker: CircuitBreaker, attempts: int = 1) -> ResilientClient:
+    client = ResilientClient(inner, RetryPolicy(max_attempts=attempts, base_delay=0, deadline=5))
+    client.breaker = breaker
+    return client
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    inner = ScriptedClient(503, 503, 503)
+    client = resilient(inner, breaker)
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            client.get_response("hi")
+    assert breaker.opened_at is not None
+
+    # Waiting out the reset would pass the deadline, so the call fails without reaching the provider
+    with pytest.raises(CircuitOpenError):
+        client.get_response("hi")
+    assert inner.calls == 2
+
+
+def test_trial_success_closes_and_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        # Only one trial at a time
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.opened_at is not None and not breaker.trial_in_flight
+
+    assert breaker.before_call() is True
+    breaker.record_success()
+    assert breaker.opened_at is None and breaker.failures == 0
+    assert breaker.before_call() is False
+
+
+def test_non_retryable_error_counts_as_an_answer():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    with pytest.raises(ProviderError):
+        resilient(ScriptedClient(400), breaker).get_response("hi")
+    assert breaker.opened_at is None
+
+
+def test_cancelled_trial_lets_the_next_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    async def cancel_trial():
+        task = asyncio.create_task(resilient(HangingClient(), breaker).get_response_async("hi"))
+        await asyncio.sleep(0.01)
+        assert breaker.trial_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert not breaker.trial_in_flight
+    # Still open, waiting for a trial that gets an answer
+    assert breaker.opened_at is not None
+    assert resilient(ScriptedClient(), breaker).get_response("hi") == "ok"
+    assert breaker.opened_at is None
+
+
+def test_cancelled_call_does_not_release_another_calls_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+
+    async def cancel_call():
+        # Started while the circuit was closed, so it isn't the trial
+        task = asyncio.create_task(resilient(HangingClient(), breaker).get_response_async("hi"))
+        await asyncio.sleep(0.01)
+        breaker.record_failure()
+        assert breaker.before_call() is True
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_call())
+    assert breaker.trial_in_flight
@@ -0,0 +1,107 @@
+from src.game.conversation import GameMessage
+from src.game.name_index import NameIndex
+from src.game.termination import DiscussionSignals, NarratorJudge, TerminationPolicy
+
+import pytest
+
+PLAYERS = ["Ash - o1", "Birch - 4o-aug", "Cedar - sonnet", "Dune - o3", "Ember - r1"]
+
+
+def signals(**settings) -> DiscussionSignals:
+    policy = DiscussionSignals(**settings)
+    policy.start_day(NameIndex(PLAYERS), PLAYERS)
+    return policy
+
+
+def say(policy: DiscussionSignals, player: str, text: str):
+    policy.observe(GameMessage("discussion", player, text))
+
+
+def accused(text: str, speaker: str = "Ember - r1"):
+    return signals().accused(GameMessage("discussion", speaker, text))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I'm voting for Birch.", "Birch - 4o-aug"),
+    ("Cedar is a werewolf, I'm sure of it.", "Cedar - sonnet"),
+    ("Dune dodged my question twice and I find that suspicious.", "Dune - o3"),
+    ("I trust Ash, but I think we should exile Birch.", "Birch - 4o-aug"),
+    # Naming a player isn't an accusation just because the message talks about wolves
+    ("We need to find the werewolves before it's too late. Ash seems honest to me.", None),
+    ("Ash has been quiet, but that's just how they play.", None),
+    ("Thanks Birch, that lies well with what I saw.", None),
+    # Players don't accuse themselves
+    ("Everyone says I'm suspicious, but I'm Ember and I'm a villager!", None),
+])
+def test_accusations_need_an_accusing_word_in_the_same_sentence(text, expected):
+    assert accused(text) == expected
+
+
+def test_dead_players_cant_be_accused():
+    policy = DiscussionSignals()
+    policy.start_day(NameIndex(PLAYERS), PLAYERS[1:])
+    assert policy.accused(GameMessage("discussion", "Birch - 4o-aug", "Ash is lying, vote Ash!")) is None
+
+
+def test_converging_accusations_end_the_round():
+    policy = signals()
+    for speaker in PLAYERS[1:4]:
+        say(policy, speaker, "I'm voting for Ash.")
+    verdict = policy.end_round()
+    assert (verdict.end, verdict.reason) == (True, "convergence")
+    assert verdict.signals["convergence"] == 1.0
+
+
+def test_too_few_accusations_dont_converge():
+    policy = signals()
+    say(policy, "Birch - 4o-aug", "I'm voting for Ash.")
+    say(policy, "Cedar - sonnet", "Ash is suspicious.")
+    say(policy, "Dune - o3", "Good morning, everyone.")
+    verdict = policy.end_round()
+    assert (verdict.end, verdict.reason) == (False, "continue")
+    assert verdict.signals["convergence"] == 0.0
+
+
+def test_repeated_accusations_are_stable():
+    policy = signals(convergence=1.1)
+    say(policy, "Birch - 4o-aug", "I suspect Ash of hiding something.")
+    say(policy, "Cedar - sonnet", "Dune is lying about last night.")
+    assert policy.end_round().end is False
+
+    say(policy, "Birch - 4o-aug", "Still voting Ash, nothing changed my mind.")
+    say(policy, "Cedar - sonnet", "My vote stays on Dune until proven otherwise.")
+    verdict = policy.end_round()
+    assert (verdict.end, verdict.reason) == (True, "stability")
+
+
+def test_a_round_repeating_the_last_ends_discussion():
+    policy = signals()
+    say(policy, "Birch - 4o-aug", "Good morning, let us share what we noticed overnight.")
+    assert policy.end_round().end is False
+    say(policy, "Cedar - sonnet", "Good morning, let us share what we noticed overnight.")
+    verdict = policy.end_round()
+    assert (verdict.end, verdict.reason) == (True, "repetition")
+
+
+def test_max_rounds_and_judge():
+    policy = signals(max_rounds=2, judge=True)
+    say(policy, "Birch - 4o-aug", "Good morning.")
+    assert policy.end_round()[:2] == (None, "undecided")
+    say(policy, "Cedar - sonnet", "Something different entirely.")
+    assert policy.end_round()[:2] == (True, "max_rounds")
+
+    # A new day starts counting again
+    policy.start_day(NameIndex(PLAYERS), PLAYERS)
+    assert policy.end_round().signals["round"] == 1
+
+
+def test_termination_policies_must_implement_end_round():
+    with pytest.raises(TypeError):
+        TerminationPolicy()
+
+
+def test_narrator_judge_asks_until_max_rounds_each_day():
+    policy = NarratorJudge(max_rounds=3)
+    for _ in range(2):
+        policy.start_day(NameIndex(PLAYERS), PLAYERS)
+        assert [policy.end_round()[:2] for _ in range(3)] == [(None, "narrator"), (None, "narrator"), (True, "max_rounds")]